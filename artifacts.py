@@ -0,0 +1,155 @@
+"""
+artifacts.py - Index of finished jobs' files with a disk quota
+
+Every finished job is recorded in jobs/index.json with the exact paths of its
+script, videos and thumbnail, its size and when it was last used. When the
+jobs directory grows past its quota, scratch files manim leaves behind
+(partial movie files, Tex caches, dry-run and chunk renders) are removed from
+the least recently used jobs first, and whole jobs after that.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+INDEX_FILE = "index.json"
+
+# Folders inside a job directory that are only needed while it renders
+SCRATCH_DIRS = ("partial_movie_files", "Tex", "texts", "images", "validate", "chunks")
+
+
+def directory_size(path):
+    """Bytes the files under path take up, leaving out hard links into shared caches"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            # A file with other links is also held by a cache; removing this link frees nothing
+            if stat.st_nlink == 1:
+                total += stat.st_size
+    return total
+
+
+def scratch_paths(job_dir):
+    """Return the scratch folders inside a job directory"""
+    paths = []
+    for root, dirs, _ in os.walk(job_dir):
+        for name in list(dirs):
+            if name in SCRATCH_DIRS:
+                paths.append(os.path.join(root, name))
+                dirs.remove(name)  # Nothing below a scratch folder needs a separate look
+    return paths
+
+
+class ArtifactStore:
+    """Index of job id -> artifacts, with LRU eviction against a byte quota"""
+
+    def __init__(self, jobs_dir, max_bytes):
+        self.jobs_dir = jobs_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(jobs_dir, INDEX_FILE)
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Forget jobs whose directory was deleted by hand
+        return {job_id: entry for job_id, entry in entries.items() if os.path.isdir(entry["dir"])}
+
+    def _save(self):
+        """Write the index atomically so a crash never leaves it half-written"""
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def record(self, job):
+        """Add or refresh the index entry of a finished job"""
+        entry = {
+            "dir": job.dir,
+            "prompt": job.prompt,
+            "state": job.state,
+            "script": job.script_path if job.code else None,
+            "video": job.video_path,
+            "videos": dict(job.videos),
+            "thumbnail": job.thumbnail_path,
+            "quality": job.quality,
+            "bytes": directory_size(job.dir),
+            "created": job.created,
+            "last_used": time.time(),
+        }
+        with self._lock:
+            self.entries[job.id] = entry
+            self._save()
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self.entries.get(job_id)
+            return dict(entry) if entry else None
+
+    def touch(self, job_id):
+        """Mark a job as recently used, e.g. when it is viewed"""
+        with self._lock:
+            if job_id in self.entries:
+                self.entries[job_id]["last_used"] = time.time()
+                self._save()
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry["bytes"] for entry in self.entries.values())
+
+    def evict(self, protect=()):
+        """Free space until the jobs directory fits the quota; return the bytes freed"""
+        with self._lock:
+            total = sum(entry["bytes"] for entry in self.entries.values())
+            if total <= self.max_bytes:
+                return 0
+
+            by_age = sorted(
+                (job_id for job_id in self.entries if job_id not in protect),
+                key=lambda job_id: self.entries[job_id]["last_used"]
+            )
+            freed = 0
+
+            # Scratch files first: they cost nothing to lose once a job is done
+            for job_id in by_age:
+                if total - freed <= self.max_bytes:
+                    break
+                entry = self.entries[job_id]
+                for path in scratch_paths(entry["dir"]):
+                    shutil.rmtree(path, ignore_errors=True)
+                size = directory_size(entry["dir"])
+                freed += entry["bytes"] - size
+                entry["bytes"] = size
+
+            # Then whole jobs, least recently used first
+            for job_id in by_age:
+                if total - freed <= self.max_bytes:
+                    break
+                entry = self.entries.pop(job_id)
+                shutil.rmtree(entry["dir"], ignore_errors=True)
+                freed += entry["bytes"]
+                self.evictions += 1
+
+            self._save()
+            return freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": sum(entry["bytes"] for entry in self.entries.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+batch.py - Headless batch generation for the Manim Math Visualization Generator
+
+Runs refine -> generate -> clean -> render for every prompt in a JSONL file,
+without a display. Each line is either a JSON string or an object with a
+"prompt" field and an optional "id". Progress is recorded in a manifest after
+every finished prompt, so re-running the same command after a crash skips the
+prompts that already completed.
+
+Run with: python batch.py prompts.jsonl --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import pipeline
+from cache import LLMCache, RenderCache
+from config import load_config
+from llm import make_backend
+from scheduler import JobScheduler
+
+
+def load_api_key(path="api/key.txt"):
+    """Read the Gemini API key from the environment or the key file used by the UI"""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if api_key:
+        return api_key.strip()
+
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return f.read().strip()
+    return None
+
+
+def read_prompts(path):
+    """Return (entry_id, prompt) pairs from a JSONL file, keeping the first line of a repeated id"""
+    prompts = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"prompt": entry}
+            if not entry.get("prompt"):
+                print(f"Skipping line {line_number}: no prompt")
+                continue
+
+            entry_id = str(entry.get("id", line_number))
+            if entry_id in seen:
+                print(f"Skipping line {line_number}: id {entry_id} is already used")
+                continue
+            seen.add(entry_id)
+            prompts.append((entry_id, entry["prompt"]))
+    return prompts
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"entries": {}}
+
+
+def write_manifest(path, manifest):
+    """Write the manifest atomically so a crash never leaves it half-written"""
+    manifest["updated"] = time.time()
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def manifest_entry(job):
+    return {
+        "prompt": job.prompt,
+        "status": job.state,
+        "job_id": job.id,
+        "script": job.script_path if job.code else None,
+        "video": job.video_path,
+        "thumbnail": job.thumbnail_path,
+        "quality": job.quality,
+        "from_render_cache": job.from_render_cache,
+        "template": job.template,
+        "repair_attempts": job.repair_attempts,
+        "script_errors": job.script_errors,
+        "estimated_seconds": job.estimated_seconds,
+        "timings": job.timings,
+        "resources": job.resources,
+        "error": job.error,
+    }
+
+
+def run_batch(input_path, manifest_path, workers=None, use_cache=True, retry_failed=True, quality=None,
+              api_key=None, config=None):
+    """Run every pending prompt and return the number of failures"""
+    config = config or load_config()
+    manifest = load_manifest(manifest_path)
+    entries = manifest["entries"]
+
+    pending = []
+    for entry_id, prompt in read_prompts(input_path):
+        previous = entries.get(entry_id)
+        if previous and previous["prompt"] == prompt:
+            if previous["status"] == pipeline.COMPLETE:
+                continue
+            if previous["status"] == pipeline.FAILED and not retry_failed:
+                continue
+        pending.append((entry_id, prompt))
+
+    print(f"{len(pending)} prompt(s) to run, {len(entries)} recorded in {manifest_path}")
+    if not pending:
+        return 0
+
+    if workers:
+        config["render_workers"] = workers
+    # Nobody watches previews in a batch, so render the requested quality directly
+    config["progressive_render"] = False
+    # The manifest already records and resumes every prompt; the app must not resume them too
+    config["job_store"] = False
+    if quality:
+        config["preview_quality"] = quality
+
+    scheduler = JobScheduler(
+        config,
+        LLMCache(config["llm_cache_dir"], config["llm_cache_max_bytes"]),
+        RenderCache(config["render_cache_dir"], config["render_cache_max_bytes"]),
+        llm=make_backend(config, api_key)
+    )
+
+    jobs = {}
+    for entry_id, prompt in pending:
+        job = scheduler.submit(prompt, use_cache)
+        jobs[job.id] = entry_id
+        entries[entry_id] = manifest_entry(job)
+    write_manifest(manifest_path, manifest)
+
+    # Count each job once by its id; a job may finish before its first manifest
+    # entry is written, and the manifest status alone would then skip it forever
+    failures = 0
+    handled = set()
+    remaining = len(jobs)
+    while remaining:
+        job = scheduler.events.get()
+        if not job.done or job.id in handled:
+            continue
+
+        handled.add(job.id)
+        entries[jobs[job.id]] = manifest_entry(job)
+        write_manifest(manifest_path, manifest)
+        remaining -= 1
+
+        if job.state == pipeline.FAILED:
+            failures += 1
+        total = job.timings.get("total", 0)
+        print(f"[{len(jobs) - remaining}/{len(jobs)}] {jobs[job.id]}: {job.state} ({total:.1f}s) {job.message}")
+
+    scheduler.shutdown(wait=True)
+    if scheduler.context.tracer.enabled:
+        for stage, stats in scheduler.context.tracer.stage_summary().items():
+            print(f"{stage:<14} n={stats['count']:<4} p50 {stats['p50']:6.1f}s  p95 {stats['p95']:6.1f}s")
+    print(scheduler.context.llm.summary())
+    if scheduler.context.tex_cache:
+        print(f"LaTeX: {scheduler.context.tex_cache.summary()}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate visualizations for every prompt in a JSONL file")
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("-m", "--manifest", help="manifest path (default: <input>.manifest.json)")
+    parser.add_argument("-j", "--workers", type=int, help="number of renders to run at once (default: CPU count)")
+    parser.add_argument(
+        "-q", "--quality",
+        choices=list(pipeline.QUALITY_LEVELS),
+        help="render quality (default: preview_quality from config.json)"
+    )
+    parser.add_argument("--fresh", action="store_true", help="skip the LLM response cache")
+    parser.add_argument("--skip-failed", action="store_true", help="do not retry prompts that failed previously")
+    args = parser.parse_args()
+
+    config = load_config()
+    api_key = load_api_key()
+    if config["llm_backend"] == "gemini" and not api_key:
+        print("Error: set GEMINI_API_KEY or save a key to api/key.txt")
+        sys.exit(1)
+
+    manifest_path = args.manifest or f"{os.path.splitext(args.input)[0]}.manifest.json"
+    failures = run_batch(
+        args.input,
+        manifest_path,
+        args.workers,
+        use_cache=not args.fresh,
+        retry_failed=not args.skip_failed,
+        quality=args.quality,
+        api_key=api_key,
+        config=config
+    )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
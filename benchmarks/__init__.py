@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the Manim Math Visualization Generator
+
+Run from the repository root with: python -m benchmarks.run
+"""
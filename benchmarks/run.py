@@ -0,0 +1,209 @@
+"""
+run.py - End-to-end benchmark of the pipeline with a stub LLM
+
+Submits the canned prompts in benchmarks/stub_llm.py to a JobScheduler for
+every combination of render quality and render worker count, with empty
+caches each time, and records wall time, throughput and per-stage latency.
+Every cache and the learned render cost model live in a temporary folder
+per run, so results do not depend on earlier runs or on the app's caches.
+With --repeat the prompts run once per round, each round on a fresh render
+cache, so later rounds render instead of restoring the first round's videos.
+Results are written as JSON under benchmarks/results, so two runs can be
+compared with --compare.
+
+Usage:
+    python -m benchmarks.run --qualities low medium --workers 1 4
+    python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import pipeline
+from benchmarks import stub_llm
+from cache import LLMCache, RenderCache, get_manim_version
+from config import load_config
+from llm import GuardedBackend
+from metrics import percentile
+from scheduler import JobScheduler
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = ("refine", "generate", "validate", "render")
+
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def latency_summary(values):
+    return {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95)} if values else None
+
+
+def run_configuration(prompts, quality, workers, repeat, llm):
+    """Run every prompt `repeat` times on fresh caches; return the measurements"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = load_config()
+        config.update({
+            "jobs_dir": os.path.join(work_dir, "jobs"),
+            "tex_cache_dir": os.path.join(work_dir, "tex"),
+            "cost_model_path": os.path.join(work_dir, "render_costs.json"),
+            "render_workers": workers,
+            "preview_quality": quality,
+            "progressive_render": False,
+            # Measure the LLM path, not template matches
+            "templates": False,
+        })
+        scheduler = JobScheduler(
+            config,
+            LLMCache(os.path.join(work_dir, "llm"), config["llm_cache_max_bytes"]),
+            RenderCache(os.path.join(work_dir, "render-0"), config["render_cache_max_bytes"]),
+            llm=llm
+        )
+
+        jobs = []
+        round_seconds = []
+        for round_number in range(repeat):
+            if round_number:
+                scheduler.context.render_cache = RenderCache(
+                    os.path.join(work_dir, f"render-{round_number}"), config["render_cache_max_bytes"]
+                )
+            started = time.perf_counter()
+            round_jobs = [scheduler.submit(prompt, use_cache=False) for prompt in prompts.values()]
+            while not all(job.done for job in round_jobs):
+                scheduler.events.get()
+            round_seconds.append(time.perf_counter() - started)
+            jobs += round_jobs
+        wall_seconds = sum(round_seconds)
+        scheduler.shutdown(wait=True)
+
+    completed = [job for job in jobs if job.state == pipeline.COMPLETE]
+    return {
+        "quality": quality,
+        "render_workers": workers,
+        "jobs": len(jobs),
+        "completed": len(completed),
+        "errors": sorted({job.error for job in jobs if job.error}),
+        "wall_seconds": wall_seconds,
+        "round_seconds": round_seconds,
+        "jobs_per_minute": len(completed) / wall_seconds * 60 if wall_seconds else 0.0,
+        "latency": latency_summary([job.timings["total"] for job in completed]),
+        "stages": {
+            stage: latency_summary([job.timings[stage] for job in completed if stage in job.timings])
+            for stage in STAGES
+        },
+        "render_cpu_seconds": sum(
+            usage["cpu_seconds"] for job in completed for usage in job.resources.values()
+        ),
+    }
+
+
+def run_benchmark(qualities, worker_counts, repeat, topics, latency, tokens_per_second):
+    # Guarded like the real backends, so identical prompts share one call
+    llm = GuardedBackend(stub_llm.StubBackend(latency, tokens_per_second))
+    prompts = {topic: stub_llm.PROMPTS[topic] for topic in topics}
+
+    results = {}
+    for quality in qualities:
+        for workers in worker_counts:
+            print(f"Running {len(prompts) * repeat} job(s) at {quality} quality with {workers} render worker(s)")
+            result = run_configuration(prompts, quality, workers, repeat, llm)
+            results[f"{quality}/{workers}"] = result
+            print(
+                f"  {result['completed']}/{result['jobs']} completed in {result['wall_seconds']:.1f}s "
+                f"({result['jobs_per_minute']:.1f} jobs/min)"
+            )
+            if len(result["round_seconds"]) > 1:
+                print(f"  rounds: {', '.join(f'{seconds:.1f}s' for seconds in result['round_seconds'])}")
+            for error in result["errors"]:
+                print(f"  error: {error}")
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "manim": get_manim_version(),
+            "topics": topics,
+            "repeat": repeat,
+            "llm_latency": latency,
+            "llm_tokens_per_second": tokens_per_second,
+        },
+        "results": results,
+    }
+
+
+def change(old, new):
+    if not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def compare(old_path, new_path):
+    """Print how each configuration's figures moved between two result files"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old['meta']['revision']} -> {new['meta']['revision']}")
+
+    for key, result in new["results"].items():
+        previous = old["results"].get(key)
+        if not previous:
+            print(f"{key}: not in {old_path}")
+            continue
+        print(f"{key}:")
+        rows = [("wall seconds", previous["wall_seconds"], result["wall_seconds"]),
+                ("jobs/min", previous["jobs_per_minute"], result["jobs_per_minute"])]
+        for name in ("latency",) + STAGES:
+            before = previous["latency"] if name == "latency" else previous["stages"].get(name)
+            after = result["latency"] if name == "latency" else result["stages"].get(name)
+            if before and after:
+                rows.append((f"{name} p50", before["p50"], after["p50"]))
+                rows.append((f"{name} p95", before["p95"], after["p95"]))
+        for name, before, after in rows:
+            print(f"  {name:<16}{before:>10.2f}{after:>10.2f}{change(before, after):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--qualities", nargs="+", default=["low"], choices=list(pipeline.QUALITY_LEVELS))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, os.cpu_count() or 1],
+                        help="render worker counts to try")
+    parser.add_argument("--repeat", type=int, default=1, help="times each prompt is submitted per run")
+    parser.add_argument("--topics", nargs="+", default=list(stub_llm.PROMPTS), choices=list(stub_llm.PROMPTS))
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds before each LLM response")
+    parser.add_argument("--llm-tokens-per-second", type=float, help="simulated LLM output speed")
+    parser.add_argument("-o", "--output", help="results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_benchmark(
+        args.qualities, args.workers, args.repeat, args.topics, args.llm_latency, args.llm_tokens_per_second
+    )
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+    failed = any(result["completed"] < result["jobs"] for result in results["results"].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+stub_llm.py - A local stand-in LLM backend with canned scripts
+
+StubBackend answers instantly (or after a configurable delay) with the
+scripts in the scene template library (templates/). Refine prompts are
+answered with a prompt naming the topic, so the generate call that follows
+can pick the matching script.
+"""
+
+import os
+import time
+
+import pipeline
+from llm import Backend, LLMResponse
+
+SCENES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+# Topic -> user prompt, one per scene showcased in docs/results
+PROMPTS = {
+    "pythagorean_theorem": "Show a geometric proof of the Pythagorean theorem",
+    "fourier_series": "Visualize how a Fourier series approximates a square wave",
+    "matrix_multiplication": "Explain 2x2 matrix multiplication step by step",
+    "complex_numbers": "Visualize complex numbers and multiplication by i on the complex plane",
+    "derivative": "Show the derivative of x squared as the slope of a tangent line",
+    "factoring": "Show how to factor x^2 + 5x + 6",
+}
+
+CHARS_PER_TOKEN = 4
+
+
+def load_script(topic):
+    with open(os.path.join(SCENES_DIR, f"{topic}.py"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def find_topic(text):
+    for topic, prompt in PROMPTS.items():
+        if topic in text or prompt in text:
+            return topic
+    return next(iter(PROMPTS))
+
+
+class StubBackend(Backend):
+    """Answers like a real backend, after latency seconds plus streaming time"""
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, tokens_per_second=None):
+        super().__init__()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.connections = 1
+
+    def answer(self, prompt):
+        if prompt.startswith(pipeline.REFINE_SYSTEM_PROMPT):
+            topic = find_topic(prompt)
+            return f"Write a Manim scene about {topic.replace('_', ' ')} (topic: {topic})."
+        # Code and repair prompts both get the topic's script back
+        return f"```python\n{load_script(find_topic(prompt))}```"
+
+    def response(self, prompt, text):
+        return LLMResponse(text, len(prompt) // CHARS_PER_TOKEN, len(text) // CHARS_PER_TOKEN)
+
+    def complete(self, stage, prompt):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        text = self.answer(prompt)
+        self.wait_for_tokens(text)
+        return self.response(prompt, text)
+
+    def stream(self, stage, prompt, chunk_chars=80):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        text = self.answer(prompt)
+        for start in range(0, len(text), chunk_chars):
+            piece = text[start:start + chunk_chars]
+            self.wait_for_tokens(piece)
+            yield piece
+        yield self.response(prompt, text)
+
+    def wait_for_tokens(self, text):
+        if self.tokens_per_second:
+            time.sleep(len(text) / CHARS_PER_TOKEN / self.tokens_per_second)
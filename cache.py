@@ -0,0 +1,282 @@
+"""
+cache.py - Persistent, size-bounded LRU caches stored on disk
+
+Each entry is a directory named after a content hash. Recency is tracked
+through the entry directory's modification time, so there is no shared index
+file that could be corrupted when several threads or processes use the same
+cache. Entries are written to a temporary directory and published with a
+single rename, so readers never see a half-written entry.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from importlib import metadata
+
+META_FILE = "meta.json"
+TEMP_PREFIX = ".tmp-"
+STALE_TEMP_SECONDS = 3600
+
+
+def hash_key(*parts):
+    """Hash an ordered sequence of strings/bytes into a hex cache key"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        # Length-prefix every part so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_manim_version():
+    """Return the installed manim version so renders are not reused across upgrades"""
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        pass
+
+    # Fall back to asking the CLI, e.g. when manim lives in another environment
+    try:
+        result = subprocess.run(["manim", "--version"], capture_output=True, text=True)
+        return result.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def normalize_prompt(text):
+    """Collapse case, whitespace and trailing punctuation so trivial edits share an entry"""
+    text = " ".join(text.lower().split())
+    return text.rstrip(" .!?")
+
+
+def link_file(source, destination):
+    """Hard-link source at destination, replacing it; copy instead across file systems"""
+    try:
+        os.remove(destination)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(source, destination)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class DiskCache:
+    """Directory-per-entry cache with LRU eviction against a byte quota"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.root, key)
+
+    def lookup(self, key):
+        """Return the entry directory for key (marking it recently used), or None on a miss"""
+        path = self.entry_path(key)
+        with self._lock:
+            if os.path.exists(os.path.join(path, META_FILE)):
+                try:
+                    os.utime(path)
+                    self.hits += 1
+                    return path
+                except OSError:
+                    pass  # Evicted by another process between the checks
+            self.misses += 1
+            return None
+
+    def read_meta(self, path):
+        try:
+            with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def store(self, key, files, meta=None):
+        """Publish files ({name: bytes or source file path}) as the entry for key"""
+        temp_dir = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=self.root)
+        final_path = self.entry_path(key)
+
+        try:
+            for name, content in files.items():
+                target = os.path.join(temp_dir, name)
+                if isinstance(content, bytes):
+                    with open(target, "wb") as f:
+                        f.write(content)
+                else:
+                    shutil.copyfile(content, target)
+
+            meta = dict(meta or {})
+            meta["created"] = time.time()
+            with open(os.path.join(temp_dir, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            with self._lock:
+                if os.path.isdir(final_path):
+                    shutil.rmtree(final_path, ignore_errors=True)
+                try:
+                    os.replace(temp_dir, final_path)
+                except OSError:
+                    # Another writer published the same key first; keep theirs
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        self.evict()
+        return final_path
+
+    def entries(self):
+        """Return (last_used, size, path) for every entry, least recently used first"""
+        result = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                if name.startswith(TEMP_PREFIX):
+                    # Leftover from a writer that crashed mid-store
+                    if time.time() - os.path.getmtime(path) > STALE_TEMP_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                size = 0
+                for dirpath, _, filenames in os.walk(path):
+                    for filename in filenames:
+                        size += os.path.getsize(os.path.join(dirpath, filename))
+                result.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue  # Removed while scanning
+        result.sort()
+        return result
+
+    def remove(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits its byte quota"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.max_bytes:
+            _, size, path = entries.pop(0)
+            self.remove(path)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.remove(path)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+class LLMCache(DiskCache):
+    """Cache of LLM responses keyed on stage, model, prompt template and normalized input"""
+
+    RESPONSE_FILE = "response.txt"
+
+    def key(self, stage, model_name, template, prompt):
+        return hash_key("llm", stage, model_name, template, normalize_prompt(prompt))
+
+    def get(self, stage, model_name, template, prompt):
+        path = self.lookup(self.key(stage, model_name, template, prompt))
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, self.RESPONSE_FILE), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, stage, model_name, template, prompt, response):
+        meta = {
+            "stage": stage,
+            "model": model_name,
+            "template_hash": hash_key(template),
+        }
+        self.store(
+            self.key(stage, model_name, template, prompt),
+            {self.RESPONSE_FILE: response.encode("utf-8")},
+            meta,
+        )
+
+    def invalidate_templates(self, templates):
+        """Remove entries produced by a prompt template other than the current one per stage"""
+        current = {stage: hash_key(template) for stage, template in templates.items()}
+        removed = 0
+        for _, _, path in self.entries():
+            meta = self.read_meta(path)
+            if current.get(meta.get("stage")) != meta.get("template_hash"):
+                self.remove(path)
+                removed += 1
+        return removed
+
+
+class RenderCache(DiskCache):
+    """Cache of finished renders keyed on script, scene, quality flags and manim version"""
+
+    VIDEO_FILE = "video.mp4"
+    THUMBNAIL_FILE = "thumbnail.png"
+
+    def key(self, script, scene_name, quality_flags):
+        return hash_key("render", script, scene_name, quality_flags, get_manim_version())
+
+    def get(self, key):
+        """Return (video_path, thumbnail_path or None) for key, or None on a miss"""
+        path = self.lookup(key)
+        if path is None:
+            return None
+
+        video_path = os.path.join(path, self.VIDEO_FILE)
+        if not os.path.exists(video_path):
+            return None
+        thumbnail_path = os.path.join(path, self.THUMBNAIL_FILE)
+        return video_path, thumbnail_path if os.path.exists(thumbnail_path) else None
+
+    def restore(self, key, video_path, thumbnail_path=None):
+        """Link a cached render at video_path, and its thumbnail at thumbnail_path, where eviction cannot reach them.
+        
+        Returns (video_path, thumbnail_path or None), or None on a miss.
+        """
+        cached = self.get(key)
+        if cached is None:
+            return None
+        try:
+            os.makedirs(os.path.dirname(video_path) or ".", exist_ok=True)
+            link_file(cached[0], video_path)
+            if cached[1] and thumbnail_path:
+                link_file(cached[1], thumbnail_path)
+            else:
+                thumbnail_path = None
+        except FileNotFoundError:
+            return None  # Evicted since the lookup
+        return video_path, thumbnail_path
+
+    def put(self, key, video_path, thumbnail_path=None):
+        files = {self.VIDEO_FILE: video_path}
+        if thumbnail_path and os.path.exists(thumbnail_path):
+            files[self.THUMBNAIL_FILE] = thumbnail_path
+        self.store(key, files, {"source": video_path})
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+chunking.py - Render one long scene as several animation ranges in parallel
+
+manim numbers every play() and wait() call of a scene. With `-n start,end`
+it still executes the whole construct() but only writes frames for the
+animations in that range, jumping over the earlier ones to their end state.
+So each chunk starts from exactly the scene state the single-process render
+would have at that point (manim also seeds its random generators the same way
+in every process), and the partial movies can be joined with ffmpeg's concat
+demuxer without re-encoding.
+
+The number of animations is counted statically from the script. Scenes whose
+count depends on loops or branches, or that call scene methods the counter
+does not know (such as LinearTransformationScene.apply_matrix, which plays
+animations of its own), are rendered in one piece. The last chunk is
+rendered open-ended, so a miscount can never cut off the end of the video.
+
+Run `python chunking.py --benchmark` to compare chunked and single renders.
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import tempfile
+import time
+
+# Every Scene method that advances manim's animation counter
+ANIMATION_METHODS = {"play", "wait", "pause", "wait_until"}
+# Scene methods known not to play anything; any other inherited or library
+# method of self may, so a scene calling one is not counted
+STATIC_METHODS = {
+    "add", "remove", "clear", "replace", "bring_to_front", "bring_to_back",
+    "add_foreground_mobject", "add_foreground_mobjects", "remove_foreground_mobject",
+    "remove_foreground_mobjects", "add_updater", "remove_updater", "add_sound", "add_subcaption",
+    "get_top_level_mobjects", "get_mobject_family_members", "get_attrs", "next_section",
+    "set_camera_orientation", "begin_ambient_camera_rotation", "stop_ambient_camera_rotation",
+    "add_fixed_in_frame_mobjects", "add_fixed_orientation_mobjects", "remove_fixed_in_frame_mobjects",
+    "remove_fixed_orientation_mobjects",
+}
+
+
+class Uncountable(Exception):
+    """The number of animations cannot be known without running the scene"""
+
+
+def _animation_calls(node):
+    """Yield the self.<name>(...) calls inside node"""
+    for child in ast.walk(node):
+        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                and isinstance(child.func.value, ast.Name) and child.func.value.id == "self"):
+            yield child.func.attr
+
+
+def _count_body(statements, methods, seen):
+    count = 0
+    for statement in statements:
+        if isinstance(statement, ast.With):
+            count += _count_body(statement.body, methods, seen)
+            continue
+
+        calls = list(_animation_calls(statement))
+        unknown = [name for name in calls if name not in ANIMATION_METHODS | STATIC_METHODS and name not in methods]
+        if unknown:
+            raise Uncountable(f"call to inherited method {unknown[0]}")
+        animated = [name for name in calls if name in ANIMATION_METHODS or name in methods]
+        if not animated:
+            continue
+        if not isinstance(statement, (ast.Expr, ast.Assign, ast.AnnAssign, ast.AugAssign, ast.Return)):
+            # Loops, branches and try blocks run an unknown number of animations
+            raise Uncountable(type(statement).__name__)
+        for node in ast.walk(statement):
+            if isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+                if any(name in ANIMATION_METHODS or name in methods for name in _animation_calls(node)):
+                    raise Uncountable(type(node).__name__)
+
+        for name in animated:
+            if name in ANIMATION_METHODS:
+                count += 1
+            elif name in seen:
+                raise Uncountable(f"recursive call to {name}")
+            else:
+                count += _count_body(methods[name].body, methods, seen | {name})
+    return count
+
+
+def count_animations(code, scene_name="AutoScene"):
+    """Return how many animations the scene plays, or None if it cannot be known statically"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    if scene_name not in classes:
+        return None
+    methods = {
+        node.name: node
+        for node in classes[scene_name].body
+        if isinstance(node, ast.FunctionDef)
+    }
+    if "construct" not in methods:
+        return None
+
+    try:
+        return _count_body(methods["construct"].body, methods, {"construct"})
+    except Uncountable:
+        return None
+
+
+def plan_chunks(animation_count, chunks):
+    """Split animations 0..count-1 into at most `chunks` contiguous (first, last) ranges"""
+    chunks = max(1, min(chunks, animation_count))
+    ranges = []
+    start = 0
+    for index in range(chunks):
+        # Spread the remainder over the first chunks
+        size = animation_count // chunks + (1 if index < animation_count % chunks else 0)
+        ranges.append((start, start + size - 1))
+        start += size
+    return ranges
+
+
+def concat_videos(video_paths, output_path):
+    """Join videos with identical encoding settings without re-encoding; return (success, output)"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    list_path = f"{output_path}.concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in video_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path],
+            capture_output=True,
+            text=True
+        )
+    except OSError as e:
+        return False, f"Could not start ffmpeg: {str(e)}"
+    finally:
+        os.remove(list_path)
+    return result.returncode == 0, result.stderr
+
+
+BENCHMARK_SCENES = {
+    "fourier_series": (
+        "from manim import *\n\n"
+        "class AutoScene(Scene):\n"
+        "    def construct(self):\n"
+        "        axes = Axes(x_range=[-PI, PI], y_range=[-1.5, 1.5])\n"
+        "        self.play(Create(axes))\n"
+        "        square = axes.plot(lambda x: np.sign(np.sin(x)), color=WHITE)\n"
+        "        self.play(Create(square))\n"
+        "        self.add_term(axes, 1)\n"
+        "        self.add_term(axes, 3)\n"
+        "        self.add_term(axes, 5)\n"
+        "        self.add_term(axes, 7)\n"
+        "        self.add_term(axes, 9)\n"
+        "        self.add_term(axes, 11)\n"
+        "        self.wait()\n\n"
+        "    def add_term(self, axes, n):\n"
+        "        partial = axes.plot(\n"
+        "            lambda x: sum(4 / (PI * k) * np.sin(k * x) for k in range(1, n + 1, 2)),\n"
+        "            color=BLUE\n"
+        "        )\n"
+        "        label = MathTex(f'n = {n}').to_corner(UR)\n"
+        "        self.play(Create(partial), Write(label), run_time=2)\n"
+        "        self.play(FadeOut(partial), FadeOut(label))\n"
+    ),
+    "matrix_multiplication": (
+        "from manim import *\n\n"
+        "class AutoScene(Scene):\n"
+        "    def construct(self):\n"
+        "        a = Matrix([[1, 2], [3, 4]]).shift(LEFT * 4)\n"
+        "        b = Matrix([[5, 6], [7, 8]])\n"
+        "        c = Matrix([[19, 22], [43, 50]]).shift(RIGHT * 4)\n"
+        "        self.play(Write(a), Write(b))\n"
+        "        self.wait()\n"
+        "        self.play(Indicate(a.get_rows()[0]), Indicate(b.get_columns()[0]))\n"
+        "        self.play(Indicate(a.get_rows()[0]), Indicate(b.get_columns()[1]))\n"
+        "        self.play(Indicate(a.get_rows()[1]), Indicate(b.get_columns()[0]))\n"
+        "        self.play(Indicate(a.get_rows()[1]), Indicate(b.get_columns()[1]))\n"
+        "        self.play(Write(c), run_time=2)\n"
+        "        self.wait(2)\n"
+    ),
+}
+
+
+def benchmark(chunks, quality="low", runs=1):
+    """Time single-process and chunked renders of the benchmark scenes"""
+    import pipeline
+
+    print(f"{'scene':<24}{'animations':>11}{'single (s)':>12}{'chunked (s)':>13}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, code in BENCHMARK_SCENES.items():
+            script = os.path.join(work_dir, f"{name}.py")
+            with open(script, "w", encoding="utf-8") as f:
+                f.write(code)
+            ranges = plan_chunks(count_animations(code), chunks)
+
+            single_times = []
+            chunked_times = []
+            for run in range(runs):
+                started = time.perf_counter()
+                success, output = pipeline.run_manim_script(
+                    script, "AutoScene", os.path.join(work_dir, f"single-{run}"), quality
+                )
+                single_times.append(time.perf_counter() - started)
+                if not success:
+                    print(output)
+                    return
+
+                started = time.perf_counter()
+                success, output, _ = pipeline.render_chunked(
+                    script, "AutoScene", os.path.join(work_dir, f"chunked-{run}"), quality, ranges
+                )
+                chunked_times.append(time.perf_counter() - started)
+                if not success:
+                    print(output)
+                    return
+
+            single = sorted(single_times)[len(single_times) // 2]
+            chunked = sorted(chunked_times)[len(chunked_times) // 2]
+            print(f"{name:<24}{count_animations(code):>11}{single:>12.2f}{chunked:>13.2f}{single / chunked:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel chunked rendering of long manim scenes")
+    parser.add_argument("--benchmark", action="store_true", help="compare chunked and single-process renders")
+    parser.add_argument("--chunks", type=int, default=os.cpu_count() or 1, help="parallel chunks per scene")
+    parser.add_argument("--quality", default="low", help="render quality (low, medium, high, 4k)")
+    parser.add_argument("--runs", type=int, default=1, help="renders per scene in the benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.chunks, args.quality, args.runs)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+config.py - Application settings for the Manim Math Visualization Generator
+
+Every setting has a default below. Any of them can be overridden by placing
+the same key in a config.json file next to main.py.
+"""
+
+import json
+import os
+
+CONFIG_PATH = "config.json"
+
+DEFAULTS = {
+    # LLM backend: "gemini" uses the Gemini API with the key from api/key.txt,
+    # "openai" any server with an OpenAI-compatible /chat/completions endpoint
+    # at llm_base_url (llm_api_key of null falls back to $OPENAI_API_KEY)
+    "llm_backend": "gemini",
+    "llm_models": {
+        "refine": "gemini-1.5-flash",
+        "generate": "gemini-1.5-flash",
+        "repair": "gemini-1.5-flash",
+    },
+    "llm_base_url": "http://localhost:8000/v1",
+    "llm_api_key": None,
+    "llm_timeout": 120,
+    # Keep LLM calls within the API quota (null: no limit), allowing bursts of
+    # llm_burst requests; rate limit and server errors are retried up to
+    # llm_max_retries times with jittered exponential backoff
+    "llm_requests_per_minute": None,
+    "llm_burst": 4,
+    "llm_max_retries": 4,
+    "llm_backoff_seconds": 1.0,
+    # Scene template library: prompts matching a template in templates_dir with
+    # at least template_threshold similarity (0 to 1), and template_margin more
+    # than the next best template, use its vetted script instead of calling the LLM
+    "templates": True,
+    "templates_dir": "templates",
+    "template_threshold": 0.5,
+    "template_margin": 0.1,
+    # LLM response cache
+    "llm_cache_dir": os.path.join("cache", "llm"),
+    "llm_cache_max_bytes": 50 * 1024 * 1024,
+    # LaTeX/SVG cache shared by every render (see tex_cache.py)
+    "tex_cache": True,
+    "tex_cache_dir": os.path.join("cache", "tex"),
+    "tex_cache_max_bytes": 256 * 1024 * 1024,
+    # Render artifact cache
+    "render_cache_dir": os.path.join("cache", "render"),
+    "render_cache_max_bytes": 2 * 1024 * 1024 * 1024,
+    # Job scheduling; render_workers of null means one render worker per CPU core
+    "jobs_dir": "jobs",
+    # Job history: every job's prompt, script, artifacts and outcome in SQLite
+    # (job_store_path of null means jobs.db in jobs_dir); unfinished jobs are
+    # resumed when the app starts
+    "job_store": True,
+    "job_store_path": None,
+    # Disk quota for finished jobs' scripts, videos and manim scratch files
+    "artifacts_max_bytes": 5 * 1024 * 1024 * 1024,
+    "render_workers": None,
+    "llm_workers": 8,
+    # Jobs allowed to wait between two pipeline stages (null: twice the render workers)
+    "stage_queue_size": None,
+    # How renders run: "subprocess" starts manim for every render, "warm" keeps
+    # manim imported in long-lived worker processes (see render_worker.py)
+    "render_backend": "subprocess",
+    # Render long scenes as animation ranges in parallel and join them without
+    # re-encoding (render_chunks of null means one chunk per CPU core)
+    "chunked_render": False,
+    "render_chunks": None,
+    # Render cost model: estimates render time from the script, learns from
+    # measured renders (kept in cost_model_path), renders short jobs first and
+    # warns when a scene is estimated to take longer than cost_warning_seconds
+    "cost_model_path": os.path.join("cache", "render_costs.json"),
+    "cost_warning_seconds": 300,
+    # Stream generated code and reject broken scripts before generation finishes
+    "stream_code": True,
+    # Renders running longer than render_timeout seconds are killed, as are
+    # renders (and dry runs) using more CPU seconds or bytes of address space
+    # than the limits below; null means no limit. CPU and memory limits apply
+    # on Linux and macOS only
+    "render_timeout": 1800,
+    "render_cpu_seconds": None,
+    "render_memory_bytes": None,
+    # Metrics: write per-stage spans to jobs/<id>/spans.jsonl and, if a path is
+    # set, keep a Prometheus text-format file of p50/p95 stage times up to date
+    "metrics": False,
+    "metrics_prometheus_path": None,
+    # Pre-render validation: run the scene with animations skipped before rendering
+    "dry_run": True,
+    "dry_run_timeout": 60,
+    # How many times a failing script is sent back to the generator for a fix
+    "max_repair_attempts": 2,
+    # Storyboard mode: render the last frame of up to storyboard_frames
+    # animations as stills, storyboard_workers at a time (null: one per CPU
+    # core), and wait for approval before the full render; "storyboard" is
+    # the default of the UI's checkbox
+    "storyboard": False,
+    "storyboard_frames": 12,
+    "storyboard_workers": None,
+    # Progressive rendering: show a quick preview first, then render better
+    # versions in the background (qualities: low, medium, high, 4k)
+    "preview_quality": "low",
+    "progressive_render": True,
+    "upgrade_qualities": ["high"],
+    # Play videos inside the window (decoding player_buffer_frames frames ahead)
+    # instead of opening them in the system's video player
+    "embedded_player": True,
+    "player_buffer_frames": 32,
+}
+
+
+def load_config(path=CONFIG_PATH):
+    """Return the default settings merged with overrides from the config file.
+    
+    Settings that hold a dict, like llm_models, are merged key by key, so a file
+    overriding one model keeps the defaults for the others.
+    """
+    config = {key: dict(value) if isinstance(value, dict) else value for key, value in DEFAULTS.items()}
+
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                overrides = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading config: {str(e)}")
+            return config
+
+        for key, value in overrides.items():
+            if isinstance(config.get(key), dict) and isinstance(value, dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+
+    return config
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+job_store.py - Every job's prompt, script, artifacts and outcome in SQLite
+
+Jobs are written to jobs/jobs.db when they are submitted, after every
+pipeline stage and when they finish, so the history survives closing the app
+and a crash loses at most the stage that was running. The database runs in
+WAL mode: writers append to the log without blocking readers, and a crash
+leaves either the old or the new row, never half of one.
+
+Prompts, refined prompts and scripts are indexed with FTS5 for full-text
+search; triggers keep the index in step with the table, and only edits to
+those three columns touch it. Identifiers keep their underscores, so
+`always_redraw` is a single word.
+
+Each row also remembers the last stage the job completed. On startup the UI
+asks the scheduler to resume unfinished jobs from the next stage, so a job
+that crashed while rendering renders again without another LLM call.
+
+Run `python job_store.py "query"` to search the history from a terminal.
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DB_FILE = "jobs.db"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    refined_prompt TEXT,
+    code TEXT,
+    state TEXT NOT NULL,
+    message TEXT,
+    error TEXT,
+    last_stage TEXT,
+    use_cache INTEGER NOT NULL,
+    storyboard INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL DEFAULT 0,
+    feedback TEXT,
+    revisions INTEGER NOT NULL DEFAULT 0,
+    template TEXT,
+    dir TEXT NOT NULL,
+    video_path TEXT,
+    thumbnail_path TEXT,
+    quality TEXT,
+    videos TEXT,
+    from_render_cache INTEGER NOT NULL DEFAULT 0,
+    estimated_seconds REAL,
+    repair_attempts INTEGER NOT NULL DEFAULT 0,
+    script_errors TEXT,
+    timings TEXT,
+    resources TEXT,
+    created REAL NOT NULL,
+    finished REAL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    prompt, refined_prompt, code,
+    content='jobs', content_rowid='rowid',
+    tokenize="unicode61 tokenchars '_'", prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, prompt, refined_prompt, code)
+    VALUES (new.rowid, new.prompt, new.refined_prompt, new.code);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, prompt, refined_prompt, code)
+    VALUES ('delete', old.rowid, old.prompt, old.refined_prompt, old.code);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF prompt, refined_prompt, code ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, prompt, refined_prompt, code)
+    VALUES ('delete', old.rowid, old.prompt, old.refined_prompt, old.code);
+    INSERT INTO jobs_fts (rowid, prompt, refined_prompt, code)
+    VALUES (new.rowid, new.prompt, new.refined_prompt, new.code);
+END;
+"""
+
+COLUMNS = (
+    "id", "prompt", "refined_prompt", "code", "state", "message", "error", "last_stage", "use_cache",
+    "storyboard", "approved", "feedback", "revisions", "template", "dir", "video_path", "thumbnail_path",
+    "quality", "videos", "from_render_cache", "estimated_seconds", "repair_attempts", "script_errors",
+    "timings", "resources", "created", "finished", "updated",
+)
+JSON_COLUMNS = ("videos", "script_errors", "timings", "resources")
+
+# Search matches whole words, and the last word as a prefix while it is typed
+WORD = re.compile(r"\w+")
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query that cannot be a syntax error"""
+    words = WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+class JobStore:
+    """SQLite table of jobs with a full-text index, shared by every worker thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self.writes = 0
+        self.write_seconds = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One connection serialized by the lock; workers write a few small rows per job
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        with self._lock:
+            self._db.executescript(SCHEMA)
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def save(self, job, last_stage=None):
+        """Insert or update a job's row; last_stage records a stage the job just completed"""
+        row = {
+            "id": job.id,
+            "prompt": job.prompt,
+            "refined_prompt": job.refined_prompt,
+            "code": job.code,
+            "state": job.state,
+            "message": job.message,
+            "error": job.error,
+            "last_stage": last_stage,
+            "use_cache": int(job.use_cache),
+            "storyboard": int(job.storyboard),
+            "approved": int(job.approved),
+            "feedback": job.feedback,
+            "revisions": job.revisions,
+            "template": job.template,
+            "dir": job.dir,
+            "video_path": job.video_path,
+            "thumbnail_path": job.thumbnail_path,
+            "quality": job.quality,
+            "videos": job.videos,
+            "from_render_cache": int(job.from_render_cache),
+            "estimated_seconds": job.estimated_seconds,
+            "repair_attempts": job.repair_attempts,
+            "script_errors": job.script_errors,
+            "timings": job.timings,
+            "resources": job.resources,
+            "created": job.created,
+            "finished": job.finished,
+            "updated": time.time(),
+        }
+        for column in JSON_COLUMNS:
+            row[column] = json.dumps(row[column])
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in COLUMNS
+            if column not in ("id", "created", "last_stage")
+        )
+        # A save without a stage keeps the stage recorded before
+        updates += ", last_stage = COALESCE(excluded.last_stage, jobs.last_stage)"
+
+        started = time.perf_counter()
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                [row[column] for column in COLUMNS]
+            )
+            self.writes += 1
+            self.write_seconds += time.perf_counter() - started
+
+    def _rows(self, sql, parameters=()):
+        with self._lock:
+            rows = self._db.execute(sql, parameters).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            for column in JSON_COLUMNS:
+                if column in entry:
+                    entry[column] = json.loads(entry[column]) if entry[column] else None
+            entries.append(entry)
+        return entries
+
+    def get(self, job_id):
+        rows = self._rows("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def recent(self, limit=50):
+        """Return the newest jobs first"""
+        return self._rows("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+
+    def unfinished(self, finished_states):
+        """Return the jobs not in finished_states, oldest first"""
+        placeholders = ", ".join("?" * len(finished_states))
+        return self._rows(
+            f"SELECT * FROM jobs WHERE state NOT IN ({placeholders}) ORDER BY created", tuple(finished_states)
+        )
+
+    def search(self, text, limit=50):
+        """Return jobs matching text in their prompt, refined prompt or script, best first.
+
+        Each entry has a "snippet" of the matching text.
+        """
+        query = fts_query(text)
+        if query is None:
+            return self.recent(limit)
+        # Prompt matches rank above matches in the refined prompt, and those above code
+        return self._rows(
+            "SELECT jobs.*, snippet(jobs_fts, -1, '[', ']', '...', 8) AS snippet "
+            "FROM jobs_fts JOIN jobs ON jobs.rowid = jobs_fts.rowid "
+            "WHERE jobs_fts MATCH ? ORDER BY bm25(jobs_fts, 10.0, 5.0, 1.0) LIMIT ?",
+            (query, limit)
+        )
+
+    def delete(self, job_id):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def summary(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            average = self.write_seconds / self.writes * 1000 if self.writes else 0.0
+        return f"{count} jobs recorded, {self.writes} writes ({average:.2f}ms each)"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def make_job_store(config):
+    if not config["job_store"]:
+        return None
+    return JobStore(config["job_store_path"] or os.path.join(config["jobs_dir"], DB_FILE))
+
+
+def main():
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Search the job history")
+    parser.add_argument("query", nargs="?", default="", help="words to find in prompts and scripts")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="number of jobs to list")
+    args = parser.parse_args()
+
+    config = load_config()
+    store = make_job_store(dict(config, job_store=True))
+    started = time.perf_counter()
+    entries = store.search(args.query, args.limit)
+    seconds = time.perf_counter() - started
+    for entry in entries:
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created"]))
+        print(f"{created}  {entry['state']:<16}{entry['id']}  {entry['prompt'][:60]}")
+        if entry.get("snippet"):
+            print(f"    {' '.join(entry['snippet'].split())}")
+    print(f"{len(entries)} job(s) in {seconds * 1000:.1f}ms; {store.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+limits.py - Resource limits, process-group kills and usage reports for renders
+
+Every manim process starts in its own process group (a new session on POSIX),
+so cancelling a render also kills the ffmpeg and LaTeX processes it started.
+On POSIX the process gets RLIMIT_CPU and RLIMIT_AS (with prlimit right after
+it starts on Linux, which avoids preexec_fn in a threaded program), and its
+CPU time and peak memory are read back with wait4 when it exits. On other
+platforms only the wall-clock timeout and the kill apply.
+
+A process group is only signalled while its leader is unreaped: once reaped,
+the id is free for an unrelated group. So a render first waits for manim to
+exit without reaping it, kills what it left in its group, and reaps it last.
+"""
+
+import os
+import signal
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class ResourceLimits:
+    """CPU seconds and address space allowed to one render process (None: unlimited)"""
+
+    def __init__(self, cpu_seconds=None, memory_bytes=None):
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["render_cpu_seconds"], config["render_memory_bytes"])
+
+    def rlimits(self, include_cpu=True):
+        limits = []
+        if include_cpu and self.cpu_seconds:
+            # The hard limit is a little higher so the soft limit's SIGXCPU is what ends it
+            limits.append((resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 5)))
+        if self.memory_bytes:
+            limits.append((resource.RLIMIT_AS, (self.memory_bytes, self.memory_bytes)))
+        return limits
+
+    def popen_kwargs(self, include_cpu=True):
+        """Keyword arguments for subprocess.Popen that start a process in its own group"""
+        if os.name != "posix":
+            return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        kwargs = {"start_new_session": True}
+        if resource and not hasattr(resource, "prlimit") and self.rlimits(include_cpu):
+            def apply():
+                for limit, values in self.rlimits(include_cpu):
+                    resource.setrlimit(limit, values)
+            kwargs["preexec_fn"] = apply
+        return kwargs
+
+    def apply_to(self, process, include_cpu=True):
+        """Limit a process started with popen_kwargs, where prlimit is available"""
+        if resource and hasattr(resource, "prlimit"):
+            for limit, values in self.rlimits(include_cpu):
+                try:
+                    resource.prlimit(process.pid, limit, values)
+                except (ProcessLookupError, ValueError, OSError):
+                    pass  # Exited already, or the limit is above what we may set
+
+
+def kill_tree(process):
+    """Kill a process started with popen_kwargs together with everything it spawned"""
+    if process.returncode is not None:
+        return  # Reaped; its process group id may belong to another group by now
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass  # Already gone
+
+
+def wait_exited(process):
+    """Wait for process to exit but leave it unreaped, so its process group id stays taken"""
+    if hasattr(os, "waitid"):
+        try:
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        except ChildProcessError:
+            pass  # Already reaped elsewhere
+    else:
+        process.wait()
+
+
+def wait_with_usage(process):
+    """Wait for process to exit; return its resource usage as a dict, or None if unavailable"""
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()  # Already reaped elsewhere
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if os.uname().sysname == "Darwin" else 1024
+    return {
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "max_rss_bytes": usage.ru_maxrss * scale,
+    }
+
+
+def describe_usage(usage):
+    if not usage:
+        return ""
+    return f"used {usage['cpu_seconds']:.1f}s CPU, {usage['max_rss_bytes'] / (1024 * 1024):.0f} MB peak memory"
+
+
+def describe_kill(reason, usage):
+    """Describe why a render was killed and what it had used by then"""
+    return f"{reason} ({describe_usage(usage)})" if usage else reason
+
+
+def explain_exit(returncode, output, limits):
+    """Return why a render died if a resource limit killed it, else None"""
+    cpu_signals = [-getattr(signal, name) for name in ("SIGXCPU", "SIGKILL") if hasattr(signal, name)]
+    if limits.cpu_seconds and returncode in cpu_signals:
+        return f"CPU limit of {limits.cpu_seconds}s exceeded"
+    if limits.memory_bytes and "MemoryError" in output:
+        return f"Memory limit of {limits.memory_bytes / (1024 * 1024):.0f} MB exceeded"
+    return None
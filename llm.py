@@ -0,0 +1,499 @@
+"""
+llm.py - The language model backends the pipeline talks to
+
+A backend is created once and shared by every job, so its clients and
+connections are reused instead of being set up again for each call. Each
+pipeline stage (refine, generate, repair) can use its own model.
+
+GeminiBackend keeps one google.generativeai model object per model name.
+OpenAIBackend speaks the OpenAI chat completions protocol to any compatible
+server (a local model server, a proxy, or a stand-in) over plain http.client
+with one keep-alive connection per worker thread.
+
+GuardedBackend wraps either one. Identical requests in flight at the same
+time share a single call, a token bucket keeps the request rate within the
+API quota, and transient errors (rate limits, overloaded or unreachable
+servers) are retried with jittered exponential backoff.
+"""
+
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+STAGES = ("refine", "generate", "repair")
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+
+# HTTP statuses worth retrying: rate limited, or the server is failing for now
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 60
+
+
+class LLMError(RuntimeError):
+    """The backend could not produce a response"""
+
+    def __init__(self, message, transient=False, retry_after=None):
+        super().__init__(message)
+        self.transient = transient
+        self.retry_after = retry_after
+
+
+class LLMResponse:
+    """A finished response; text is None if the model returned nothing"""
+
+    def __init__(self, text, prompt_tokens=None, response_tokens=None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+        # Filled in by GuardedBackend
+        self.shared = False
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+
+def is_transient(error):
+    """Return whether a failed request may succeed if tried again"""
+    if isinstance(error, LLMError):
+        return error.transient
+    # google.api_core errors carry the HTTP status as .code
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class Backend:
+    """Interface every backend implements"""
+
+    name = None
+
+    def __init__(self, models=None):
+        self.models = dict(models or {})
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def model_for(self, stage):
+        return self.models.get(stage, DEFAULT_MODEL)
+
+    def cache_name(self, stage):
+        """Identifies the model in LLM cache keys"""
+        return self.model_for(stage)
+
+    def complete(self, stage, prompt):
+        """Return the LLMResponse for prompt"""
+        raise NotImplementedError
+
+    def stream(self, stage, prompt):
+        """Yield the response text piece by piece; the last item is the complete LLMResponse"""
+        response = self.complete(stage, prompt)
+        yield response.text
+        yield response
+
+    def summary(self):
+        with self._lock:
+            return f"{self.name}: {self.requests} requests over {self.connections} connection(s)"
+
+    def close(self):
+        pass
+
+
+class GeminiBackend(Backend):
+    """Google Gemini through google.generativeai, reusing one model object per model name"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, models=None):
+        super().__init__(models)
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self._models = {}
+
+    def _model(self, stage):
+        name = self.model_for(stage)
+        with self._lock:
+            self.requests += 1
+            if name not in self._models:
+                # The model object creates its client on first use and keeps it
+                self._models[name] = self.genai.GenerativeModel(name)
+                self.connections += 1
+            return self._models[name]
+
+    @staticmethod
+    def _tokens(response):
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return None, None
+        return metadata.prompt_token_count or 0, metadata.candidates_token_count or 0
+
+    def complete(self, stage, prompt):
+        response = self._model(stage).generate_content(prompt)
+        text = response.text if response and hasattr(response, "text") else None
+        return LLMResponse(text, *self._tokens(response))
+
+    def stream(self, stage, prompt):
+        text = ""
+        chunk = None
+        for chunk in self._model(stage).generate_content(prompt, stream=True):
+            text += chunk.text
+            yield chunk.text
+        # The last chunk carries the token counts for the whole response
+        yield LLMResponse(text, *self._tokens(chunk))
+
+
+class OpenAIBackend(Backend):
+    """Any server implementing POST {base_url}/chat/completions"""
+
+    name = "openai"
+
+    def __init__(self, base_url, api_key=None, models=None, timeout=120):
+        super().__init__(models)
+        parts = urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+        self._open = []
+
+    def cache_name(self, stage):
+        return f"{self.base_url}#{self.model_for(stage)}"
+
+    def _connection(self):
+        """Return this thread's keep-alive connection, opening it if needed"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = connection_class(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self.connections += 1
+                self._open.append(connection)
+        return connection
+
+    def _drop_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection:
+            connection.close()
+            self._local.connection = None
+
+    def _post(self, stage, prompt, stream):
+        body = {
+            "model": self.model_for(stage),
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+        }
+        if stream:
+            body["stream_options"] = {"include_usage": True}
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        with self._lock:
+            self.requests += 1
+        # A kept-alive connection the server has closed fails on first use; retry once on a new one
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request("POST", self.path, json.dumps(body), headers)
+                response = connection.getresponse()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionError) as e:
+                self._drop_connection()
+                if attempt:
+                    raise LLMError(f"Could not reach {self.base_url}: {str(e)}", transient=True)
+            except OSError as e:
+                self._drop_connection()
+                raise LLMError(f"Could not reach {self.base_url}: {str(e)}", transient=True)
+
+        if response.status != 200:
+            detail = response.read().decode("utf-8", "replace")
+            retry_after = response.getheader("Retry-After")
+            raise LLMError(
+                f"{self.base_url} answered {response.status}: {detail[:500]}",
+                transient=response.status in TRANSIENT_STATUSES,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        return response
+
+    @staticmethod
+    def _tokens(usage):
+        if not usage:
+            return None, None
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    def complete(self, stage, prompt):
+        data = json.loads(self._post(stage, prompt, stream=False).read())
+        try:
+            text = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            text = None
+        return LLMResponse(text, *self._tokens(data.get("usage")))
+
+    def stream(self, stage, prompt):
+        response = self._post(stage, prompt, stream=True)
+        text = ""
+        usage = None
+        finished = False
+        try:
+            # Server-sent events: "data: {json}" lines, ending with "data: [DONE]"
+            for line in response:
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                usage = event.get("usage") or usage
+                for choice in event.get("choices", []):
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        text += piece
+                        yield piece
+            response.read()  # Drain the rest so the connection can be reused
+            finished = True
+        finally:
+            if not finished:
+                # Abandoned mid-response (e.g. StreamAborted); the connection is unusable
+                self._drop_connection()
+        yield LLMResponse(text, *self._tokens(usage))
+
+    def close(self):
+        with self._lock:
+            for connection in self._open:
+                connection.close()
+            self._open = []
+
+
+class TokenBucket:
+    """Allows rate requests per second on average, and bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; return the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Claiming the token now, even into debt, keeps waiting callers in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class _Flight:
+    """One outstanding call that identical requests wait on"""
+
+    def __init__(self):
+        self.finished = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class GuardedBackend(Backend):
+    """Adds request coalescing, rate limiting and retries to another backend"""
+
+    def __init__(self, backend, requests_per_minute=None, burst=1, max_retries=4, backoff_seconds=1.0):
+        super().__init__()
+        self.backend = backend
+        self.name = backend.name
+        self.bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._flights = {}
+        self.coalesced = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.retries = 0
+
+    def model_for(self, stage):
+        return self.backend.model_for(stage)
+
+    def cache_name(self, stage):
+        return self.backend.cache_name(stage)
+
+    def _join(self, stage, prompt):
+        """Return (flight, leading); only the leading caller makes the call"""
+        key = (self.cache_name(stage), prompt)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, stage, prompt, flight, response=None, error=None):
+        with self._lock:
+            self._flights.pop((self.cache_name(stage), prompt), None)
+        flight.response = response
+        flight.error = error
+        flight.finished.set()
+
+    def _follow(self, flight):
+        """Wait for another caller's identical request; None if it was abandoned"""
+        flight.finished.wait()
+        if flight.error:
+            raise flight.error
+        if flight.response is None:
+            with self._lock:
+                self.coalesced -= 1
+            return None
+        response = LLMResponse(flight.response.text, flight.response.prompt_tokens, flight.response.response_tokens)
+        response.shared = True
+        return response
+
+    def _throttle(self):
+        if not self.bucket:
+            return 0.0
+        waited = self.bucket.acquire()
+        if waited:
+            with self._lock:
+                self.throttled += 1
+                self.throttled_seconds += waited
+        return waited
+
+    def _backoff(self, error, attempt):
+        """Sleep before another attempt, or re-raise if error is final"""
+        if attempt >= self.max_retries or not is_transient(error):
+            if attempt and is_transient(error):
+                raise LLMError(f"Giving up after {attempt} retries: {str(error)}") from error
+            raise error
+        with self._lock:
+            self.retries += 1
+        # Full jitter: spread the retries of requests that failed together
+        delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, self.backoff_seconds * 2 ** attempt))
+        time.sleep(max(delay, getattr(error, "retry_after", None) or 0))
+
+    def _call(self, stage, prompt):
+        throttled = 0.0
+        attempt = 0
+        while True:
+            throttled += self._throttle()
+            try:
+                response = self.backend.complete(stage, prompt)
+                break
+            except Exception as e:
+                self._backoff(e, attempt)
+                attempt += 1
+        response.retries = attempt
+        response.throttled_seconds = throttled
+        return response
+
+    def complete(self, stage, prompt):
+        with self._lock:
+            self.requests += 1
+        while True:
+            flight, leading = self._join(stage, prompt)
+            if not leading:
+                response = self._follow(flight)
+                if response:
+                    return response
+                continue
+            try:
+                response = self._call(stage, prompt)
+            except Exception as e:
+                self._land(stage, prompt, flight, error=e)
+                raise
+            self._land(stage, prompt, flight, response)
+            return response
+
+    def stream(self, stage, prompt):
+        with self._lock:
+            self.requests += 1
+        while True:
+            flight, leading = self._join(stage, prompt)
+            if leading:
+                break
+            # Callers of an identical request get the whole text in one piece
+            response = self._follow(flight)
+            if response:
+                yield response.text
+                yield response
+                return
+
+        throttled = 0.0
+        attempt = 0
+        response = None
+        try:
+            while True:
+                throttled += self._throttle()
+                started = False
+                pieces = self.backend.stream(stage, prompt)
+                try:
+                    for piece in pieces:
+                        if isinstance(piece, LLMResponse):
+                            response = piece
+                        else:
+                            started = True
+                            yield piece
+                    break
+                except Exception as e:
+                    # Text already handed out cannot be taken back, so only retry before it
+                    if started:
+                        raise
+                    self._backoff(e, attempt)
+                    attempt += 1
+                finally:
+                    pieces.close()
+        except GeneratorExit:
+            # The caller stopped reading; callers waiting on us make their own request
+            self._land(stage, prompt, flight)
+            raise
+        except Exception as e:
+            self._land(stage, prompt, flight, error=e)
+            raise
+        self._land(stage, prompt, flight, response)
+        response.retries = attempt
+        response.throttled_seconds = throttled
+        yield response
+
+    def summary(self):
+        with self._lock:
+            return (
+                f"{self.backend.summary()}; {self.coalesced} calls saved by coalescing, "
+                f"{self.throttled} delayed by the rate limit ({self.throttled_seconds:.1f}s), "
+                f"{self.retries} retries"
+            )
+
+    def close(self):
+        self.backend.close()
+
+
+def make_backend(config, api_key=None):
+    """Create the backend selected in config; api_key is the Gemini key"""
+    models = config["llm_models"]
+    if config["llm_backend"] == "openai":
+        backend = OpenAIBackend(
+            config["llm_base_url"],
+            config["llm_api_key"] or os.environ.get("OPENAI_API_KEY"),
+            models,
+            config["llm_timeout"]
+        )
+    else:
+        backend = GeminiBackend(api_key, models)
+    return GuardedBackend(
+        backend,
+        config["llm_requests_per_minute"],
+        config["llm_burst"],
+        config["llm_max_retries"],
+        config["llm_backoff_seconds"]
+    )
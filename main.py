@@ -1,13 +1,27 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, simpledialog, messagebox
-import google.generativeai as genai
 import subprocess
 import os
 import threading
 import time
 from PIL import Image, ImageTk
-import glob
-import json
+
+import pipeline
+from cache import LLMCache, RenderCache
+from config import load_config
+from llm import make_backend
+from player import PlayerStats, VideoPlayer
+from scheduler import JobScheduler
+from streaming import strip_fences
+from thumbnails import STRIP_FRAMES, THUMBNAIL_SIZE, ThumbnailCache
+from ui_events import CoalescingQueue, UiStats
+
+# How often job updates are applied, and how long one tick may spend drawing them
+UI_TICK_MS = 50
+REDRAW_BUDGET = 0.010
+# Jobs listed from the history, and how long typing pauses before a search runs
+HISTORY_ROWS = 50
+SEARCH_DEBOUNCE_MS = 150
 
 class ApiKeyDialog(simpledialog.Dialog):
     """Dialog for entering the Google Gemini API key"""
@@ -63,11 +77,46 @@ class ManimUI:
         self.total_steps = 4
         self.api_key = None
         
+        self.config = load_config()
+        self.llm_cache = LLMCache(self.config["llm_cache_dir"], self.config["llm_cache_max_bytes"])
+        # Drop responses produced by prompt templates that have since changed
+        self.llm_cache.invalidate_templates({
+            "refine": pipeline.REFINE_SYSTEM_PROMPT,
+            "generate": pipeline.CODE_PROMPT_TEMPLATE,
+        })
+        self.render_cache = RenderCache(self.config["render_cache_dir"], self.config["render_cache_max_bytes"])
+        self.thumbnails = ThumbnailCache()
+        # Videos whose thumbnail is loading (True) or could not be loaded (False)
+        self.thumbnail_loads = {}
+        self.player = None
+        self.player_job_id = None
+        self.player_stats = PlayerStats()
+        
+        # Workers report job updates here; the Tk thread draws the latest one per job
+        self.ui_events = CoalescingQueue(key=lambda job: job.id)
+        self.ui_stats = UiStats()
+        self.scheduler = JobScheduler(self.config, self.llm_cache, self.render_cache, self.ui_events)
+        self.selected_job_id = None
+        self.shown_code = ""
+        
         # Load or request API key before setting up UI
-        self.load_or_request_api_key()
+        if self.config["llm_backend"] == "gemini":
+            self.load_or_request_api_key()
+        else:
+            # Other backends take their key from config.json or the environment
+            self.scheduler.context.llm = make_backend(self.config)
         
         self.setup_ui()
         
+        # Pick up where the last session left off
+        self.scheduler.resume()
+        self.show_history()
+        
+        # Apply job updates published by the worker pool
+        self.next_tick = time.perf_counter() + UI_TICK_MS / 1000
+        self.root.after(UI_TICK_MS, self.process_job_events)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
     def load_or_request_api_key(self):
         """Load API key from file or request from user if not found"""
         # Create directory if it doesn't exist
@@ -79,7 +128,7 @@ class ManimUI:
                 with open("api/key.txt", "r") as f:
                     self.api_key = f.read().strip()
                     if self.api_key:
-                        genai.configure(api_key=self.api_key)
+                        self.use_api_key()
                         return
             except Exception as e:
                 print(f"Error reading API key: {str(e)}")
@@ -102,13 +151,20 @@ class ManimUI:
                 f.write(new_key)
             
             self.api_key = new_key
-            genai.configure(api_key=self.api_key)
+            self.use_api_key()
         else:
             # If no key provided, exit application
             if not self.api_key:  # Only exit if no previous key
                 messagebox.showerror("API Key Required", "An API key is required to use this application.")
                 self.root.destroy()
     
+    def use_api_key(self):
+        """Give the pipeline a Gemini client for the current key, replacing the old one"""
+        old_llm = self.scheduler.context.llm
+        self.scheduler.context.llm = make_backend(self.config, self.api_key)
+        if old_llm:
+            old_llm.close()
+    
     def setup_ui(self):
         # Main frame
         main_frame = ttk.Frame(self.root, padding="20")
@@ -177,6 +233,24 @@ class ManimUI:
         )
         self.generate_button.pack(side=tk.RIGHT, padx=10)
         
+        # Cache bypass for a fresh take on a previously generated concept
+        self.fresh_take_var = tk.BooleanVar(value=False)
+        fresh_take_check = ttk.Checkbutton(
+            controls_frame,
+            text="Fresh take (skip cache)",
+            variable=self.fresh_take_var
+        )
+        fresh_take_check.pack(side=tk.RIGHT, padx=10)
+        
+        # Review keyframe stills before committing to the full render
+        self.storyboard_var = tk.BooleanVar(value=self.config["storyboard"])
+        storyboard_check = ttk.Checkbutton(
+            controls_frame,
+            text="Storyboard first",
+            variable=self.storyboard_var
+        )
+        storyboard_check.pack(side=tk.RIGHT, padx=10)
+        
         # Progress frame
         progress_frame = ttk.Frame(main_frame)
         progress_frame.pack(fill=tk.X, pady=10)
@@ -192,6 +266,67 @@ class ManimUI:
         self.progress_label = ttk.Label(progress_frame, text="")
         self.progress_label.pack(pady=5)
         
+        # Job list
+        jobs_frame = ttk.LabelFrame(main_frame, text="Jobs", padding="10")
+        jobs_frame.pack(fill=tk.X, pady=10)
+        
+        # Full-text search over every recorded prompt and script
+        search_frame = ttk.Frame(jobs_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_after_id = None
+        
+        self.job_list = ttk.Treeview(
+            jobs_frame,
+            columns=("prompt", "state", "message"),
+            show="headings",
+            height=4,
+            selectmode="browse"
+        )
+        self.job_list.heading("prompt", text="Prompt")
+        self.job_list.heading("state", text="State")
+        self.job_list.heading("message", text="Details")
+        self.job_list.column("prompt", width=420)
+        self.job_list.column("state", width=100, anchor="center")
+        self.job_list.column("message", width=300)
+        self.job_list.pack(fill=tk.X)
+        self.job_list.bind("<<TreeviewSelect>>", self.on_job_selected)
+        
+        job_buttons = ttk.Frame(jobs_frame)
+        job_buttons.pack(fill=tk.X, pady=(5, 0))
+        
+        cancel_upgrades_button = ttk.Button(
+            job_buttons,
+            text="Cancel Background Renders",
+            command=self.cancel_upgrades
+        )
+        cancel_upgrades_button.pack(side=tk.RIGHT)
+        
+        cancel_job_button = ttk.Button(
+            job_buttons,
+            text="Cancel Job",
+            command=self.cancel_job
+        )
+        cancel_job_button.pack(side=tk.RIGHT, padx=(0, 5))
+        
+        revise_button = ttk.Button(
+            job_buttons,
+            text="Revise...",
+            command=self.revise_storyboard
+        )
+        revise_button.pack(side=tk.LEFT)
+        
+        approve_button = ttk.Button(
+            job_buttons,
+            text="Approve Render",
+            command=self.approve_storyboard
+        )
+        approve_button.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Output frame
         output_frame = ttk.LabelFrame(main_frame, text="Generated Manim Code", padding="10")
         output_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -211,6 +346,9 @@ class ManimUI:
         
         self.video_label = ttk.Label(self.video_frame)
         self.video_label.pack(fill=tk.BOTH, expand=True)
+        # Hovering over the preview scrubs through frames of the video
+        self.video_label.bind("<Motion>", self.scrub_video)
+        self.video_label.bind("<Leave>", self.end_scrub)
         
         # Footer
         footer = ttk.Label(main_frame, text="Powered by Manim and Google Gemini", font=("Arial", 8))
@@ -220,7 +358,7 @@ class ManimUI:
         """Show settings dialog with API key management option"""
         settings_window = tk.Toplevel(self.root)
         settings_window.title("Settings")
-        settings_window.geometry("400x300")
+        settings_window.geometry("400x700")
         settings_window.transient(self.root)
         settings_window.grab_set()
         
@@ -243,6 +381,65 @@ class ManimUI:
             command=lambda: self.change_api_key(settings_window)
         )
         change_key_btn.pack(pady=5)
+        
+        # Cache section
+        cache_frame = ttk.LabelFrame(settings_frame, text="Caches", padding="10")
+        cache_frame.pack(fill=tk.X, pady=10)
+        
+        cache_stats_label = ttk.Label(cache_frame, text=self.format_cache_stats())
+        cache_stats_label.pack(anchor="w", pady=(0, 10))
+        
+        context = self.scheduler.context
+        ttk.Label(
+            cache_frame,
+            text=(
+                f"Streaming: {context.stream_stats.summary()}\n"
+                f"Validation: {context.validation_stats.summary()}\n"
+                f"Thumbnails: {self.thumbnails.summary()}\n"
+                f"Player: {self.player_stats.summary()}\n"
+                f"UI: {self.ui_stats.summary(self.ui_events)}\n"
+                f"Templates: {context.templates.summary() if context.templates else 'off'}\n"
+                f"Render cost model: {context.cost_model.summary()}\n"
+                f"Stages: {self.scheduler.context.tracer.summary()}\n"
+                f"Job history: {context.job_store.summary() if context.job_store else 'off'}\n"
+                f"LLM: {context.llm.summary() if context.llm else 'not configured'}"
+            ),
+            wraplength=340
+        ).pack(anchor="w", pady=(0, 10))
+        
+        clear_cache_btn = ttk.Button(
+            cache_frame,
+            text="Clear Cache",
+            command=lambda: self.clear_cache(cache_stats_label)
+        )
+        clear_cache_btn.pack(pady=5)
+    
+    def format_cache_stats(self):
+        """Summarize LLM and render cache usage for the settings dialog"""
+        lines = []
+        for name, cache in (("Responses", self.llm_cache), ("Renders", self.render_cache)):
+            stats = cache.stats()
+            lines.append(
+                f"{name}: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['evictions']} evicted\n"
+                f"    {stats['entries']} entries, "
+                f"{stats['bytes'] / (1024 * 1024):.1f} of {stats['max_bytes'] / (1024 * 1024):.0f} MB"
+            )
+        if self.scheduler.context.tex_cache:
+            lines.append(f"LaTeX: {self.scheduler.context.tex_cache.summary()}")
+        stats = self.scheduler.context.artifacts.stats()
+        lines.append(
+            f"Job files: {stats['entries']} jobs, {stats['evictions']} evicted\n"
+            f"    {stats['bytes'] / (1024 * 1024):.1f} of {stats['max_bytes'] / (1024 * 1024):.0f} MB"
+        )
+        return "\n".join(lines)
+    
+    def clear_cache(self, stats_label=None):
+        """Remove every cached LLM response and render"""
+        self.llm_cache.clear()
+        self.render_cache.clear()
+        if stats_label:
+            stats_label.config(text=self.format_cache_stats())
     
     def change_api_key(self, parent_window=None):
         """Show dialog to change API key"""
@@ -255,7 +452,7 @@ class ManimUI:
                 f.write(new_key)
             
             self.api_key = new_key
-            genai.configure(api_key=self.api_key)
+            self.use_api_key()
             
             if parent_window:
                 parent_window.destroy()
@@ -270,6 +467,7 @@ class ManimUI:
             "Processing": "#2196F3",  # Blue
             "Complete": "#4CAF50",  # Green
             "Error": "#F44336",  # Red
+            "Review": "#FF9800",  # Orange
         }
         
         color = status_colors.get(status.split()[0], "#2196F3")
@@ -279,192 +477,284 @@ class ManimUI:
         
         if progress is not None:
             self.progress["value"] = progress
-            
-        self.root.update_idletasks()
     
     def start_generation_process(self):
         # Check if API key is available
-        if not self.api_key:
+        if self.scheduler.context.llm is None:
             self.request_api_key()
             if not self.api_key:  # User canceled
                 return
         
-        # Disable button during processing
-        self.generate_button.config(state="disabled")
-        self.progress["value"] = 0
-        
-        # Clear previous outputs
-        self.code_output.delete(1.0, tk.END)
-        self.video_label.config(image="")
-        
         # Get user input
         user_input = self.prompt_input.get(1.0, tk.END).strip()
         
         if not user_input:
             self.update_status("Error: No input provided", 0)
-            self.generate_button.config(state="normal")
             return
         
-        # Start generation in a separate thread
-        threading.Thread(target=self.generate_visualization, args=(user_input,), daemon=True).start()
+        use_cache = not self.fresh_take_var.get()
+        
+        # Queue the job; the worker pool runs as many jobs at once as it has workers
+        job = self.scheduler.submit(user_input, use_cache, self.storyboard_var.get())
+        self.job_list.insert("", 0, iid=job.id, values=(user_input.replace("\n", " "), job.state, job.message))
+        self.job_list.selection_set(job.id)
     
-    def generate_visualization(self, user_input):
-        try:
-            # Step 1: Refine prompt
-            self.update_status("Processing: Refining prompt", 25)
-            refined_prompt = self.refine_prompt(user_input)
-            
-            if not refined_prompt:
-                self.update_status("Error: Failed to refine prompt", 0)
-                self.generate_button.config(state="normal")
-                return
-            
-            # Step 2: Generate Manim code
-            self.update_status("Processing: Generating Manim code", 50)
-            manim_code = self.generate_manim_code(refined_prompt)
-            
-            if not manim_code:
-                self.update_status("Error: Failed to generate code", 0)
-                self.generate_button.config(state="normal")
-                return
-            
-            # Clean and display code
-            clean_code = self.clean_text(manim_code)
-            self.code_output.insert(tk.END, clean_code)
-            
-            # Step 3: Save script
-            self.update_status("Processing: Saving Manim script", 75)
-            self.save_manim_script(clean_code)
-            
-            # Step 4: Run Manim script
-            self.update_status("Processing: Rendering visualization", 90)
-            success = self.run_manim_script()
-            
-            if success:
-                self.update_status("Complete: Visualization generated", 100)
-                self.display_video()
-            else:
-                self.update_status("Error: Failed to render visualization", 0)
-            
-        except Exception as e:
-            self.update_status(f"Error: {str(e)}", 0)
+    def process_job_events(self):
+        """Apply pending job updates from the worker pool on the Tk thread, within the redraw budget"""
+        tick_start = time.perf_counter()
+        self.ui_stats.tick_lag.record(max(0.0, tick_start - self.next_tick))
+        
+        while time.perf_counter() - tick_start < REDRAW_BUDGET:
+            pending = self.ui_events.pop()
+            if pending is None:
+                break
+            job, queued_at = pending
+            self.refresh_job(job)
+            self.ui_stats.event_latency.record(time.perf_counter() - queued_at)
+        
+        self.ui_stats.tick_seconds.record(time.perf_counter() - tick_start)
+        self.next_tick = time.perf_counter() + UI_TICK_MS / 1000
+        self.root.after(UI_TICK_MS, self.process_job_events)
+    
+    def refresh_job(self, job):
+        """Update a job's row, and the detail panes if it is the selected job"""
+        if self.job_list.exists(job.id):
+            self.job_list.set(job.id, "state", job.state)
+            self.job_list.set(job.id, "message", job.message)
+        
+        if job.id == self.selected_job_id:
+            self.show_job(job)
+    
+    def on_search_typed(self, event=None):
+        """Search once typing pauses, not on every key"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.show_history)
+    
+    def show_history(self):
+        """List the recorded jobs matching the search text, or the most recent ones"""
+        self.search_after_id = None
+        store = self.scheduler.context.job_store
+        if not store:
+            return
         
-        # Re-enable button
-        self.root.after(0, lambda: self.generate_button.config(state="normal"))
+        entries = store.search(self.search_var.get(), HISTORY_ROWS)
+        self.job_list.delete(*self.job_list.get_children())
+        for entry in entries:
+            # Jobs of this session show their live state
+            job = self.scheduler.jobs.get(entry["id"])
+            state, message = (job.state, job.message) if job else (entry["state"], entry["message"])
+            if entry.get("snippet"):
+                message = " ".join(entry["snippet"].split())
+            self.job_list.insert(
+                "", tk.END, iid=entry["id"], values=(entry["prompt"].replace("\n", " "), state, message)
+            )
+        if self.selected_job_id and self.job_list.exists(self.selected_job_id):
+            self.job_list.selection_set(self.selected_job_id)
     
-    def refine_prompt(self, user_input):
-        """Send user input to Gemini Flash to create a better prompt for Manim code generation."""
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        system_prompt = (
-            "You are an AI that helps generate precise prompts for AI code generation. "
-            "Given a user's math concept description, refine it into a well-structured prompt "
-            "that asks for a Manim script to visualize the concept. "
-            "Do NOT generate code, only output the improved prompt."
-        )
-
-        response = model.generate_content(f"{system_prompt}\nUser Input: {user_input}")
-
-        if response and hasattr(response, 'text'):
-            return response.text.strip()
-        else:
-            return None
-
-    def generate_manim_code(self, refined_prompt):
-        """Send the refined prompt to Gemini Flash to generate only Manim code."""
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        final_prompt = (
-            f"{refined_prompt}\n\n"
-            "Output only the Python Manim script. Do not add explanations or extra text. "
-            "The script should define a Manim class called 'AutoScene'. "
-            "Ensure that text elements are well-aligned and old text disappears before new text appears. "
-            "Ensure proper alignment, remove previous text before adding new text, and include smooth transitions."
-            "Take note of frame space and don't overflow out of frame. "
-            "Try to utilize all the frame area without overlapping. "
-        )
-
-        response = model.generate_content(final_prompt)
-
-        if response and hasattr(response, 'text'):
-            return response.text.strip()
-        else:
-            return None
-
-    def clean_text(self, text: str) -> str:
-        prefix = "```python"
-        suffix = "```"
+    def on_job_selected(self, event=None):
+        selection = self.job_list.selection()
+        if not selection:
+            return
         
-        if text.startswith(prefix):
-            text = text[len(prefix):]
-        if text.endswith(suffix):
-            text = text[:-len(suffix)]
+        job = self.scheduler.load_job(selection[0])
+        # Re-selecting the shown job, e.g. after a search, must not reset its panes
+        if job and job.id != self.selected_job_id:
+            self.selected_job_id = job.id
+            self.code_output.delete(1.0, tk.END)
+            self.shown_code = ""
+            self.clear_video()
+            self.show_job(job)
+            self.scheduler.context.artifacts.touch(job.id)
+    
+    def show_job(self, job):
+        """Show the status, code and video of job in the detail panes"""
+        if job.state == pipeline.FAILED:
+            self.update_status(f"Error: {job.message}", 0)
+        elif job.state == pipeline.COMPLETE:
+            self.update_status(f"Complete: {job.message}", 100)
+        elif job.state == pipeline.REVIEW:
+            self.update_status(f"Review: {job.message}", job.progress)
+        else:
+            self.update_status(f"Processing: {job.message}", job.progress)
         
-        return text.strip()
-
-    def save_manim_script(self, code, filename="generated_manim.py"):
-        """Save the AI-generated Manim script to a file."""
-        with open(filename, "w", encoding="utf-8") as file:
-            file.write(code)
-
-    def run_manim_script(self, filename="generated_manim.py", scene_name="AutoScene"):
-        """Run the Manim script and render a video."""
-        try:
-            command = f"manim -pql {filename} {scene_name}"
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            return result.returncode == 0
-        except Exception:
-            return False
+        # Append streamed code as it arrives; replace it with the cleaned script at the end
+        code = job.code or strip_fences(job.partial_code)
+        if code != self.shown_code:
+            if self.shown_code and code.startswith(self.shown_code):
+                self.code_output.insert(tk.END, code[len(self.shown_code):])
+            else:
+                self.code_output.delete(1.0, tk.END)
+                self.code_output.insert(tk.END, code)
+            self.shown_code = code
+        
+        # Redisplay when a background render swaps in a better video, unless it is playing
+        playing = self.player and self.player_job_id == job.id
+        shown = getattr(self.video_label, "shown", None)
+        if job.state == pipeline.COMPLETE and not playing and shown != (job.id, job.video_path):
+            self.display_video(job)
+        elif job.state == pipeline.REVIEW and getattr(self.video_label, "storyboard", None) != (job.id, job.revisions):
+            self.show_storyboard(job)
+    
+    def cancel_job(self):
+        """Stop the selected job, killing its render if one is running"""
+        if self.selected_job_id:
+            self.scheduler.cancel_job(self.selected_job_id)
+    
+    def approve_storyboard(self):
+        """Start the full render of the selected job's storyboard"""
+        if self.selected_job_id:
+            self.scheduler.approve_storyboard(self.selected_job_id)
     
-    def display_video(self):
+    def revise_storyboard(self):
+        """Send the selected job's storyboard back to the generator with feedback"""
+        job = self.scheduler.jobs.get(self.selected_job_id)
+        if not job or job.state != pipeline.REVIEW:
+            return
+        feedback = simpledialog.askstring("Revise Storyboard", "What should change?", parent=self.root)
+        if feedback and feedback.strip():
+            self.clear_video()
+            self.scheduler.revise_storyboard(job.id, feedback.strip())
+    
+    def cancel_upgrades(self):
+        """Stop the higher quality renders queued for the selected job"""
+        if self.selected_job_id:
+            self.scheduler.cancel_upgrades(self.selected_job_id)
+    
+    def clear_video(self):
+        self.close_player()
+        self.video_label.config(image="")
+        self.video_label.image = None
+        self.video_label.shown = None
+        self.video_label.strip = None
+        self.video_label.storyboard = None
+        if getattr(self, "play_button", None):
+            self.play_button.destroy()
+            self.play_button = None
+    
+    def display_video(self, job):
         """Display the generated video in the UI."""
+        self.show_video(job)
+    
+    def show_video(self, job):
+        """Show the job's thumbnail with a play button over it"""
         try:
-            # Find the most recent mp4 file in the media/videos directory
-            media_dir = "./media/videos/generated_manim/480p15/"
-            video_files = glob.glob(f"{media_dir}*.mp4")
-            
-            if not video_files:
-                self.update_status("Error: No video file found", 0)
+            img = self.thumbnails.cached(job.video_path, THUMBNAIL_SIZE)
+            if img is None and job.video_path not in self.thumbnail_loads:
+                # Load it off the Tk thread; the job is redrawn once it is ready
+                self.thumbnail_loads[job.video_path] = True
+                threading.Thread(target=self.load_thumbnail, args=(job,), daemon=True).start()
                 return
-                
-            # Sort files by creation time (newest first)
-            latest_video = max(video_files, key=os.path.getctime)
-            
-            # Extract a thumbnail from the video using ffmpeg
-            thumbnail_path = "temp_thumbnail.png"
-            subprocess.run(
-                f"ffmpeg -i \"{latest_video}\" -ss 00:00:01 -vframes 1 \"{thumbnail_path}\" -y",
-                shell=True,
-                capture_output=True
-            )
+            if img is None and self.thumbnail_loads[job.video_path]:
+                return  # Still loading
             
-            # Load the thumbnail and display it
-            if os.path.exists(thumbnail_path):
-                img = Image.open(thumbnail_path)
-                # Resize to fit the frame
-                width, height = 640, 360
-                img = img.resize((width, height), Image.LANCZOS)
+            if img is not None:
                 photo = ImageTk.PhotoImage(img)
                 
+                self.clear_video()
                 self.video_label.config(image=photo)
                 self.video_label.image = photo  # Keep a reference to prevent garbage collection
+                self.video_label.shown = (job.id, job.video_path)
+                
+                # Decode the scrub strip off the UI thread
+                threading.Thread(
+                    target=self.thumbnails.strip,
+                    args=(job.video_path, THUMBNAIL_SIZE, STRIP_FRAMES),
+                    daemon=True
+                ).start()
                 
                 # Add a play button overlay
-                play_button = ttk.Button(
+                resolution = pipeline.QUALITY_LEVELS[job.quality][1]
+                self.play_button = ttk.Button(
                     self.video_frame, 
-                    text="Play Video", 
-                    command=lambda: self.play_video(latest_video)
+                    text=f"Play Video ({resolution})", 
+                    command=lambda: self.play_video(job.video_path, job.id)
                 )
-                play_button.place(relx=0.5, rely=0.5, anchor="center")
-                
-                # Clean up
-                os.remove(thumbnail_path)
+                self.play_button.place(relx=0.5, rely=0.5, anchor="center")
             else:
                 self.update_status("Error: Could not generate thumbnail", 0)
         except Exception as e:
             self.update_status(f"Error displaying video: {str(e)}", 0)
     
-    def play_video(self, video_path):
+    def load_thumbnail(self, job):
+        """Load a job's thumbnail on a worker thread, then post the job to be redrawn"""
+        # The display span times the load and decode, not the Tk dispatch that starts it
+        with self.scheduler.context.tracer.span(job, "display"):
+            image = self.thumbnails.get(job.video_path, THUMBNAIL_SIZE, job.thumbnail_path)
+        if image is None:
+            self.thumbnail_loads[job.video_path] = False  # Failed; report it instead of retrying
+        else:
+            del self.thumbnail_loads[job.video_path]
+        self.ui_events.put(job)
+    
+    def show_storyboard(self, job):
+        """Show the job's grid of keyframe stills in place of the video"""
+        try:
+            img = Image.open(job.storyboard_path)
+            # Fit the grid in the video frame without enlarging it
+            img.thumbnail((THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2), Image.LANCZOS)
+            photo = ImageTk.PhotoImage(img)
+            
+            self.clear_video()
+            self.video_label.config(image=photo)
+            self.video_label.image = photo
+            # There is no video to scrub through yet, so shown stays None
+            self.video_label.storyboard = (job.id, job.revisions)
+        except Exception as e:
+            self.update_status(f"Error displaying storyboard: {str(e)}", 0)
+    
+    def scrub_video(self, event):
+        """Show the strip frame under the mouse while hovering over the preview"""
+        shown = getattr(self.video_label, "shown", None)
+        if not shown or self.player:
+            return
+        
+        if not getattr(self.video_label, "strip", None):
+            frames = self.thumbnails.cached_strip(shown[1], THUMBNAIL_SIZE, STRIP_FRAMES)
+            if not frames:
+                return  # Still decoding
+            self.video_label.strip = [ImageTk.PhotoImage(frame) for frame in frames]
+        
+        strip = self.video_label.strip
+        index = min(len(strip) - 1, max(0, event.x * len(strip) // max(1, self.video_label.winfo_width())))
+        self.video_label.config(image=strip[index])
+    
+    def end_scrub(self, event):
+        """Go back to the poster frame when the mouse leaves the preview"""
+        if getattr(self.video_label, "image", None) and not self.player:
+            self.video_label.config(image=self.video_label.image)
+    
+    def on_close(self):
+        """Drop queued jobs and close the window"""
+        self.close_player()
+        self.scheduler.shutdown()
+        self.root.destroy()
+    
+    def play_video(self, video_path, job_id=None):
+        """Play the video in the video frame, or in the default media player if that is off or fails"""
+        if self.config["embedded_player"]:
+            try:
+                self.close_player()
+                if getattr(self, "play_button", None):
+                    self.play_button.destroy()
+                    self.play_button = None
+                self.player = VideoPlayer(
+                    self.root, self.video_label, self.video_frame, video_path, self.player_stats,
+                    THUMBNAIL_SIZE, self.config["player_buffer_frames"]
+                )
+                self.player_job_id = job_id
+                return
+            except Exception as e:
+                self.update_status(f"Embedded player unavailable ({str(e)}), opening externally", None)
+        self.open_video_externally(video_path)
+    
+    def close_player(self):
+        if self.player:
+            self.player.close()
+            self.player = None
+            self.player_job_id = None
+    
+    def open_video_externally(self, video_path):
         """Play the video in the default media player."""
         try:
             if os.name == 'nt':  # Windows
@@ -0,0 +1,163 @@
+"""
+metrics.py - Per-stage spans for every job, with summaries and a Prometheus export
+
+A span covers one pipeline stage of one job: wall time, CPU time of the
+thread that ran it, and whatever the stage recorded in job.stage_info (token
+counts, cache hits, the render subprocess's CPU time and peak memory). Spans
+are appended as JSON lines to jobs/<id>/spans.jsonl and aggregated into
+p50/p95 wall times per stage, optionally written as a Prometheus text file.
+
+With metrics disabled the pipeline gets a NullTracer, whose span() hands back
+one shared object with empty enter/exit methods.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+SPANS_FILE = "spans.jsonl"
+WINDOW = 1000
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class NullTracer:
+    """Tracer used when metrics are off"""
+
+    enabled = False
+
+    def span(self, job, name):
+        return NULL_SPAN
+
+    def summary(self):
+        return "disabled"
+
+
+class Span:
+    def __init__(self, tracer, job, name):
+        self.tracer = tracer
+        self.job = job
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.time()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        record = {
+            "job": self.job.id,
+            "stage": self.name,
+            "start": self.started,
+            "wall_seconds": time.perf_counter() - self.wall_start,
+            "thread_cpu_seconds": time.thread_time() - self.cpu_start,
+            "state": self.job.state,
+            "error": str(exc) if exc else None,
+        }
+        record.update(self.job.stage_info.get(self.name, {}))
+        self.tracer.record(self.job, record)
+        return False
+
+
+class Tracer:
+    """Writes spans per job and keeps recent wall times per stage"""
+
+    enabled = True
+
+    def __init__(self, prometheus_path=None):
+        self.prometheus_path = prometheus_path
+        self.wall_times = defaultdict(lambda: deque(maxlen=WINDOW))
+        self.totals = defaultdict(lambda: {"count": 0, "seconds": 0.0, "errors": 0, "cache_hits": 0})
+        self._lock = threading.Lock()
+
+    def span(self, job, name):
+        return Span(self, job, name)
+
+    def record(self, job, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if os.path.isdir(job.dir):
+                with open(os.path.join(job.dir, SPANS_FILE), "a", encoding="utf-8") as f:
+                    f.write(line)
+
+            stage = record["stage"]
+            self.wall_times[stage].append(record["wall_seconds"])
+            totals = self.totals[stage]
+            totals["count"] += 1
+            totals["seconds"] += record["wall_seconds"]
+            totals["errors"] += 1 if record["error"] else 0
+            totals["cache_hits"] += 1 if record.get("cache_hit") else 0
+
+            if self.prometheus_path:
+                self._write_prometheus()
+
+    def stage_summary(self):
+        """Return {stage: {"count", "p50", "p95", "errors", "cache_hits"}} over recent spans"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": self.totals[stage]["count"],
+                    "p50": percentile(times, 0.5),
+                    "p95": percentile(times, 0.95),
+                    "errors": self.totals[stage]["errors"],
+                    "cache_hits": self.totals[stage]["cache_hits"],
+                }
+                for stage, times in self.wall_times.items()
+            }
+
+    def summary(self):
+        parts = [
+            f"{stage} p50 {stats['p50']:.1f}s / p95 {stats['p95']:.1f}s"
+            for stage, stats in self.stage_summary().items()
+        ]
+        return ", ".join(parts) or "no spans yet"
+
+    def _write_prometheus(self):
+        """Write the Prometheus text format atomically; the caller holds the lock"""
+        lines = [
+            "# HELP manim_stage_seconds Wall time of pipeline stages",
+            "# TYPE manim_stage_seconds summary",
+        ]
+        for stage, times in self.wall_times.items():
+            for quantile in (0.5, 0.95):
+                lines.append(f'manim_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {percentile(times, quantile):.6f}')
+            lines.append(f'manim_stage_seconds_sum{{stage="{stage}"}} {self.totals[stage]["seconds"]:.6f}')
+            lines.append(f'manim_stage_seconds_count{{stage="{stage}"}} {self.totals[stage]["count"]}')
+        for name, key, help_text in (
+            ("manim_stage_errors_total", "errors", "Stage runs that raised"),
+            ("manim_stage_cache_hits_total", "cache_hits", "Stage runs answered from a cache"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, totals in self.totals.items():
+                lines.append(f'{name}{{stage="{stage}"}} {totals[key]}')
+
+        temp_path = f"{self.prometheus_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.prometheus_path)
+
+
+def make_tracer(config):
+    if not config["metrics"]:
+        return NullTracer()
+    return Tracer(config["metrics_prometheus_path"])
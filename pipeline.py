@@ -0,0 +1,1080 @@
+"""
+pipeline.py - The prompt -> code -> render pipeline, independent of the UI
+
+Every visualization request is a Job with its own directory under jobs/, so
+several jobs can be refined, generated and rendered at the same time without
+overwriting each other's script or media files.
+"""
+
+import codecs
+import glob
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from artifacts import ArtifactStore
+from chunking import concat_videos, count_animations, plan_chunks
+from job_store import make_job_store
+from limits import ResourceLimits, describe_kill, explain_exit, kill_tree, wait_exited, wait_with_usage
+from metrics import make_tracer
+from progress import AnimationProgress, ProgressTracker
+from render_cost import make_cost_model, scene_features
+from render_worker import WarmRenderPool
+from streaming import ScriptStream, StreamAborted
+from templates import load_templates
+from tex_cache import make_tex_cache
+from validation import ValidationStats, check_script, dry_run, summarize_error
+
+SCENE_NAME = "AutoScene"
+SCRIPT_NAME = "scene.py"
+
+# manim redraws its progress bars in place with carriage returns
+LINE_BREAK = re.compile(r"(\r\n|\r|\n)")
+RENDER_LOG = "render.log"
+
+# Chunked rendering only pays off when every chunk has a few animations to draw
+# and enough estimated work to outweigh starting manim and running construct()
+MIN_CHUNK_ANIMATIONS = 2
+MIN_CHUNK_SECONDS = 10
+
+# Render quality ladder, lowest first: name -> (manim flag, media folder manim writes to)
+QUALITY_LEVELS = {
+    "low": ("-ql", "480p15"),
+    "medium": ("-qm", "720p30"),
+    "high": ("-qh", "1080p60"),
+    "4k": ("-qk", "2160p60"),
+}
+
+REFINE_SYSTEM_PROMPT = (
+    "You are an AI that helps generate precise prompts for AI code generation. "
+    "Given a user's math concept description, refine it into a well-structured prompt "
+    "that asks for a Manim script to visualize the concept. "
+    "Do NOT generate code, only output the improved prompt."
+)
+
+CODE_PROMPT_TEMPLATE = (
+    "{refined_prompt}\n\n"
+    "Output only the Python Manim script. Do not add explanations or extra text. "
+    "The script should define a Manim class called 'AutoScene'. "
+    "Ensure that text elements are well-aligned and old text disappears before new text appears. "
+    "Ensure proper alignment, remove previous text before adding new text, and include smooth transitions."
+    "Take note of frame space and don't overflow out of frame. "
+    "Try to utilize all the frame area without overlapping. "
+)
+
+REPAIR_PROMPT_TEMPLATE = (
+    "The following Manim script, which must define a Manim class called 'AutoScene', "
+    "fails with the error shown below.\n\n"
+    "Script:\n{code}\n\n"
+    "Error:\n{error}\n\n"
+    "Fix the error and output only the complete corrected Python Manim script. "
+    "Do not add explanations or extra text."
+)
+
+REVISE_PROMPT_TEMPLATE = (
+    "The following Manim script defines a Manim class called 'AutoScene'. "
+    "A reviewer looked at stills of its animations and asked for changes.\n\n"
+    "Script:\n{code}\n\n"
+    "Requested changes:\n{feedback}\n\n"
+    "Apply the changes and output only the complete revised Python Manim script, "
+    "still defining 'AutoScene'. Do not add explanations or extra text."
+)
+
+# Job states, in pipeline order
+QUEUED = "Queued"
+REFINING = "Refining"
+GENERATING = "Generating"
+VALIDATING = "Validating"
+STORYBOARD = "Storyboard"
+# A storyboard job waits here until it is approved or sent back with feedback
+REVIEW = "Awaiting review"
+RENDERING = "Rendering"
+COMPLETE = "Complete"
+FAILED = "Failed"
+
+FINISHED_STATES = (COMPLETE, FAILED)
+
+
+class Job:
+    """A single visualization request and everything produced for it"""
+
+    def __init__(self, prompt, jobs_dir="jobs", use_cache=True, job_id=None, storyboard=False):
+        self.id = job_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.prompt = prompt
+        self.use_cache = use_cache
+        self.dir = os.path.join(jobs_dir, self.id)
+        self.script_path = os.path.join(self.dir, SCRIPT_NAME)
+        self.media_dir = os.path.join(self.dir, "media")
+        self.storyboard_path = os.path.join(self.dir, "storyboard.png")
+
+        self.state = QUEUED
+        self.progress = 0
+        self.message = "Waiting for a worker"
+        self.refined_prompt = None
+        self.partial_code = ""
+        self.code = None
+        self.video_path = None
+        self.thumbnail_path = None
+        self.from_render_cache = False
+        # Name of the library template used instead of generating code
+        self.template = None
+        # Estimated preview render seconds, and a warning if that is a lot
+        self.estimated_seconds = None
+        self.warning = None
+        # Storyboard mode: stills are reviewed before the full render runs
+        self.storyboard = storyboard
+        self.approved = False
+        self.feedback = None
+        self.revisions = 0
+        # (animation number, image path) of the stills in the last storyboard
+        self.keyframes = []
+        self.render_key = None
+        self.quality = None
+        self.videos = {}
+        self.upgrades = []
+        self.upgrades_cancelled = False
+        # Foreground dry runs and render; cancelling it cancels the job
+        self.task = RenderTask()
+        self.cancelled = False
+        # Resources used by each render: quality -> {"cpu_seconds", "max_rss_bytes"}
+        self.resources = {}
+        # What each stage reported for its metrics span: stage -> {name: value}
+        self.stage_info = {}
+        self.repair_attempts = 0
+        self.script_errors = []
+        self.error = None
+        self.timings = {}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.state in FINISHED_STATES
+
+
+def record_usage(response, usage):
+    """Add a response's token counts, retries and rate limit delay to the usage dict"""
+    if usage is None:
+        return
+    if response.shared:
+        # Another job's identical request paid for this response
+        usage["shared"] = True
+    elif response.prompt_tokens is not None:
+        usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + response.prompt_tokens
+        usage["response_tokens"] = usage.get("response_tokens", 0) + (response.response_tokens or 0)
+    if response.retries:
+        usage["retries"] = usage.get("retries", 0) + response.retries
+    if response.throttled_seconds:
+        usage["throttled_seconds"] = usage.get("throttled_seconds", 0.0) + response.throttled_seconds
+
+
+def refine_prompt(llm, user_input, llm_cache=None, use_cache=True, usage=None):
+    """Ask the LLM backend to turn user input into a better prompt for Manim code generation."""
+    model = llm.cache_name("refine")
+    if llm_cache and use_cache:
+        cached = llm_cache.get("refine", model, REFINE_SYSTEM_PROMPT, user_input)
+        if cached:
+            if usage is not None:
+                usage["cache_hit"] = True
+            return cached
+
+    response = llm.complete("refine", f"{REFINE_SYSTEM_PROMPT}\nUser Input: {user_input}")
+    record_usage(response, usage)
+
+    if response.text:
+        refined_prompt = response.text.strip()
+        if llm_cache:
+            llm_cache.put("refine", model, REFINE_SYSTEM_PROMPT, user_input, refined_prompt)
+        return refined_prompt
+    else:
+        return None
+
+
+def generate_manim_code(llm, refined_prompt, llm_cache=None, use_cache=True, stream=None, usage=None):
+    """Ask the LLM backend to generate only Manim code for the refined prompt.
+    
+    With a ScriptStream the response is streamed and fed to it chunk by chunk,
+    which raises StreamAborted as soon as the partial script is hopeless.
+    """
+    model = llm.cache_name("generate")
+    if llm_cache and use_cache:
+        cached = llm_cache.get("generate", model, CODE_PROMPT_TEMPLATE, refined_prompt)
+        if cached:
+            if usage is not None:
+                usage["cache_hit"] = True
+            return cached
+
+    final_prompt = CODE_PROMPT_TEMPLATE.format(refined_prompt=refined_prompt)
+
+    if stream:
+        pieces = llm.stream("generate", final_prompt)
+        try:
+            for piece in pieces:
+                if isinstance(piece, str):
+                    stream.feed(piece)
+                else:
+                    # The stream ends with the complete response and its usage
+                    record_usage(piece, usage)
+        finally:
+            # Leaving the loop early on StreamAborted closes the response
+            pieces.close()
+        manim_code = stream.text.strip() or None
+    else:
+        response = llm.complete("generate", final_prompt)
+        record_usage(response, usage)
+        manim_code = response.text.strip() if response.text else None
+
+    if manim_code and llm_cache:
+        llm_cache.put("generate", model, CODE_PROMPT_TEMPLATE, refined_prompt, manim_code)
+    return manim_code
+
+
+def repair_manim_code(llm, code, error, usage=None):
+    """Ask the LLM backend to fix a script given the error it produced."""
+    response = llm.complete("repair", REPAIR_PROMPT_TEMPLATE.format(code=code, error=error))
+    record_usage(response, usage)
+
+    if response.text:
+        return response.text.strip()
+    else:
+        return None
+
+
+def revise_manim_code(llm, code, feedback, usage=None):
+    """Ask the LLM backend to change a script as a reviewer asked."""
+    response = llm.complete("repair", REVISE_PROMPT_TEMPLATE.format(code=code, feedback=feedback))
+    record_usage(response, usage)
+
+    if response.text:
+        return response.text.strip()
+    else:
+        return None
+
+
+def clean_text(text: str) -> str:
+    prefix = "```python"
+    suffix = "```"
+
+    if text.startswith(prefix):
+        text = text[len(prefix):]
+    if text.endswith(suffix):
+        text = text[:-len(suffix)]
+
+    return text.strip()
+
+
+def save_manim_script(code, filename="generated_manim.py"):
+    """Save the AI-generated Manim script to a file."""
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write(code)
+
+
+class RenderTask:
+    """Handle on the manim processes of one render so that it can be cancelled or timed out"""
+
+    def __init__(self):
+        # What to call to kill each attached process, until it is detached
+        self.processes = {}
+        self.cancelled = False
+        # Why the render was killed, if it was
+        self.reason = None
+        self.usage = None
+        self._lock = threading.Lock()
+
+    def attach(self, process, kill=None):
+        """Kill process with this task until it is detached.
+        
+        kill replaces killing the process tree, for processes the task does not own.
+        """
+        kill = kill or (lambda: kill_tree(process))
+        with self._lock:
+            self.processes[process] = kill
+            if self.cancelled:
+                kill()
+
+    def detach(self, process):
+        """Forget a process once it has finished, so that a later kill leaves it alone"""
+        with self._lock:
+            self.processes.pop(process, None)
+
+    def kill(self, reason):
+        """Kill the running processes; later renders with this task still run"""
+        with self._lock:
+            self.reason = self.reason or reason
+            for kill in self.processes.values():
+                kill()
+
+    def cancel(self):
+        """Kill the running processes and any started later"""
+        with self._lock:
+            self.cancelled = True
+        self.kill("Cancelled")
+
+    def add_usage(self, usage):
+        """Add up the resources used by this task's processes"""
+        if not usage:
+            return
+        with self._lock:
+            if self.usage is None:
+                self.usage = dict(usage)
+            else:
+                self.usage["cpu_seconds"] += usage["cpu_seconds"]
+                self.usage["max_rss_bytes"] = max(self.usage["max_rss_bytes"], usage["max_rss_bytes"])
+
+
+def read_output(process, progress=None, log=None):
+    """Read a process's output as it arrives; return it without progress bar redraws"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    kept = []
+    pending = ""
+    for chunk in iter(lambda: process.stdout.read1(4096), b""):
+        if log:
+            log.write(chunk)
+        parts = LINE_BREAK.split(pending + decoder.decode(chunk))
+        pending = parts.pop()
+        for line, line_break in zip(parts[::2], parts[1::2]):
+            if progress:
+                progress.feed(line)
+            # A line ended by a bare carriage return is about to be redrawn
+            if line and line_break != "\r":
+                kept.append(line)
+    if pending:
+        kept.append(pending)
+    return "\n".join(kept)
+
+
+def run_manim_script(filename="generated_manim.py", scene_name=SCENE_NAME, media_dir=None,
+                     quality="low", task=None, animations=None, progress=None, log_path=None,
+                     timeout=None, limits=None, still=False):
+    """Run the Manim script and render a video; return (success, manim's output).
+    
+    animations is an optional (first, last) range of animation numbers to render,
+    where a last of None renders to the end of the scene; with still, only the
+    last frame of that range is saved, as an image.
+    progress receives every output line as it arrives, and the raw output is
+    appended to log_path. The render is killed after timeout seconds or when
+    it exceeds limits; task then says why and how much it used.
+    """
+    task = task or RenderTask()
+    limits = limits or ResourceLimits()
+    timer = None
+    process = None
+    try:
+        command = ["manim", QUALITY_LEVELS[quality][0], filename, scene_name, "-o", output_name(scene_name, quality)]
+        if media_dir:
+            command += ["--media_dir", media_dir]
+        if animations and animations[1] is None:
+            command += ["-n", str(animations[0])]
+        elif animations:
+            command += ["-n", f"{animations[0]},{animations[1]}"]
+        if still:
+            command.append("-s")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **limits.popen_kwargs())
+        limits.apply_to(process)
+        task.attach(process)
+        if timeout:
+            timer = threading.Timer(timeout, task.kill, args=(f"Timed out after {timeout}s",))
+            timer.start()
+
+        if log_path:
+            with open(log_path, "ab") as log:
+                log.write(f"\n=== {time.strftime('%Y-%m-%d %H:%M:%S')} {' '.join(command)}\n".encode("utf-8"))
+                output = read_output(process, progress, log)
+        else:
+            output = read_output(process, progress)
+        wait_exited(process)
+        kill_tree(process)  # Anything manim left running in its group
+        # Nothing may signal the group once the reap below frees its id
+        if timer:
+            timer.cancel()
+        task.detach(process)
+        task.add_usage(wait_with_usage(process))
+
+        if task.cancelled:
+            return False, "Render cancelled"
+        if process.returncode != 0 and not task.reason:
+            task.reason = explain_exit(process.returncode, output, limits)
+        return process.returncode == 0 and not task.reason, output
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if timer:
+            timer.cancel()
+        if process:
+            task.detach(process)
+
+
+def output_name(scene_name, quality):
+    """Name manim writes a render under, so every quality gets its own file"""
+    return f"{scene_name}_{quality}"
+
+
+def video_output_path(media_dir, filename, scene_name=SCENE_NAME, quality="low"):
+    """Return the exact path run_manim_script writes a script's video to"""
+    script_stem = os.path.splitext(os.path.basename(filename))[0]
+    quality_dir = QUALITY_LEVELS[quality][1]
+    return os.path.join(media_dir, "videos", script_stem, quality_dir, f"{output_name(scene_name, quality)}.mp4")
+
+
+def find_video(media_dir, filename, scene_name=SCENE_NAME, quality="low"):
+    """Return the video a render wrote, or None if it is missing"""
+    video_path = video_output_path(media_dir, filename, scene_name, quality)
+    return video_path if os.path.exists(video_path) else None
+
+
+def find_image(media_dir):
+    """Return the newest image a still render wrote, or None if it is missing"""
+    images = glob.glob(os.path.join(media_dir, "images", "**", "*.png"), recursive=True)
+    return max(images, key=os.path.getmtime) if images else None
+
+
+def chunk_dirs(media_dir, count):
+    """Media folders for the chunks of a chunked render"""
+    return [os.path.join(media_dir, "chunks", str(index)) for index in range(count)]
+
+
+def render_chunked(filename, scene_name, media_dir, quality, ranges, task=None, tracker=None, log_path=None,
+                   timeout=None, limits=None):
+    """Render animation ranges in parallel and join them; return (success, output, video path).
+    
+    The last range is rendered to the end of the scene, whatever its planned end.
+    """
+    media_dirs = chunk_dirs(media_dir, len(ranges))
+    sizes = [last - first + 1 for first, last in ranges]
+    fractions = [0.0] * len(ranges)
+    # Animations the static count missed still end up in the last chunk
+    render_ranges = ranges[:-1] + [(ranges[-1][0], None)]
+
+    def chunk_progress(index):
+        def on_fraction(fraction, animation):
+            fractions[index] = min(1.0, fraction or 0.0)
+            tracker.update(sum(f * size for f, size in zip(fractions, sizes)) / sum(sizes), animation)
+        return AnimationProgress(tracker, sizes[index], ranges[index][0], on_fraction)
+
+    def render_chunk(index):
+        chunk_log = f"{os.path.splitext(log_path)[0]}-chunk{index}.log" if log_path else None
+        progress = chunk_progress(index) if tracker else None
+        return run_manim_script(
+            filename, scene_name, media_dirs[index], quality, task, render_ranges[index], progress, chunk_log,
+            timeout, limits
+        )
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        results = list(executor.map(render_chunk, range(len(ranges))))
+
+    outputs = [output for _, output in results]
+    for (first, last), (success, output) in zip(ranges, results):
+        if not success:
+            return False, f"Animations {first}-{last} failed:\n{output}", None
+
+    chunk_videos = [find_video(chunk_dir, filename, scene_name, quality) for chunk_dir in media_dirs]
+    if not all(chunk_videos):
+        return False, "\n".join(outputs), None
+
+    video_path = video_output_path(media_dir, filename, scene_name, quality)
+    success, output = concat_videos(chunk_videos, video_path)
+    return success, output, video_path if success else None
+
+
+def render_scene(job, context, quality, task=None, tracker=None, info=None):
+    """Render a job's script with the configured backend; return (success, output, video path).
+    
+    tracker, a progress.ProgressTracker, is updated as manim reports progress.
+    LaTeX cache counts for the render are added to info.
+    """
+    log_path = os.path.join(job.dir, RENDER_LOG)
+    timeout = context.config["render_timeout"]
+    ranges = None
+    animation_count = None
+    if not context.render_pool:
+        animation_count = count_animations(job.code, SCENE_NAME)
+        if context.render_chunks > 1 and animation_count and animation_count >= 2 * MIN_CHUNK_ANIMATIONS:
+            chunks = min(context.render_chunks, animation_count // MIN_CHUNK_ANIMATIONS)
+            estimate = context.cost_model.estimate(job.code, quality, SCENE_NAME)
+            if estimate is not None:
+                chunks = min(chunks, max(1, int(estimate // MIN_CHUNK_SECONDS)))
+            if chunks > 1:
+                ranges = plan_chunks(animation_count, chunks)
+
+    media_dirs = chunk_dirs(job.media_dir, len(ranges)) if ranges else [job.media_dir]
+    seeded = context.tex_cache.seed(media_dirs, job.code) if context.tex_cache else None
+    try:
+        if ranges:
+            return render_chunked(
+                job.script_path, SCENE_NAME, job.media_dir, quality, ranges, task, tracker, log_path,
+                timeout, context.limits
+            )
+
+        started = time.perf_counter()
+        if context.render_pool:
+            success, output, video_path = context.render_pool.render(
+                job.script_path, SCENE_NAME, job.media_dir, quality, timeout=timeout,
+                task=task, output_name=output_name(SCENE_NAME, quality)
+            )
+        else:
+            progress = AnimationProgress(tracker, animation_count) if tracker else None
+            success, output = run_manim_script(
+                job.script_path, SCENE_NAME, job.media_dir, quality, task, progress=progress, log_path=log_path,
+                timeout=timeout, limits=context.limits
+            )
+            video_path = find_video(job.media_dir, job.script_path, SCENE_NAME, quality) if success else None
+        if success:
+            # Chunked renders overlap, so only whole renders calibrate the cost model
+            context.cost_model.record(job.code, quality, time.perf_counter() - started, SCENE_NAME)
+        return success, output, video_path
+    finally:
+        if seeded:
+            record_tex(job, context.tex_cache.collect(seeded), info)
+
+
+def record_tex(job, counts, info=None):
+    """Add a render's LaTeX cache counts to its span info and the job's estimated savings"""
+    if info is not None:
+        for name, value in counts.items():
+            info[name] = info.get(name, 0) + value
+    job.timings["tex_saved_estimate"] = job.timings.get("tex_saved_estimate", 0.0) + counts["tex_seconds_saved"]
+
+
+def extract_thumbnail(video_path, thumbnail_path):
+    """Store the frame at the 1-second mark at the size the UI shows it; return True on success"""
+    from thumbnails import save_thumbnail
+
+    return save_thumbnail(video_path, thumbnail_path)
+
+
+class PipelineContext:
+    """Shared resources the pipeline stages need, plus where to report job updates"""
+
+    def __init__(self, config, llm_cache=None, render_cache=None, report=None, llm=None):
+        self.config = config
+        # An llm.Backend shared by every job; callers may swap it, e.g. when the API key changes
+        self.llm = llm
+        self.llm_cache = llm_cache
+        self.render_cache = render_cache
+        self.report = report
+        self.stream_code = config["stream_code"]
+        self.preview_quality = config["preview_quality"]
+        self.upgrade_qualities = config["upgrade_qualities"] if config["progressive_render"] else []
+        self.stream_stats = StreamStats()
+        self.validation_stats = ValidationStats()
+        self.render_chunks = (config["render_chunks"] or os.cpu_count() or 1) if config["chunked_render"] else 1
+        self.artifacts = ArtifactStore(config["jobs_dir"], config["artifacts_max_bytes"])
+        self.limits = ResourceLimits.from_config(config)
+        self.tracer = make_tracer(config)
+        self.templates = load_templates(config)
+        self.tex_cache = make_tex_cache(config)
+        self.cost_model = make_cost_model(config)
+        self.job_store = make_job_store(config)
+        self.render_pool = None
+        if config["render_backend"] == "warm":
+            workers = config["render_workers"] or os.cpu_count() or 1
+            self.render_pool = WarmRenderPool(workers, log_dir=config["jobs_dir"], limits=self.limits)
+
+    def close(self):
+        if self.render_pool:
+            self.render_pool.close()
+        if self.llm:
+            self.llm.close()
+        if self.job_store:
+            self.job_store.close()
+
+
+class StreamStats:
+    """Running totals on how streaming changed code generation latency"""
+
+    def __init__(self):
+        self.streams = 0
+        self.completed = 0
+        self.aborted = 0
+        self.first_code_seconds = 0.0
+        self.full_generation_seconds = 0.0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, stream, aborted):
+        """Record a finished stream; return the estimated seconds an abort saved"""
+        with self._lock:
+            self.streams += 1
+            self.first_code_seconds += stream.first_chunk_seconds or 0.0
+            if not aborted:
+                self.completed += 1
+                self.full_generation_seconds += stream.elapsed
+                return 0.0
+
+            self.aborted += 1
+            # Without an abort the request would have run for about as long as a full one
+            average_full = self.full_generation_seconds / self.completed if self.completed else 0.0
+            saved = max(0.0, average_full - stream.aborted_after)
+            self.seconds_saved += saved
+            return saved
+
+    def summary(self):
+        with self._lock:
+            if not self.streams:
+                return "No streamed generations yet"
+            return (
+                f"{self.streams} streamed, {self.aborted} aborted early, "
+                f"first code after {self.first_code_seconds / self.streams:.1f}s on average, "
+                f"~{self.seconds_saved:.0f}s saved"
+            )
+
+
+def update_job(job, context, state, progress, message):
+    job.state = state
+    job.progress = progress
+    job.message = message
+    if context.report:
+        context.report(job)
+
+
+def finish_job(job, context, state, message):
+    job.finished = time.time()
+    if job.started is not None:
+        job.timings["total"] = time.perf_counter() - job.started
+    if os.path.isdir(job.dir):
+        context.artifacts.record(job)
+    update_job(job, context, state, 100 if state == COMPLETE else 0, message)
+
+
+def fail_job(job, context, error):
+    job.error = str(error)
+    finish_job(job, context, FAILED, job.error)
+
+
+def run_refine_stage(job, context):
+    """Step 1: Refine prompt"""
+    os.makedirs(job.dir, exist_ok=True)
+    job.started = time.perf_counter()
+
+    if context.templates and job.use_cache:
+        template, score = context.templates.match(job.prompt)
+        job.stage_info["refine"] = {"template_score": score}
+        if template:
+            # A vetted script covers this prompt, so neither LLM call is needed
+            job.template = template.name
+            job.stage_info["refine"]["template"] = template.name
+            job.refined_prompt = template.description
+            job.code = template.code()
+            update_job(job, context, GENERATING, 40, f"Using the {template.title} template")
+            return True
+
+    update_job(job, context, REFINING, 20, "Refining prompt")
+
+    if context.llm is None:
+        raise RuntimeError("No LLM backend configured")
+
+    stage_start = time.perf_counter()
+    job.refined_prompt = refine_prompt(
+        context.llm, job.prompt, context.llm_cache, job.use_cache, job.stage_info.setdefault("refine", {})
+    )
+    job.timings["refine"] = time.perf_counter() - stage_start
+
+    if not job.refined_prompt:
+        raise RuntimeError("Failed to refine prompt")
+    return True
+
+
+def run_generate_stage(job, context):
+    """Step 2: Generate Manim code, streaming it into job.partial_code.
+    
+    A job sent back from storyboard review has its script revised instead.
+    """
+    if job.feedback:
+        return revise_script(job, context)
+    if job.template:
+        return True
+    update_job(job, context, GENERATING, 40, "Generating Manim code")
+
+    stream = None
+    if context.stream_code:
+        def show_partial(text):
+            job.partial_code = text
+            if context.report:
+                context.report(job)
+
+        stream = ScriptStream(show_partial)
+
+    stage_start = time.perf_counter()
+    try:
+        manim_code = generate_manim_code(
+            context.llm, job.refined_prompt, context.llm_cache, job.use_cache, stream, job.stage_info.setdefault("generate", {})
+        )
+    except StreamAborted as e:
+        job.timings["generate"] = time.perf_counter() - stage_start
+        saved = context.stream_stats.record(stream, aborted=True)
+        job.timings["generate_saved_estimate"] = saved
+        raise RuntimeError(f"Generation aborted after {stream.aborted_after:.1f}s (~{saved:.0f}s saved): {e}")
+    job.timings["generate"] = time.perf_counter() - stage_start
+
+    if stream and stream.first_chunk_seconds is not None:
+        job.timings["generate_first_code"] = stream.first_chunk_seconds
+        context.stream_stats.record(stream, aborted=False)
+
+    if not manim_code:
+        raise RuntimeError("Failed to generate code")
+
+    job.code = clean_text(manim_code)
+    return True
+
+
+def revise_script(job, context):
+    """Rewrite a reviewed job's script according to the reviewer's feedback"""
+    job.revisions += 1
+    update_job(job, context, GENERATING, 40, f"Revising script (revision {job.revisions})")
+    if context.llm is None:
+        raise RuntimeError("No LLM backend configured")
+
+    stage_start = time.perf_counter()
+    revised = revise_manim_code(context.llm, job.code, job.feedback, job.stage_info.setdefault("generate", {}))
+    job.timings["revise"] = job.timings.get("revise", 0.0) + time.perf_counter() - stage_start
+    if not revised:
+        raise RuntimeError("Failed to revise script")
+
+    job.code = clean_text(revised)
+    job.feedback = None
+    # The script is no longer the library's, and the revision gets its own repair attempts
+    job.template = None
+    job.repair_attempts = 0
+    return True
+
+
+def run_validate_stage(job, context):
+    """Step 3: Check the script before rendering, repairing it a bounded number of times.
+    
+    Finishes the job early if the script was rendered before.
+    """
+    update_job(job, context, VALIDATING, 60, "Validating Manim script")
+    max_repairs = context.config["max_repair_attempts"]
+
+    while True:
+        save_manim_script(job.code, job.script_path)
+
+        if context.render_cache:
+            preview_flag = QUALITY_LEVELS[context.preview_quality][0]
+            job.render_key = context.render_cache.key(job.code, SCENE_NAME, preview_flag)
+            # Linked into the job folder, so evicting the cache entry keeps the job's video
+            cached_render = context.render_cache.restore(
+                job.render_key,
+                os.path.join(job.dir, f"{output_name(SCENE_NAME, context.preview_quality)}.mp4"),
+                os.path.join(job.dir, "thumbnail.png")
+            )
+            if cached_render:
+                job.video_path, job.thumbnail_path = cached_render
+                job.quality = context.preview_quality
+                job.videos[job.quality] = job.video_path
+                job.from_render_cache = True
+                job.stage_info.setdefault("validate", {})["cache_hit"] = True
+                finish_job(job, context, COMPLETE, "Loaded from render cache")
+                return False
+
+        check_start = time.perf_counter()
+        error = check_script(job.code, SCENE_NAME)
+        if not error and context.config["dry_run"]:
+            validate_dir = os.path.join(job.dir, "validate")
+            seeded = context.tex_cache.seed([validate_dir], job.code) if context.tex_cache else None
+            error = dry_run(
+                job.script_path,
+                SCENE_NAME,
+                validate_dir,
+                context.config["dry_run_timeout"],
+                context.render_pool,
+                context.limits,
+                job.task
+            )
+            if seeded:
+                record_tex(job, context.tex_cache.collect(seeded), job.stage_info.setdefault("validate", {}))
+        check_seconds = time.perf_counter() - check_start
+        job.timings["validate"] = job.timings.get("validate", 0.0) + check_seconds
+        if job.task.cancelled:
+            raise RuntimeError("Cancelled")
+
+        if job.repair_attempts:
+            context.validation_stats.record_repair(succeeded=not error)
+        if not error:
+            estimate_render(job, context)
+            return True
+
+        saved = context.validation_stats.record_caught(check_seconds)
+        job.timings["validate_saved_estimate"] = job.timings.get("validate_saved_estimate", 0.0) + saved
+        job.script_errors.append(error)
+
+        if job.repair_attempts >= max_repairs:
+            raise RuntimeError(f"Invalid script after {job.repair_attempts} repair(s): {error.splitlines()[-1]}")
+
+        # Feed the error back to the generator and validate the result again
+        job.repair_attempts += 1
+        update_job(job, context, VALIDATING, 60, f"Repairing script (attempt {job.repair_attempts} of {max_repairs})")
+        repair_start = time.perf_counter()
+        repaired = repair_manim_code(context.llm, job.code, error, job.stage_info.setdefault("validate", {}))
+        job.timings["repair"] = job.timings.get("repair", 0.0) + time.perf_counter() - repair_start
+
+        if not repaired:
+            raise RuntimeError(f"Failed to repair script: {error.splitlines()[-1]}")
+        job.code = clean_text(repaired)
+        update_job(job, context, VALIDATING, 60, "Validating repaired script")
+
+
+def estimate_render(job, context):
+    """Estimate the preview render time, for the scheduler and to warn about expensive scenes"""
+    job.estimated_seconds = context.cost_model.estimate(job.code, context.preview_quality, SCENE_NAME)
+    if job.estimated_seconds is None:
+        return
+    job.stage_info.setdefault("validate", {})["estimated_seconds"] = job.estimated_seconds
+    if job.estimated_seconds > context.config["cost_warning_seconds"]:
+        job.warning = f"expensive scene, estimated {job.estimated_seconds / 60:.0f} min to render"
+
+
+def keyframe_animations(animation_count, frames):
+    """Pick up to frames evenly spaced animation numbers, always ending with the last one"""
+    if animation_count <= frames:
+        return list(range(animation_count))
+    step = animation_count / frames
+    return sorted({animation_count - 1 - int(index * step) for index in range(frames)})
+
+
+def render_keyframe(job, context, index, animation, task):
+    """Save the last frame of one animation (or of the scene); return (success, output, image path)"""
+    media_dir = os.path.join(job.dir, "storyboard", str(index))
+    animations = (animation, animation) if animation is not None else None
+    timeout = context.config["dry_run_timeout"]
+    seeded = context.tex_cache.seed([media_dir], job.code) if context.tex_cache else None
+    try:
+        if context.render_pool:
+            return context.render_pool.render(
+                job.script_path, SCENE_NAME, media_dir, skip_animations=True, timeout=timeout, task=task,
+                animations=animations
+            )
+        success, output = run_manim_script(
+            job.script_path, SCENE_NAME, media_dir, task=task, animations=animations,
+            log_path=os.path.join(media_dir, RENDER_LOG), timeout=timeout, limits=context.limits, still=True
+        )
+        return success, output, find_image(media_dir) if success else None
+    finally:
+        if seeded:
+            record_tex(job, context.tex_cache.collect(seeded), job.stage_info.setdefault("storyboard", {}))
+
+
+def run_storyboard(job, context):
+    """Render the keyframe stills in parallel, lay them out as a grid and wait for review"""
+    from thumbnails import storyboard_grid
+
+    update_job(job, context, STORYBOARD, 80, "Rendering storyboard")
+    stage_start = time.perf_counter()
+    animation_count = count_animations(job.code, SCENE_NAME)
+    if animation_count is None:
+        # Loops with unknown bounds; the cost model's guess may overshoot, so missing stills are skipped
+        totals = scene_features(job.code, SCENE_NAME)
+        animation_count = int(totals["animations"]) if totals else 0
+    animations = keyframe_animations(animation_count, context.config["storyboard_frames"]) or [None]
+
+    task = job.task
+    os.makedirs(os.path.join(job.dir, "storyboard"), exist_ok=True)
+    workers = min(len(animations), context.config["storyboard_workers"] or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda pair: render_keyframe(job, context, pair[0], pair[1], task), enumerate(animations)
+        ))
+    if task.usage:
+        job.resources["storyboard"] = task.usage
+    if task.cancelled:
+        raise RuntimeError("Cancelled")
+
+    job.keyframes = [
+        (animation, image) for animation, (success, _, image) in zip(animations, results) if success and image
+    ]
+    if not job.keyframes:
+        outputs = [output for success, output, _ in results if not success]
+        job.script_errors.append(summarize_error(outputs[0]) if outputs else "No stills found")
+        raise RuntimeError("Failed to render storyboard")
+
+    labels = [f"#{animation + 1}" if animation is not None else "End" for animation, _ in job.keyframes]
+    storyboard_grid(list(zip(labels, [image for _, image in job.keyframes]))).save(job.storyboard_path)
+    job.timings["storyboard"] = job.timings.get("storyboard", 0.0) + time.perf_counter() - stage_start
+    # Kills and usage of the stills must not carry over to the full render
+    job.task = RenderTask()
+    if job.cancelled:
+        job.task.cancel()
+
+    skipped = len(animations) - len(job.keyframes)
+    message = f"Storyboard of {len(job.keyframes)} stills ready for review"
+    if skipped:
+        message += f" ({skipped} failed)"
+    update_job(job, context, REVIEW, 90, message)
+    return False
+
+
+def run_render_stage(job, context):
+    """Step 4: Run Manim script and extract a thumbnail.
+    
+    In storyboard mode, the first pass renders keyframe stills for review instead.
+    """
+    if job.storyboard and not job.approved:
+        return run_storyboard(job, context)
+
+    message = "Rendering visualization"
+    update_job(job, context, RENDERING, 80, f"{message} ({job.warning})" if job.warning else message)
+
+    quality = context.preview_quality
+
+    def report_progress(fraction, eta, text):
+        update_job(job, context, RENDERING, 80 + int(19 * fraction), f"Rendering visualization: {text}")
+
+    stage_start = time.perf_counter()
+    task = job.task
+    info = job.stage_info["render"] = {"quality": quality}
+    success, output, job.video_path = render_scene(
+        job, context, quality, task, ProgressTracker(report_progress), info
+    )
+    if task.usage:
+        job.resources[quality] = task.usage
+        info.update(task.usage)
+    if not success:
+        if task.cancelled:
+            raise RuntimeError("Cancelled")
+        job.script_errors.append(summarize_error(output))
+        raise RuntimeError(describe_kill(task.reason or "Failed to render visualization", task.usage))
+    job.timings["render"] = time.perf_counter() - stage_start
+    context.validation_stats.record_render(job.timings["render"])
+
+    if not job.video_path:
+        raise RuntimeError("No video file found")
+    job.quality = quality
+    job.videos[quality] = job.video_path
+
+    thumbnail_path = os.path.join(job.dir, "thumbnail.png")
+    if extract_thumbnail(job.video_path, thumbnail_path):
+        job.thumbnail_path = thumbnail_path
+
+    if context.render_cache:
+        context.render_cache.put(job.render_key, job.video_path, job.thumbnail_path)
+
+    finish_job(job, context, COMPLETE, "Visualization generated")
+    return False
+
+
+def run_upgrade_render(job, context, quality, task=None):
+    """Re-render a finished job at a higher quality and swap in the better video.
+    
+    Returns False if the render was cancelled, so the caller can requeue it.
+    """
+    flag = QUALITY_LEVELS[quality][0]
+    render_key = context.render_cache.key(job.code, SCENE_NAME, flag) if context.render_cache else None
+    cached_render = context.render_cache.restore(
+        render_key, os.path.join(job.dir, f"{output_name(SCENE_NAME, quality)}.mp4")
+    ) if context.render_cache else None
+
+    info = job.stage_info[f"upgrade_{quality}"] = {"quality": quality}
+    if cached_render:
+        video_path = cached_render[0]
+        info["cache_hit"] = True
+    else:
+        job.message = f"Rendering {quality} quality in the background"
+        if context.report:
+            context.report(job)
+
+        def report_progress(fraction, eta, text):
+            job.message = f"Rendering {quality} quality in the background: {text}"
+            if context.report:
+                context.report(job)
+
+        stage_start = time.perf_counter()
+        success, output, video_path = render_scene(
+            job, context, quality, task, ProgressTracker(report_progress), info
+        )
+        if task and task.cancelled:
+            return False
+        if task and task.usage:
+            job.resources[quality] = task.usage
+            info.update(task.usage)
+        if not video_path:
+            job.script_errors.append(summarize_error(output))
+            job.message = f"{quality.capitalize()} quality render failed"
+            if task and task.reason:
+                job.message += f": {describe_kill(task.reason, task.usage)}"
+            if context.report:
+                context.report(job)
+            return True
+        job.timings[f"render_{quality}"] = time.perf_counter() - stage_start
+
+        if context.render_cache:
+            context.render_cache.put(render_key, video_path, job.thumbnail_path)
+
+    job.videos[quality] = video_path
+    # Only swap if nothing better arrived in the meantime
+    if list(QUALITY_LEVELS).index(quality) > list(QUALITY_LEVELS).index(job.quality):
+        job.video_path = video_path
+        job.quality = quality
+    context.artifacts.record(job)
+    job.message = f"Upgraded to {quality} quality"
+    if context.report:
+        context.report(job)
+    return True
+
+
+STAGES = (
+    ("refine", run_refine_stage),
+    ("generate", run_generate_stage),
+    ("validate", run_validate_stage),
+    ("render", run_render_stage),
+)
+
+
+def restore_job(entry):
+    """Rebuild a Job from its job_store entry"""
+    job = Job(
+        entry["prompt"], os.path.dirname(entry["dir"]), bool(entry["use_cache"]), entry["id"], bool(entry["storyboard"])
+    )
+    for name in ("refined_prompt", "code", "state", "message", "error", "feedback", "revisions", "template",
+                 "video_path", "thumbnail_path", "quality", "estimated_seconds", "repair_attempts",
+                 "created", "finished"):
+        setattr(job, name, entry[name])
+    job.approved = bool(entry["approved"])
+    job.from_render_cache = bool(entry["from_render_cache"])
+    job.videos = entry["videos"] or {}
+    job.script_errors = entry["script_errors"] or []
+    job.timings = entry["timings"] or {}
+    job.resources = entry["resources"] or {}
+    return job
+
+
+def resume_stage(job, context, last_stage):
+    """Return the index in STAGES at which a restored unfinished job continues.
+    
+    Stages whose output was not recorded run again. Returns None for a job
+    whose storyboard is still awaiting review.
+    """
+    names = [name for name, _ in STAGES]
+    job.started = time.perf_counter()
+    if job.state == REVIEW and os.path.exists(job.storyboard_path):
+        return None
+    if not job.refined_prompt:
+        return names.index("refine")
+    if not job.code or job.feedback:
+        return names.index("generate")
+    if last_stage != "validate":
+        return names.index("validate")
+
+    # Rebuild what the render stage expects validation to have left behind
+    save_manim_script(job.code, job.script_path)
+    if context.render_cache:
+        job.render_key = context.render_cache.key(job.code, SCENE_NAME, QUALITY_LEVELS[context.preview_quality][0])
+    estimate_render(job, context)
+    return names.index("render")
+
+
+def generate_visualization(job, context):
+    """Run every pipeline stage for job in sequence"""
+    try:
+        for _, stage in STAGES:
+            # A stage returns False once the job needs no further stages
+            if not stage(job, context):
+                break
+    except Exception as e:
+        fail_job(job, context, e)
+    return job
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+player.py - Frame-accurate video playback inside the Tk window
+
+ffmpeg decodes the video from a chosen frame onwards, scaled to the display
+size, and writes raw RGB frames to a pipe. A decoder thread reads them
+straight into a FrameRing: a fixed number of frame slots allocated once, so
+memory use is capacity * width * height * 3 bytes however long the video is.
+When every slot is full the decoder waits, and the pipe stops ffmpeg.
+
+The Tk thread paces playback with root.after against the wall clock, which
+starts once the first frame after a seek is decoded. On each tick it shows
+the newest frame that is due; frames that were due earlier but never shown
+(because the UI thread was busy) are dropped, and a tick that finds no frame
+yet (because decoding fell behind) counts as a stall and holds the clock.
+
+Seeking stops the decoder and starts a new ffmpeg at the target frame, with
+-ss before -i, which ffmpeg makes frame-accurate when decoding. Dragging the
+position slider only seeks once the drag pauses for a moment.
+
+Run `python player.py video.mp4` to play a video in a window of its own.
+"""
+
+import argparse
+import json
+import subprocess
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from PIL import Image, ImageTk
+
+PLAYER_SIZE = (640, 360)
+BUFFER_FRAMES = 32
+# How long the slider has to rest before a drag seeks
+SEEK_DEBOUNCE_MS = 40
+# How often a player waiting for the first frame after a seek looks for it
+POLL_MS = 15
+STATUS_INTERVAL = 0.5
+
+
+def probe_video(video_path):
+    """Return (frames per second, duration in seconds) of the first video stream, or None"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=r_frame_rate:format=duration", "-of", "json", video_path],
+            capture_output=True,
+            text=True
+        )
+        info = json.loads(result.stdout)
+        numerator, denominator = info["streams"][0]["r_frame_rate"].split("/")
+        return float(numerator) / float(denominator), float(info["format"]["duration"])
+    except (OSError, ValueError, KeyError, IndexError, ZeroDivisionError):
+        return None
+
+
+class FrameRing:
+    """Preallocated frame slots handed from one decoder thread to the Tk thread"""
+
+    def __init__(self, capacity, frame_bytes):
+        self.slots = [bytearray(frame_bytes) for _ in range(capacity)]
+        self.frame_numbers = [0] * capacity
+        self.frame_bytes = frame_bytes
+        self.first = 0
+        self.count = 0
+        self.peak = 0
+        # Bumped by every seek; frames of older generations are discarded
+        self.generation = 0
+        self.finished = False
+        self._cond = threading.Condition()
+
+    @property
+    def nbytes(self):
+        return len(self.slots) * self.frame_bytes
+
+    def reset(self):
+        """Drop every buffered frame and return the new generation"""
+        with self._cond:
+            self.generation += 1
+            self.first = 0
+            self.count = 0
+            self.finished = False
+            self._cond.notify_all()
+            return self.generation
+
+    def reserve(self, generation):
+        """Wait for a free slot; return it, or None once the generation is over"""
+        with self._cond:
+            while self.count == len(self.slots) and self.generation == generation:
+                self._cond.wait()
+            if self.generation != generation:
+                return None
+            return self.slots[(self.first + self.count) % len(self.slots)]
+
+    def commit(self, generation, frame_number):
+        """Publish the slot returned by reserve as frame_number"""
+        with self._cond:
+            if self.generation != generation:
+                return
+            self.frame_numbers[(self.first + self.count) % len(self.slots)] = frame_number
+            self.count += 1
+            self.peak = max(self.peak, self.count)
+
+    def abandon(self, generation):
+        """End a generation, waking its decoder if it waits for a free slot"""
+        with self._cond:
+            if self.generation == generation:
+                self.generation += 1
+                self._cond.notify_all()
+
+    def finish(self, generation):
+        with self._cond:
+            if self.generation == generation:
+                self.finished = True
+
+    def take_due(self, due):
+        """Return (frame number, slot, frames dropped) for the newest frame numbered up to due.
+
+        Older due frames are released unseen. The returned slot stays valid until
+        release() is called. Returns None if no buffered frame is due.
+        """
+        with self._cond:
+            dropped = 0
+            while self.count > 1 and self.frame_numbers[(self.first + 1) % len(self.slots)] <= due:
+                self.first = (self.first + 1) % len(self.slots)
+                self.count -= 1
+                dropped += 1
+            if dropped:
+                self._cond.notify_all()
+            if not self.count or self.frame_numbers[self.first] > due:
+                return None
+            return self.frame_numbers[self.first], self.slots[self.first], dropped
+
+    def release(self):
+        """Free the slot returned by take_due"""
+        with self._cond:
+            if self.count:
+                self.first = (self.first + 1) % len(self.slots)
+                self.count -= 1
+                self._cond.notify_all()
+
+    def exhausted(self):
+        """Return whether the decoder finished and every frame was taken"""
+        with self._cond:
+            return self.finished and not self.count
+
+
+class PlayerStats:
+    """Playback counters across every video the player showed"""
+
+    def __init__(self):
+        self.shown = 0
+        self.dropped = 0
+        self.stalls = 0
+        self.seeks = 0
+        self.buffer_bytes = 0
+        self.peak_frames = 0
+        self.capacity = 0
+        self._lock = threading.Lock()
+
+    def summary(self):
+        with self._lock:
+            if not self.shown:
+                return "nothing played yet"
+            return (
+                f"{self.shown} frames shown, {self.dropped} dropped, {self.stalls} stalls, {self.seeks} seeks, "
+                f"buffer {self.peak_frames}/{self.capacity} frames ({self.buffer_bytes / (1024 * 1024):.1f} MB)"
+            )
+
+
+class _Decoder:
+    """One ffmpeg process feeding the ring from a start frame, on its own thread"""
+
+    def __init__(self, video_path, ring, generation, start_frame, fps, size):
+        self.ring = ring
+        self.generation = generation
+        self.start_frame = start_frame
+        width, height = size
+        command = ["ffmpeg", "-v", "error"]
+        if start_frame:
+            command += ["-ss", f"{start_frame / fps:.6f}"]
+        command += [
+            "-i", video_path,
+            "-vf", f"scale={width}:{height}:flags=bilinear",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.thread = threading.Thread(target=self._run, name="player-decoder", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        frame_number = self.start_frame
+        stream = self.process.stdout
+        try:
+            while True:
+                slot = self.ring.reserve(self.generation)
+                if slot is None:
+                    return  # Seeked or stopped
+                view = memoryview(slot)
+                filled = 0
+                while filled < len(slot):
+                    read = stream.readinto(view[filled:])
+                    if not read:
+                        self.ring.finish(self.generation)
+                        return
+                    filled += read
+                self.ring.commit(self.generation, frame_number)
+                frame_number += 1
+        except (OSError, ValueError):
+            self.ring.finish(self.generation)  # Pipe closed by stop()
+        finally:
+            stream.close()
+
+    def stop(self):
+        """Stop decoding; on return the thread no longer writes into any slot"""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.ring.abandon(self.generation)
+        # A read in progress may still fill a slot that the next generation reuses
+        self.thread.join()
+
+
+class VideoPlayer:
+    """Plays a video into a Tk label, with play/pause, a position slider and a status line"""
+
+    def __init__(self, root, label, controls_parent, video_path, stats=None, size=PLAYER_SIZE,
+                 buffer_frames=BUFFER_FRAMES):
+        probe = probe_video(video_path)
+        if probe is None:
+            raise RuntimeError(f"Cannot read {video_path} with ffprobe")
+        self.fps, self.duration = probe
+        self.frame_count = max(1, int(round(self.duration * self.fps)))
+
+        self.root = root
+        self.label = label
+        self.video_path = video_path
+        self.size = size
+        self.stats = stats or PlayerStats()
+        self.ring = FrameRing(buffer_frames, size[0] * size[1] * 3)
+
+        self.decoder = None
+        self.playing = False
+        # Last frame shown, or the frame a seek waits for until primed
+        self.position = 0
+        self.primed = False
+        self.clock_start = 0.0
+        self.clock_frame = 0
+        self.after_id = None
+        self.seek_id = None
+        self.last_status = 0.0
+        with self.stats._lock:
+            self.stats.capacity = buffer_frames
+            self.stats.buffer_bytes = self.ring.nbytes
+        # Started before any widget changes, so a missing ffmpeg leaves the window as it was
+        self._start_decoder(0)
+
+        self.photo = ImageTk.PhotoImage("RGB", size)
+        self.label.config(image=self.photo)
+        self.label.image = self.photo
+
+        self.controls = ttk.Frame(controls_parent)
+        # Packed ahead of the label, so an expanding label cannot squeeze the controls out
+        self.controls.pack(fill=tk.X, side=tk.BOTTOM, before=label)
+        self.play_button = ttk.Button(self.controls, text="Pause", width=6, command=self.toggle)
+        self.play_button.pack(side=tk.LEFT)
+        self.position_var = tk.DoubleVar(value=0.0)
+        self.slider = ttk.Scale(
+            self.controls, from_=0, to=self.frame_count - 1, variable=self.position_var, command=self._on_slider
+        )
+        self.slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.status = ttk.Label(self.controls, text="", width=36)
+        self.status.pack(side=tk.RIGHT)
+
+        self.play()
+
+    def _start_decoder(self, frame):
+        if self.decoder:
+            self.decoder.stop()
+        generation = self.ring.reset()
+        self.decoder = _Decoder(self.video_path, self.ring, generation, frame, self.fps, self.size)
+        self.position = frame
+        self.primed = False
+
+    def play(self):
+        if self.ring.exhausted() or self.position >= self.frame_count - 1:
+            self._start_decoder(0)  # Play again from the start
+        self.playing = True
+        self.play_button.config(text="Pause")
+        self._restart_clock(self.position)
+        self._schedule(0)
+
+    def pause(self):
+        self.playing = False
+        self.play_button.config(text="Play")
+        self._cancel_tick()
+
+    def toggle(self):
+        if self.playing:
+            self.pause()
+        else:
+            self.play()
+
+    def seek(self, frame):
+        """Continue from frame, playing or paused as before"""
+        frame = max(0, min(self.frame_count - 1, int(frame)))
+        with self.stats._lock:
+            self.stats.seeks += 1
+        self._cancel_tick()
+        self._start_decoder(frame)
+        self._restart_clock(frame)
+        self._schedule(0)
+
+    def _on_slider(self, value):
+        # Seek once the drag rests, not on every motion event
+        if self.seek_id:
+            self.root.after_cancel(self.seek_id)
+        self.seek_id = self.root.after(SEEK_DEBOUNCE_MS, self._seek_to_slider)
+
+    def _seek_to_slider(self):
+        self.seek_id = None
+        self.seek(self.position_var.get())
+
+    def _restart_clock(self, frame):
+        self.clock_start = time.perf_counter()
+        self.clock_frame = frame
+
+    def _schedule(self, delay_ms):
+        self._cancel_tick()
+        self.after_id = self.root.after(max(1, int(delay_ms)), self._tick)
+
+    def _cancel_tick(self):
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _tick(self):
+        self.after_id = None
+        if self.playing and self.primed:
+            due = self.clock_frame + int((time.perf_counter() - self.clock_start) * self.fps)
+        else:
+            due = self.position  # The frame a seek (or the start) waits for
+
+        taken = self.ring.take_due(due)
+        if taken:
+            frame_number, slot, dropped = taken
+            self._show(frame_number, slot)
+            with self.stats._lock:
+                self.stats.shown += 1
+                self.stats.dropped += dropped
+                self.stats.peak_frames = max(self.stats.peak_frames, self.ring.peak)
+        elif self.ring.exhausted():
+            self.pause()
+            self._update_status(force=True)
+            return
+        elif self.playing and self.primed and due > self.position:
+            with self.stats._lock:
+                self.stats.stalls += 1
+            # Hold the clock so the frames after a stall are not all dropped
+            self._restart_clock(self.position)
+
+        self._update_status()
+        if not self.primed:
+            self._schedule(POLL_MS)
+        elif self.playing:
+            next_due = self.clock_start + (self.position + 1 - self.clock_frame) / self.fps
+            self._schedule((next_due - time.perf_counter()) * 1000)
+
+    def _show(self, frame_number, slot):
+        # The image shares the slot's memory; paste copies it into Tk before the slot is released
+        image = Image.frombuffer("RGB", self.size, slot, "raw", "RGB", 0, 1)
+        self.photo.paste(image)
+        self.ring.release()
+        self.position = frame_number
+        if not self.primed:
+            # The clock starts with the first decoded frame, so decoder startup drops nothing
+            self.primed = True
+            self._restart_clock(frame_number)
+        if not self.seek_id:
+            self.position_var.set(frame_number)
+
+    def _update_status(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_status < STATUS_INTERVAL:
+            return
+        self.last_status = now
+        with self.stats._lock:
+            dropped = self.stats.dropped
+        self.status.config(
+            text=(
+                f"{self.position / self.fps:5.1f}/{self.duration:.1f}s  "
+                f"buf {self.ring.count}/{len(self.ring.slots)}  {dropped} dropped"
+            )
+        )
+
+    def close(self):
+        """Stop decoding and remove the controls"""
+        self._cancel_tick()
+        if self.seek_id:
+            self.root.after_cancel(self.seek_id)
+            self.seek_id = None
+        self.playing = False
+        if self.decoder:
+            self.ring.reset()
+            self.decoder.stop()
+            self.decoder = None
+        self.controls.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a video with the embedded player")
+    parser.add_argument("video", help="video file to play")
+    parser.add_argument("--buffer", type=int, default=BUFFER_FRAMES, help="decoded frames to buffer")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.title(args.video)
+    frame = ttk.Frame(root, padding="10")
+    frame.pack(fill=tk.BOTH, expand=True)
+    label = ttk.Label(frame)
+    label.pack()
+    stats = PlayerStats()
+    player = VideoPlayer(root, label, frame, args.video, stats, buffer_frames=args.buffer)
+
+    def on_close():
+        player.close()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.mainloop()
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
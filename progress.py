@@ -0,0 +1,92 @@
+"""
+progress.py - Live render progress parsed from manim's output
+
+manim draws a tqdm progress bar per animation, redrawing it in place with
+carriage returns, e.g. "Animation 3: Create(Square):  45%|####5     | 27/60".
+Knowing how many animations the scene plays (counted statically from the
+script), each redraw gives the overall fraction rendered, and the elapsed
+time gives an ETA. Updates are throttled so a fast bar reports a few times a
+second instead of once per frame.
+"""
+
+import re
+import threading
+import time
+
+PROGRESS_BAR = re.compile(r"Animation (\d+)\b.*?(\d+)%\|")
+REPORT_INTERVAL = 0.25
+
+
+def parse_progress(line):
+    """Return (animation number, percent) for a progress bar line, or None"""
+    match = PROGRESS_BAR.search(line)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    return f"~{minutes}m {seconds:02d}s left" if minutes else f"~{seconds}s left"
+
+
+class ProgressTracker:
+    """Turns fractions rendered into throttled (fraction, eta seconds, text) reports"""
+
+    def __init__(self, on_update, interval=REPORT_INTERVAL):
+        self.on_update = on_update
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.fraction = 0.0
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, fraction, animation=None):
+        """Record progress; report it unless a report went out less than interval ago"""
+        now = time.perf_counter()
+        with self._lock:
+            if fraction is not None:
+                self.fraction = max(self.fraction, min(1.0, fraction))
+            if now - self._last_report < self.interval and fraction != 1.0:
+                return
+            self._last_report = now
+            fraction = self.fraction
+
+        if fraction:
+            elapsed = now - self.started
+            eta = elapsed * (1 - fraction) / fraction
+            text = f"{fraction * 100:.0f}%, {format_eta(eta)}"
+        else:
+            eta = None
+            text = f"animation {animation}" if animation is not None else "starting"
+        self.on_update(fraction, eta, text)
+
+
+class AnimationProgress:
+    """Feeds one manim process's output lines into a tracker
+
+    first and total describe the animation range the process renders. With
+    on_fraction, chunks rendering in parallel can combine their fractions
+    before reporting.
+    """
+
+    def __init__(self, tracker, total=None, first=0, on_fraction=None):
+        self.tracker = tracker
+        self.total = total
+        self.first = first
+        self.on_fraction = on_fraction
+
+    def feed(self, line):
+        parsed = parse_progress(line)
+        if not parsed:
+            return
+        animation, percent = parsed
+        fraction = None
+        if self.total:
+            fraction = (animation - self.first + percent / 100) / self.total
+        if self.on_fraction:
+            self.on_fraction(fraction, animation)
+        else:
+            self.tracker.update(fraction, animation)
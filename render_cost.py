@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+render_cost.py - Estimate how long a scene will take to render, before rendering it
+
+The estimate comes from the script's AST: how many play() and wait() calls
+construct() makes, how many seconds of animation they add up to (run_time
+arguments, wait durations), how many MathTex/Tex objects need LaTeX, how many
+updaters run on every frame, and how many mobjects loops create. Loops with a
+constant range count their body that many times; other loops are guessed.
+
+A linear model turns those features into seconds for a given quality. It
+starts from hand-set weights and is refitted with ridge regression (pulled
+towards those weights, so a few samples cannot throw it off) every time a
+render finishes, from the features and measured time of the last renders.
+
+The scheduler uses the estimate to render short jobs first, the pipeline to
+warn about expensive scenes and to decide how many chunks a render is worth.
+
+Run `python render_cost.py scene.py` to see a script's features and estimate.
+"""
+
+import argparse
+import ast
+import json
+import os
+import threading
+import time
+
+# Quality -> (frames per second, megapixels per frame), matching manim's presets
+QUALITY_FRAMES = {
+    "low": (15, 854 * 480 / 1e6),
+    "medium": (30, 1280 * 720 / 1e6),
+    "high": (60, 1920 * 1080 / 1e6),
+    "4k": (60, 3840 * 2160 / 1e6),
+}
+
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex", "Title", "BulletedList", "MathTable"}
+UPDATER_CALLS = {"add_updater", "always_redraw", "always", "f_always", "turn_animation_into_updater"}
+# How often a loop without a constant range is assumed to run
+LOOP_GUESS = 4
+
+# Seconds per unit of each feature before any render was measured
+PRIOR_WEIGHTS = {
+    "intercept": 3.0,
+    "animations": 0.3,
+    "frames": 0.005,
+    "pixel_frames": 0.02,
+    "updater_frames": 0.002,
+    "tex": 0.5,
+    "redraw_tex_frames": 0.2,
+    "loop_mobjects": 0.02,
+}
+FEATURES = list(PRIOR_WEIGHTS)
+# How strongly the fit is pulled towards the prior weights
+RIDGE = 1.0
+MAX_SAMPLES = 1000
+
+
+def _number(node, default):
+    """Return a constant number from an AST node, or default"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return default
+
+
+def _loop_count(node):
+    """How many times a for/while loop runs, if the AST says so"""
+    if isinstance(node, ast.For):
+        iterable = node.iter
+        if isinstance(iterable, (ast.List, ast.Tuple, ast.Set)):
+            return len(iterable.elts)
+        if isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name) and iterable.func.id == "range":
+            bounds = [_number(arg, None) for arg in iterable.args]
+            if bounds and None not in bounds:
+                if len(bounds) == 1:
+                    bounds = [0.0] + bounds
+                start, stop, step = (bounds + [1.0])[:3]
+                if step:
+                    return max(0, int((stop - start) / step))
+    return LOOP_GUESS
+
+
+def _call_name(node):
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+class _Counter(ast.NodeVisitor):
+    """Adds up a method's features, following calls to other methods of the scene"""
+
+    def __init__(self, methods):
+        self.methods = methods
+        self.weight = 1.0
+        self.in_updater = 0
+        self.stack = []
+        self.totals = {"animations": 0.0, "run_time": 0.0, "tex": 0.0, "updaters": 0.0,
+                       "redraw_tex": 0.0, "loop_mobjects": 0.0}
+
+    def count_method(self, name):
+        if name in self.stack or name not in self.methods:
+            return
+        self.stack.append(name)
+        for statement in self.methods[name].body:
+            self.visit(statement)
+        self.stack.pop()
+
+    def _loop(self, node):
+        outer = self.weight
+        self.weight *= _loop_count(node)
+        self.generic_visit(node)
+        self.weight = outer
+
+    visit_For = _loop
+    visit_While = _loop
+
+    def _comprehension(self, node):
+        outer = self.weight
+        for generator in node.generators:
+            self.weight *= _loop_count(ast.For(iter=generator.iter, body=[], orelse=[]))
+        self.generic_visit(node)
+        self.weight = outer
+
+    visit_ListComp = _comprehension
+    visit_SetComp = _comprehension
+    visit_GeneratorExp = _comprehension
+    visit_DictComp = _comprehension
+
+    def visit_Call(self, node):
+        name = _call_name(node)
+        is_self_call = isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) \
+            and node.func.value.id == "self"
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+
+        if is_self_call and name == "play":
+            self.totals["animations"] += self.weight
+            self.totals["run_time"] += self.weight * _number(keywords.get("run_time"), 1.0)
+        elif is_self_call and name in ("wait", "pause"):
+            self.totals["animations"] += self.weight
+            duration = node.args[0] if node.args else keywords.get("duration")
+            self.totals["run_time"] += self.weight * _number(duration, 1.0)
+        elif is_self_call and name == "wait_until":
+            self.totals["animations"] += self.weight
+            self.totals["run_time"] += self.weight * _number(keywords.get("max_time"), 60.0)
+        elif is_self_call and name in self.methods:
+            self.count_method(name)
+        elif name in TEX_CLASSES:
+            # LaTeX built inside an updater is compiled again whenever its text changes
+            self.totals["redraw_tex" if self.in_updater else "tex"] += self.weight
+        elif name in UPDATER_CALLS:
+            self.totals["updaters"] += self.weight
+            self.in_updater += 1
+            self.generic_visit(node)
+            self.in_updater -= 1
+            return
+
+        if name and name[:1].isupper() and self.weight > 1:
+            self.totals["loop_mobjects"] += self.weight
+        self.generic_visit(node)
+
+
+def scene_features(code, scene_name="AutoScene"):
+    """Return the raw feature totals of a scene's construct(), or None if it cannot be parsed"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    scene = next(
+        (node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == scene_name), None
+    )
+    if scene is None:
+        return None
+    methods = {node.name: node for node in scene.body if isinstance(node, ast.FunctionDef)}
+    counter = _Counter(methods)
+    counter.count_method("construct")
+    return counter.totals
+
+
+def quality_features(totals, quality):
+    """Turn raw totals into the model's features for a render at quality"""
+    fps, megapixels = QUALITY_FRAMES[quality]
+    frames = totals["run_time"] * fps
+    return {
+        "intercept": 1.0,
+        "animations": totals["animations"],
+        "frames": frames,
+        "pixel_frames": frames * megapixels,
+        "updater_frames": frames * totals["updaters"],
+        "tex": totals["tex"],
+        "redraw_tex_frames": frames * totals["redraw_tex"],
+        "loop_mobjects": totals["loop_mobjects"],
+    }
+
+
+def solve(matrix, vector):
+    """Solve a small linear system by Gaussian elimination with partial pivoting"""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        if abs(rows[column][column]) < 1e-12:
+            return None
+        for row in range(column + 1, size):
+            factor = rows[row][column] / rows[column][column]
+            for index in range(column, size + 1):
+                rows[row][index] -= factor * rows[column][index]
+    solution = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        total = rows[row][size] - sum(rows[row][index] * solution[index] for index in range(row + 1, size))
+        solution[row] = total / rows[row][row]
+    return solution
+
+
+def fit(samples, prior=PRIOR_WEIGHTS, ridge=RIDGE):
+    """Ridge regression towards the prior weights; weights are kept non-negative"""
+    size = len(FEATURES)
+    normal = [[ridge if row == column else 0.0 for column in range(size)] for row in range(size)]
+    target = [ridge * prior[name] for name in FEATURES]
+    for features, seconds in samples:
+        values = [features[name] for name in FEATURES]
+        for row in range(size):
+            target[row] += values[row] * seconds
+            for column in range(size):
+                normal[row][column] += values[row] * values[column]
+    weights = solve(normal, target)
+    if weights is None:
+        return dict(prior)
+    return {name: max(0.0, weight) for name, weight in zip(FEATURES, weights)}
+
+
+def predict(weights, features):
+    return sum(weights[name] * features[name] for name in FEATURES)
+
+
+class CostModel:
+    """Estimates render seconds and learns from measured renders, persisted to path"""
+
+    def __init__(self, path=None, backend="subprocess"):
+        self.path = path
+        # Warm workers skip startup, so each render backend is fitted separately
+        self.backend = backend
+        self.samples = []
+        self.weights = dict(PRIOR_WEIGHTS)
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.samples = json.load(f)["samples"]
+            except (OSError, ValueError, KeyError):
+                self.samples = []
+            self.weights = fit(self._training_set())
+
+    def _training_set(self):
+        return [
+            (quality_features(sample["totals"], sample["quality"]), sample["seconds"])
+            for sample in self.samples if sample["backend"] == self.backend
+        ]
+
+    def estimate(self, code, quality, scene_name="AutoScene"):
+        """Return the estimated render seconds at quality, or None if the script cannot be analyzed"""
+        totals = scene_features(code, scene_name)
+        if totals is None:
+            return None
+        with self._lock:
+            return predict(self.weights, quality_features(totals, quality))
+
+    def record(self, code, quality, seconds, scene_name="AutoScene"):
+        """Add a measured render and refit the model"""
+        totals = scene_features(code, scene_name)
+        if totals is None:
+            return
+        with self._lock:
+            self.samples.append({
+                "totals": totals, "quality": quality, "seconds": seconds,
+                "backend": self.backend, "time": time.time(),
+            })
+            self.samples = self.samples[-MAX_SAMPLES:]
+            self.weights = fit(self._training_set())
+            if self.path:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"samples": self.samples, "weights": self.weights}, f)
+        os.replace(temp_path, self.path)
+
+    def summary(self):
+        """Sample count and median relative error of the fitted model on them"""
+        with self._lock:
+            training = self._training_set()
+            if not training:
+                return "not calibrated yet"
+            errors = sorted(abs(predict(self.weights, features) - seconds) / max(seconds, 0.1)
+                            for features, seconds in training)
+            return f"{len(training)} renders measured, median error {errors[len(errors) // 2]:.0%}"
+
+
+def make_cost_model(config):
+    return CostModel(config["cost_model_path"], config["render_backend"])
+
+
+def main():
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Estimate the render time of a manim scene")
+    parser.add_argument("script", help="scene script to analyze")
+    parser.add_argument("--scene", default="AutoScene", help="scene class name")
+    args = parser.parse_args()
+
+    with open(args.script, "r", encoding="utf-8") as f:
+        code = f.read()
+    totals = scene_features(code, args.scene)
+    if totals is None:
+        print(f"Cannot analyze {args.script}: no parsable class {args.scene}")
+        return
+
+    for name, value in totals.items():
+        print(f"{name:<16}{value:8.1f}")
+    model = make_cost_model(load_config())
+    print(f"\nModel: {model.summary()}")
+    for quality in QUALITY_FRAMES:
+        print(f"{quality:<8}~{model.estimate(code, quality, args.scene):.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+render_worker.py - Long-lived manim render workers
+
+Launching `manim` for every job pays for interpreter startup and for importing
+manim, numpy, scipy and cairo before a single frame is drawn. A warm worker is
+a Python process that imports manim once and then renders scene scripts sent to
+it one at a time, each loaded as a fresh module and rendered inside tempconfig
+so manim's global config is restored between jobs.
+
+Workers talk JSON lines over stdin/stdout. Everything manim prints is moved to
+the worker's stderr, which goes to a log file. A worker that crashes, hangs
+past its timeout or is cancelled is killed and replaced by a fresh one.
+
+Run `python render_worker.py --benchmark` to compare cold and warm latency.
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from limits import ResourceLimits, explain_exit, kill_tree
+
+# manim config names for the quality ladder in pipeline.QUALITY_LEVELS
+MANIM_QUALITIES = {
+    "low": "low_quality",
+    "medium": "medium_quality",
+    "high": "high_quality",
+    "4k": "fourk_quality",
+}
+
+
+def render_request(request):
+    """Render one scene inside the worker; return the JSON-able response"""
+    import gc
+    import importlib.util
+    import traceback
+    import uuid
+
+    from manim import config, tempconfig
+
+    module_name = f"autoscene_{uuid.uuid4().hex}"
+    started = time.perf_counter()
+    if request.get("cpu_seconds"):
+        # The worker's CPU time adds up over jobs, so the limit is relative to now
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        limit = int(usage.ru_utime + usage.ru_stime) + request["cpu_seconds"]
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, resource.getrlimit(resource.RLIMIT_CPU)[1]))
+    try:
+        with tempconfig({}):
+            config.quality = MANIM_QUALITIES[request["quality"]]
+            config.media_dir = request["media_dir"]
+            # The script's file name decides the media sub-folder, as with the CLI
+            config.input_file = request["script"]
+            if request.get("output_name"):
+                config.output_file = request["output_name"]
+            if request.get("animations"):
+                config.from_animation_number, config.upto_animation_number = request["animations"]
+            if request.get("skip_animations"):
+                config.save_last_frame = True
+                config.write_to_movie = False
+                config.disable_caching = True
+
+            spec = importlib.util.spec_from_file_location(module_name, request["script"])
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+            scene = getattr(module, request["scene"])()
+            scene.render()
+
+            # A still when animations are skipped, the movie otherwise
+            file_writer = scene.renderer.file_writer
+            if request.get("skip_animations"):
+                video = str(file_writer.image_file_path) if getattr(file_writer, "image_file_path", None) else None
+            else:
+                video = str(file_writer.movie_file_path)
+        return {"ok": True, "video": video, "seconds": time.perf_counter() - started}
+    except Exception:
+        return {"ok": False, "error": traceback.format_exc(), "seconds": time.perf_counter() - started}
+    finally:
+        sys.modules.pop(module_name, None)
+        gc.collect()
+
+
+def serve():
+    """Worker main loop: read requests from stdin, answer on the original stdout"""
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    # Anything manim or the scene prints must not corrupt the protocol stream
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    import manim  # noqa: F401  Pay the import cost once, before the first job
+
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        if line.strip():
+            protocol.write(json.dumps(render_request(json.loads(line))) + "\n")
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker process died or was killed while handling a request"""
+
+
+class WarmWorker:
+    """One warm render process, respawned whenever it dies"""
+
+    def __init__(self, log_path=None, limits=None):
+        self.log_path = log_path
+        self.limits = limits or ResourceLimits()
+        self.process = None
+        self.spawn_seconds = None
+
+    def spawn(self):
+        started = time.perf_counter()
+        log = open(self.log_path, "a") if self.log_path else subprocess.DEVNULL
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=log,
+            text=True,
+            bufsize=1,
+            # CPU time is limited per request instead, see render_request
+            **self.limits.popen_kwargs(include_cpu=False)
+        )
+        self.limits.apply_to(self.process, include_cpu=False)
+        if log is not subprocess.DEVNULL:
+            log.close()  # The child keeps its own handle
+
+        if not self.process.stdout.readline():
+            raise WorkerCrashed("Render worker failed to start (is manim installed?)")
+        self.spawn_seconds = time.perf_counter() - started
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def request(self, request, timeout=None):
+        """Send one request and wait for its response, killing the worker on timeout"""
+        if not self.alive():
+            self.spawn()
+
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            kill_tree(self.process)
+
+        timer = threading.Timer(timeout, on_timeout) if timeout else None
+        try:
+            if timer:
+                timer.start()
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except OSError:
+            line = ""
+        finally:
+            if timer:
+                timer.cancel()
+
+        if not line:
+            kill_tree(self.process)
+            returncode = self.process.wait()
+            self.process = None
+            if timed_out.is_set():
+                raise WorkerCrashed(f"Render did not finish within {timeout}s")
+            raise WorkerCrashed(explain_exit(returncode, "", self.limits) or "Render worker exited while rendering")
+        return json.loads(line)
+
+    def close(self):
+        if self.alive():
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WarmRenderPool:
+    """A fixed number of warm workers shared by the render threads"""
+
+    def __init__(self, size, log_dir=None, limits=None):
+        self.size = size
+        self.idle = queue.Queue()
+        self.respawns = 0
+        # The task each busy worker is rendering for; cancelling a task only
+        # kills a worker while it is still serving that task
+        self.serving = {}
+        self._lock = threading.Lock()
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        for index in range(size):
+            log_path = os.path.join(log_dir, f"render-worker-{index}.log") if log_dir else None
+            self.idle.put(WarmWorker(log_path, limits))
+
+    def warm_up(self):
+        """Start every worker ahead of the first job; return the slowest startup time"""
+        workers = [self.idle.get() for _ in range(self.size)]
+        try:
+            for worker in workers:
+                if not worker.alive():
+                    worker.spawn()
+        finally:
+            for worker in workers:
+                self.idle.put(worker)
+        return max(worker.spawn_seconds or 0.0 for worker in workers)
+
+    def render(self, script_path, scene_name, media_dir, quality="low", skip_animations=False,
+               timeout=None, task=None, output_name=None, animations=None):
+        """Render a scene on the next free worker; return (success, error output, video path).
+        
+        With skip_animations the path is that of the last frame's image instead.
+        """
+        worker = self.idle.get()
+        with self._lock:
+            self.serving[worker] = task
+        if task:
+            task.attach(worker, lambda: self.cancel(worker, task))
+        try:
+            if task and task.cancelled:
+                return False, "Render cancelled", None
+            response = worker.request({
+                "cpu_seconds": worker.limits.cpu_seconds,
+                "script": os.path.abspath(script_path),
+                "scene": scene_name,
+                "media_dir": os.path.abspath(media_dir),
+                "quality": quality,
+                "skip_animations": skip_animations,
+                "output_name": output_name,
+                "animations": animations,
+            }, timeout)
+        except WorkerCrashed as e:
+            self.respawns += 1
+            if task and task.cancelled:
+                return False, "Render cancelled", None
+            return False, str(e), None
+        finally:
+            if task:
+                task.detach(worker)
+            with self._lock:
+                self.serving.pop(worker, None)
+            self.idle.put(worker)
+
+        return response["ok"], response.get("error", ""), response.get("video")
+
+    def cancel(self, worker, task):
+        """Kill a worker's render, but only while it is still rendering for task"""
+        with self._lock:
+            if self.serving.get(worker) is task and worker.alive():
+                kill_tree(worker.process)
+
+    def close(self):
+        for _ in range(self.size):
+            self.idle.get().close()
+
+
+BENCHMARK_SCENES = {
+    "square": (
+        "from manim import *\n\n"
+        "class AutoScene(Scene):\n"
+        "    def construct(self):\n"
+        "        self.play(Create(Square()))\n"
+    ),
+    "text": (
+        "from manim import *\n\n"
+        "class AutoScene(Scene):\n"
+        "    def construct(self):\n"
+        "        title = Text('Pythagorean Theorem')\n"
+        "        self.play(Write(title))\n"
+        "        self.play(FadeOut(title))\n"
+    ),
+    "graph": (
+        "from manim import *\n\n"
+        "class AutoScene(Scene):\n"
+        "    def construct(self):\n"
+        "        axes = Axes(x_range=[-3, 3], y_range=[-1, 9])\n"
+        "        curve = axes.plot(lambda x: x ** 2, color=BLUE)\n"
+        "        self.play(Create(axes), Create(curve))\n"
+    ),
+}
+
+
+def benchmark(runs=3):
+    """Time cold `manim` processes against a warm worker on small scenes"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        scripts = {}
+        for name, code in BENCHMARK_SCENES.items():
+            scripts[name] = os.path.join(work_dir, f"{name}.py")
+            with open(scripts[name], "w", encoding="utf-8") as f:
+                f.write(code)
+
+        pool = WarmRenderPool(1)
+        try:
+            print(f"Warm worker startup (paid once): {pool.warm_up():.2f}s\n")
+        except WorkerCrashed as e:
+            print(f"Error: {str(e)}")
+            return
+        print(f"{'scene':<10}{'cold (s)':>12}{'warm (s)':>12}{'speedup':>10}")
+
+        for name, script in scripts.items():
+            cold_times = []
+            warm_times = []
+            for run in range(runs):
+                media_dir = os.path.join(work_dir, f"cold-{name}-{run}")
+                started = time.perf_counter()
+                subprocess.run(
+                    ["manim", "-ql", "--disable_caching", script, "AutoScene", "--media_dir", media_dir],
+                    capture_output=True
+                )
+                cold_times.append(time.perf_counter() - started)
+
+                media_dir = os.path.join(work_dir, f"warm-{name}-{run}")
+                started = time.perf_counter()
+                success, error, _ = pool.render(script, "AutoScene", media_dir)
+                warm_times.append(time.perf_counter() - started)
+                if not success:
+                    print(error)
+
+            cold = sorted(cold_times)[len(cold_times) // 2]
+            warm = sorted(warm_times)[len(warm_times) // 2]
+            print(f"{name:<10}{cold:>12.2f}{warm:>12.2f}{cold / warm:>9.1f}x")
+
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm manim render worker")
+    parser.add_argument("--serve", action="store_true", help="run as a worker (used internally)")
+    parser.add_argument("--benchmark", action="store_true", help="compare cold and warm render latency")
+    parser.add_argument("--runs", type=int, default=3, help="renders per scene in the benchmark")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+    elif args.benchmark:
+        benchmark(args.runs)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+scheduler.py - Runs many visualization jobs concurrently as a staged pipeline
+
+Each pipeline stage (refine, generate, validate, render) has its own pool of
+worker threads and its own input queue. The LLM stages get many workers since
+they only wait on the network; the render stage gets one worker per core since
+each of its workers drives a CPU-bound manim subprocess. While manim renders
+one job, the Gemini calls for the next jobs are already in flight.
+
+The queues between stages are bounded: when the render stage falls behind,
+validate workers block on handing over their job, which in turn stalls the
+LLM stages, so a burst of prompts waits as cheap prompts in the intake queue
+instead of piling up as generated scripts waiting for a renderer.
+
+Renders are served shortest estimated job first (see render_cost.py), so a
+quick scene is not stuck behind a long one.
+
+Storyboard jobs stop after the render stage has drawn their keyframe stills.
+Approving one queues its full render; sending feedback queues it on the
+generate stage, which revises the script before it is validated and
+storyboarded again.
+
+Once a job's preview is done, higher quality renders are queued on the render
+stage at a lower priority. They only run when no foreground job is waiting,
+and a foreground job arriving while every render worker is busy pre-empts one
+of them; the pre-empted render is queued again and restarts later.
+
+Every job is recorded in the job store (see job_store.py) when it is
+submitted, after each stage and when it finishes. Jobs left unfinished by a
+crash, or by closing the app, are resumed after the last stage they
+completed.
+"""
+
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+
+import pipeline
+
+# Queue priorities; lower values are served first
+STOP = -1
+FOREGROUND = 0
+
+
+def default_worker_count():
+    return os.cpu_count() or 1
+
+
+class Stage:
+    """One pipeline stage: a priority queue, the workers draining it and a bound on waiting jobs"""
+
+    def __init__(self, name, func, workers, maxsize):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.PriorityQueue()
+        # Only foreground jobs count against the bound, so background renders
+        # queued by the render workers themselves can never block them
+        self.slots = threading.Semaphore(maxsize) if maxsize else None
+        self.next = None
+        self.threads = []
+        self._sequence = itertools.count()
+
+    def put(self, job, priority=FOREGROUND, quality=None, cost=0.0):
+        """Queue job, blocking while the stage already has maxsize foreground jobs waiting.
+        
+        Within a priority, jobs with the lowest estimated cost go first.
+        """
+        if self.slots and priority == FOREGROUND:
+            self.slots.acquire()
+        self.queue.put((priority, cost, next(self._sequence), job, quality))
+
+    def get(self):
+        """Return the next (priority, job, quality) to work on"""
+        priority, _, _, job, quality = self.queue.get()
+        if self.slots and priority == FOREGROUND:
+            self.slots.release()
+        return priority, job, quality
+
+    def stop(self, count):
+        for _ in range(count):
+            self.queue.put((STOP, 0.0, next(self._sequence), None, None))
+
+
+class JobScheduler:
+    """Feeds Jobs through the pipeline stages, reporting updates on self.events"""
+
+    def __init__(self, config, llm_cache=None, render_cache=None, events=None, llm=None):
+        self.render_workers = config["render_workers"] or default_worker_count()
+        self.llm_workers = config["llm_workers"]
+        self.jobs_dir = config["jobs_dir"]
+        self.jobs = {}
+        # Anything with put(job); the UI passes a ui_events.CoalescingQueue
+        self.events = events if events is not None else queue.Queue()
+        self.context = pipeline.PipelineContext(config, llm_cache, render_cache, self.events.put, llm)
+        self._lock = threading.Lock()
+        # Background renders in progress: job id -> (quality, RenderTask)
+        self._upgrades_running = {}
+        self._idle_render_workers = self.render_workers
+        # Set by shutdown(); jobs failing because of it stay resumable in the job store
+        self._closing = False
+
+        # Enough slack between stages to keep every render worker busy
+        queue_size = config["stage_queue_size"] or 2 * self.render_workers
+        worker_counts = {
+            "refine": self.llm_workers,
+            "generate": self.llm_workers,
+            "validate": self.render_workers,
+            "render": self.render_workers,
+        }
+
+        self.stages = []
+        for name, func in pipeline.STAGES:
+            # Prompts waiting to start are cheap, so only later stages are bounded
+            maxsize = queue_size if self.stages else 0
+            self.stages.append(Stage(name, func, worker_counts[name], maxsize))
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next = next_stage
+        self.render_stage = self.stages[-1]
+
+        for stage in self.stages:
+            for index in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._run_stage,
+                    args=(stage,),
+                    name=f"{stage.name}-{index}",
+                    daemon=True
+                )
+                thread.start()
+                stage.threads.append(thread)
+
+    def _run_stage(self, stage):
+        while True:
+            priority, job, quality = stage.get()
+            if priority == STOP:
+                break
+
+            if quality:
+                self._run_upgrade(job, quality, priority)
+                continue
+
+            self._set_busy(stage, True)
+            try:
+                if job.cancelled:
+                    raise RuntimeError("Cancelled")
+                with self.context.tracer.span(job, stage.name):
+                    forward = stage.func(job, self.context)
+                # LLM calls cannot be interrupted, so a cancel may land while one is in flight
+                if job.cancelled and not job.done:
+                    raise RuntimeError("Cancelled")
+            except Exception as e:
+                pipeline.fail_job(job, self.context, e)
+                forward = False
+            finally:
+                self._set_busy(stage, False)
+
+            if forward:
+                self._record(job, stage.name)
+            elif not (self._closing and job.state == pipeline.FAILED):
+                self._record(job)
+
+            if forward and stage.next:
+                job.message = f"Waiting for {stage.next.name} worker"
+                if job.warning:
+                    job.message += f" ({job.warning})"
+                self.events.put(job)
+                if stage.next is self.render_stage:
+                    self._preempt_upgrade()
+                # Blocks while the next stage is saturated (backpressure); the
+                # render stage serves the shortest estimated render first
+                stage.next.put(job, cost=job.estimated_seconds or 0.0)
+            elif job.state == pipeline.COMPLETE:
+                self._queue_upgrades(job)
+            if job.done:
+                self._evict_artifacts()
+
+    def _set_busy(self, stage, busy):
+        if stage is self.render_stage:
+            with self._lock:
+                self._idle_render_workers += -1 if busy else 1
+
+    def _queue_upgrades(self, job):
+        """Queue background renders for every configured quality above the preview"""
+        levels = list(pipeline.QUALITY_LEVELS)
+        preview = levels.index(job.quality)
+        job.upgrades = [quality for quality in self.context.upgrade_qualities if levels.index(quality) > preview]
+        for quality in job.upgrades:
+            # All jobs' medium renders come before anyone's high renders, and so on
+            cost = self.context.cost_model.estimate(job.code, quality) or 0.0
+            self.render_stage.put(job, FOREGROUND + 1 + levels.index(quality), quality, cost)
+
+    def _run_upgrade(self, job, quality, priority):
+        if job.upgrades_cancelled:
+            return
+
+        task = pipeline.RenderTask()
+        with self._lock:
+            self._idle_render_workers -= 1
+            self._upgrades_running[job.id] = (quality, task)
+        try:
+            with self.context.tracer.span(job, f"upgrade_{quality}"):
+                finished = pipeline.run_upgrade_render(job, self.context, quality, task)
+        except Exception as e:
+            job.message = f"{quality.capitalize()} quality render failed: {str(e)}"
+            self.events.put(job)
+            finished = True
+        finally:
+            with self._lock:
+                self._idle_render_workers += 1
+                self._upgrades_running.pop(job.id, None)
+
+        if finished:
+            self._record(job)
+            self._evict_artifacts()
+        elif not job.upgrades_cancelled:
+            # Pre-empted by a foreground job; try again once the queue drains
+            job.message = f"{quality.capitalize()} quality render paused for a new job"
+            self.events.put(job)
+            self.render_stage.put(job, priority, quality, self.context.cost_model.estimate(job.code, quality) or 0.0)
+
+    def _record(self, job, completed_stage=None):
+        """Save job to the job store, noting the stage it just completed"""
+        if not self.context.job_store:
+            return
+        try:
+            self.context.job_store.save(job, completed_stage)
+        except sqlite3.Error as e:
+            # Losing a history entry must not fail the job itself
+            print(f"Error recording job {job.id}: {str(e)}")
+
+    def _evict_artifacts(self):
+        """Trim old jobs' files to the disk quota, sparing jobs that are still rendering"""
+        with self._lock:
+            busy = {
+                job.id for job in self.jobs.values()
+                if not job.done or (not job.upgrades_cancelled and any(q not in job.videos for q in job.upgrades))
+            }
+        self.context.artifacts.evict(protect=busy)
+
+    def _preempt_upgrade(self):
+        """Cancel one background render if no render worker is free for a foreground job"""
+        with self._lock:
+            if self._idle_render_workers > 0 or not self._upgrades_running:
+                return
+            # Pre-empt the most expensive background render
+            levels = list(pipeline.QUALITY_LEVELS)
+            job_id = max(self._upgrades_running, key=lambda key: levels.index(self._upgrades_running[key][0]))
+            _, task = self._upgrades_running[job_id]
+        task.cancel()
+
+    def cancel_upgrades(self, job_id):
+        """Stop background renders for a job, queued or running"""
+        job = self.jobs.get(job_id)
+        if not job or not job.upgrades:
+            return
+        job.upgrades_cancelled = True
+        with self._lock:
+            running = self._upgrades_running.get(job_id)
+        if running:
+            running[1].cancel()
+        job.message = "Background renders cancelled"
+        self.events.put(job)
+
+    def cancel_job(self, job_id):
+        """Stop a job at whatever stage it is in, killing its manim processes"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        if job.done:
+            self.cancel_upgrades(job_id)
+            return
+        job.cancelled = True
+        job.upgrades_cancelled = True
+        job.task.cancel()
+        if job.state == pipeline.REVIEW:
+            # No worker holds a job awaiting review, so nothing else would fail it
+            pipeline.fail_job(job, self.context, "Cancelled")
+            self._record(job)
+            self._evict_artifacts()
+            return
+        job.message = "Cancelling"
+        self.events.put(job)
+
+    def approve_storyboard(self, job_id):
+        """Queue the full render of a job awaiting storyboard review"""
+        job = self.jobs.get(job_id)
+        if not job or job.state != pipeline.REVIEW:
+            return
+        job.approved = True
+        self._requeue(job, self.render_stage, "Approved, waiting for render worker")
+
+    def revise_storyboard(self, job_id, feedback):
+        """Send a job awaiting storyboard review back to the generator with feedback"""
+        job = self.jobs.get(job_id)
+        if not job or job.state != pipeline.REVIEW:
+            return
+        job.feedback = feedback
+        self._requeue(job, self.stages[1], "Waiting for generate worker to revise the script")
+
+    def _requeue(self, job, stage, message):
+        job.state = pipeline.QUEUED
+        job.message = message
+        self._record(job)
+        self.events.put(job)
+        if stage is self.render_stage:
+            self._preempt_upgrade()
+        # put() blocks while the stage is saturated, which must not stall the caller (the UI)
+        threading.Thread(
+            target=stage.put, args=(job,), kwargs={"cost": job.estimated_seconds or 0.0}, daemon=True
+        ).start()
+
+    def submit(self, prompt, use_cache=True, storyboard=False):
+        """Queue a prompt for generation and return its Job.
+        
+        With storyboard, the job stops for review once its keyframe stills are drawn.
+        """
+        job = pipeline.Job(prompt, self.jobs_dir, use_cache, storyboard=storyboard)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._record(job)
+        self.events.put(job)
+        self.stages[0].put(job)
+        return job
+
+    def resume(self):
+        """Queue the unfinished jobs of earlier runs after the last stage they completed; return them"""
+        if not self.context.job_store:
+            return []
+        resumed = []
+        for entry in self.context.job_store.unfinished(pipeline.FINISHED_STATES):
+            if entry["id"] in self.jobs:
+                continue
+            job = pipeline.restore_job(entry)
+            stage_index = pipeline.resume_stage(job, self.context, entry["last_stage"])
+            with self._lock:
+                self.jobs[job.id] = job
+            if stage_index is None:
+                job.message = "Storyboard ready for review"
+                self.events.put(job)
+            else:
+                stage = self.stages[stage_index]
+                self._requeue(job, stage, f"Resumed, waiting for {stage.name} worker")
+            resumed.append(job)
+        return resumed
+
+    def load_job(self, job_id):
+        """Return a job of this run, or a finished one from the job store, or None"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job or not self.context.job_store:
+            return job
+        entry = self.context.job_store.get(job_id)
+        if not entry or entry["state"] not in pipeline.FINISHED_STATES:
+            return None  # Unfinished jobs are only picked up by resume()
+        job = pipeline.restore_job(entry)
+        with self._lock:
+            return self.jobs.setdefault(job.id, job)
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if not job.done)
+
+    def shutdown(self, wait=False):
+        """Stop the workers once they finish their current job.
+        
+        Without wait, running renders are killed rather than left behind.
+        """
+        self._closing = True
+        with self._lock:
+            running = [task for _, task in self._upgrades_running.values()]
+            if not wait:
+                running += [job.task for job in self.jobs.values() if not job.done]
+        for task in running:
+            task.cancel()
+
+        for stage in self.stages:
+            # Stop markers sort before any queued job
+            stage.stop(len(stage.threads))
+
+        if wait:
+            for stage in self.stages:
+                for thread in stage.threads:
+                    thread.join()
+            self.context.close()
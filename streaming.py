@@ -0,0 +1,83 @@
+"""
+streaming.py - Incremental checking of Manim scripts while they are generated
+
+The code generator streams its response. Every time a chunk completes one or
+more lines, the script so far is compiled with codeop, which tells apart code
+that is merely unfinished from code that can never become valid. A script
+that is already broken is rejected right away instead of after the full
+generation latency.
+
+The scene class name is not judged here: a class that looks like the wrong
+scene may be a helper base that the real scene, still to arrive, derives
+from. validation.check_scene_class checks it once the script is complete.
+"""
+
+import codeop
+import time
+import warnings
+
+
+class StreamAborted(RuntimeError):
+    """Raised when a streamed script is rejected before generation finishes"""
+
+
+def strip_fences(text):
+    """Drop a leading ```python fence and anything from the closing fence on"""
+    if text.startswith("```python"):
+        text = text[len("```python"):].lstrip("\n")
+    end = text.find("```")
+    return text if end == -1 else text[:end]
+
+
+def check_partial_script(text):
+    """Return why a partially streamed script can never become valid, or None"""
+    source = strip_fences(text)
+    # Only judge complete lines; the last one may still be growing
+    source = source[:source.rfind("\n") + 1]
+    if not source.strip():
+        return None
+    # A backslash continues the line onto one that has not arrived yet
+    if source.endswith("\\\n"):
+        return None
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            codeop.compile_command(source, "<generated>", "exec")
+    except SyntaxError as e:
+        if "unexpected EOF" in str(e.msg):
+            return None  # Unfinished, not invalid
+        return f"Syntax error on line {getattr(e, 'lineno', '?')}: {e.msg}"
+    except (ValueError, OverflowError) as e:
+        return f"Syntax error: {e}"
+    return None
+
+
+class ScriptStream:
+    """Accumulates a streamed script, checking it whenever a line completes"""
+
+    def __init__(self, on_text=None):
+        self.on_text = on_text
+        self.text = ""
+        self.started = time.perf_counter()
+        self.first_chunk_seconds = None
+        self.aborted_after = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def feed(self, piece):
+        """Add a chunk, raising StreamAborted if the script can no longer be valid"""
+        if self.first_chunk_seconds is None:
+            self.first_chunk_seconds = self.elapsed
+        self.text += piece
+
+        if self.on_text:
+            self.on_text(self.text)
+
+        if "\n" in piece:
+            error = check_partial_script(self.text)
+            if error:
+                self.aborted_after = self.elapsed
+                raise StreamAborted(error)
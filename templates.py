@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+templates.py - A library of vetted scenes for common topics
+
+Most requests ask for one of a few standard topics. The library in
+templates/ holds a reviewed AutoScene script for each, listed with a title,
+description and keywords in templates/library.json. A TF-IDF index over
+those texts is built once at startup; a prompt whose best match scores above
+the threshold skips both LLM calls and uses the template's script, whose
+render is usually already in the render cache.
+
+A score is the cosine similarity scaled by the share of the prompt's word
+weight the template covers, so a word the template does not use, like
+"sawtooth" in "Fourier series of a sawtooth wave", counts against it. A
+prompt must also name the template's topic, a word of its title, so "sine
+wave" does not pass for the Fourier series template, and the best match must
+lead the runner-up by a margin.
+
+Run `python templates.py "prompt"` to see how a prompt scores, and
+`python templates.py --prerender` to render every template into the render
+cache ahead of time.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+LIBRARY_FILE = "library.json"
+
+WORD = re.compile(r"[a-z0-9]+(?:\^[0-9]+)?")
+STOP_WORDS = {
+    "a", "an", "and", "animate", "animation", "as", "by", "create", "demonstrate", "explain", "for", "how",
+    "i", "illustrate", "in", "into", "is", "it", "its", "make", "me", "of", "on", "one", "show", "showing",
+    "that", "the", "to", "video", "visual", "visualization", "visualize", "what", "with",
+}
+
+
+def tokenize(text):
+    """Lowercase words without stop words, with a plural s or an -ing removed"""
+    words = []
+    for word in WORD.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if len(word) > 6 and word.endswith("ing"):
+            word = word[:-3]
+        words.append(word)
+    return words
+
+
+class Template:
+    def __init__(self, name, title, description, keywords, script_path):
+        self.name = name
+        self.title = title
+        self.description = description
+        self.keywords = keywords
+        self.script_path = script_path
+
+    @property
+    def text(self):
+        return " ".join([self.title, self.description] + self.keywords)
+
+    def code(self):
+        with open(self.script_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class TemplateIndex:
+    """TF-IDF vectors for every template, matched to prompts by cosine similarity"""
+
+    def __init__(self, library_dir, threshold=0.5, margin=0.1):
+        self.library_dir = library_dir
+        self.threshold = threshold
+        self.margin = margin
+        self.templates = []
+        self.idf = {}
+        self.documents = []
+        self.vectors = []
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+        self._lock = threading.Lock()
+
+        started = time.perf_counter()
+        self._load()
+        self._build()
+        self.build_seconds = time.perf_counter() - started
+
+    def _load(self):
+        path = os.path.join(self.library_dir, LIBRARY_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                script_path = os.path.join(self.library_dir, f"{entry['name']}.py")
+                if os.path.exists(script_path):
+                    self.templates.append(Template(
+                        entry["name"], entry["title"], entry["description"], entry.get("keywords", []), script_path
+                    ))
+
+    def _build(self):
+        # Title words count twice: they name the topic
+        self.documents = [
+            Counter(tokenize(template.title)) + Counter(tokenize(template.text)) for template in self.templates
+        ]
+        count = len(self.documents)
+        document_frequency = Counter(word for document in self.documents for word in document)
+        self.idf = {word: math.log((1 + count) / (1 + frequency)) + 1 for word, frequency in document_frequency.items()}
+        # Words no template uses weigh as much as the rarest known word
+        self.unknown_idf = math.log(1 + count) + 1
+        self.vectors = [self._vector(document) for document in self.documents]
+
+    def _vector(self, counts):
+        vector = {word: (1 + math.log(count)) * self.idf.get(word, self.unknown_idf) for word, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {word: weight / norm for word, weight in vector.items()} if norm else {}
+
+    def scores(self, prompt):
+        """Return (score, template) pairs for prompt, best first"""
+        counts = Counter(tokenize(prompt))
+        query = self._vector(counts)
+        total = sum(self.idf.get(word, self.unknown_idf) for word in counts)
+        scored = []
+        for document, vector, template in zip(self.documents, self.vectors, self.templates):
+            if not set(tokenize(template.title)) & set(counts):
+                scored.append((0.0, template))
+                continue
+            similarity = sum(weight * vector.get(word, 0.0) for word, weight in query.items())
+            covered = sum(self.idf.get(word, self.unknown_idf) for word in counts if word in document)
+            scored.append((similarity * covered / total, template))
+        return sorted(scored, key=lambda pair: pair[0], reverse=True)
+
+    def match(self, prompt):
+        """Return (template, score) for the best match, or (None, best score).
+        
+        A match scores at least the threshold and leads the runner-up by the margin.
+        """
+        started = time.perf_counter()
+        scored = self.scores(prompt)
+        best_score, best = scored[0] if scored else (0.0, None)
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        matched = best if best_score >= self.threshold and best_score - runner_up >= self.margin else None
+        with self._lock:
+            self.lookups += 1
+            self.hits += 1 if matched else 0
+            self.lookup_seconds += time.perf_counter() - started
+        return matched, best_score
+
+    def summary(self):
+        with self._lock:
+            average = self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0
+            rate = self.hits / self.lookups if self.lookups else 0.0
+            return (
+                f"{len(self.templates)} templates indexed in {self.build_seconds * 1000:.1f}ms, "
+                f"{self.hits}/{self.lookups} prompts matched ({rate:.0%}), {average:.2f}ms per lookup"
+            )
+
+
+def load_templates(config):
+    """Return the TemplateIndex for config, or None if templates are off or the library is empty"""
+    if not config["templates"]:
+        return None
+    index = TemplateIndex(config["templates_dir"], config["template_threshold"], config["template_margin"])
+    return index if index.templates else None
+
+
+def prerender(config):
+    """Render every template at the preview quality so matches load from the render cache"""
+    import pipeline
+    from cache import LLMCache, RenderCache
+    from scheduler import JobScheduler
+
+    config = dict(config, progressive_render=False, templates=True, job_store=False)
+    scheduler = JobScheduler(
+        config,
+        LLMCache(config["llm_cache_dir"], config["llm_cache_max_bytes"]),
+        RenderCache(config["render_cache_dir"], config["render_cache_max_bytes"])
+    )
+    # Every template matches its own description
+    jobs = [scheduler.submit(template.description) for template in scheduler.context.templates.templates]
+    while not all(job.done for job in jobs):
+        scheduler.events.get()
+    scheduler.shutdown(wait=True)
+
+    for job in jobs:
+        source = "cached" if job.from_render_cache else "rendered"
+        print(f"{job.template or '?':<24}{source if job.state == pipeline.COMPLETE else job.error}")
+
+
+def main():
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Match prompts against the scene template library")
+    parser.add_argument("prompt", nargs="?", help="prompt to score against every template")
+    parser.add_argument("--prerender", action="store_true", help="render every template into the render cache")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.prerender:
+        prerender(config)
+        return
+
+    index = TemplateIndex(config["templates_dir"], config["template_threshold"], config["template_margin"])
+    print(f"{len(index.templates)} templates indexed in {index.build_seconds * 1000:.1f}ms")
+    if args.prompt:
+        for score, template in index.scores(args.prompt):
+            marker = "*" if score >= index.threshold else " "
+            print(f"{marker} {score:.2f}  {template.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from manim import *
+
+
+class AutoScene(Scene):
+    def construct(self):
+        plane = ComplexPlane().add_coordinates()
+        self.play(Create(plane))
+
+        z = complex(2, 1)
+        dot = Dot(plane.n2p(z), color=YELLOW)
+        arrow = Arrow(plane.n2p(0), plane.n2p(z), buff=0, color=YELLOW)
+        label = MathTex("z = 2 + i").next_to(dot, UR, buff=0.1)
+        self.play(GrowArrow(arrow), FadeIn(dot), Write(label))
+        self.wait()
+
+        caption = Text("Multiplying by i rotates by 90 degrees", font_size=28).to_edge(UP)
+        caption.add_background_rectangle()
+        self.play(Write(caption))
+
+        for power in range(1, 4):
+            w = z * 1j ** power
+            new_arrow = Arrow(plane.n2p(0), plane.n2p(w), buff=0, color=YELLOW)
+            new_label = MathTex(f"i^{power} z").next_to(plane.n2p(w), UR, buff=0.1)
+            self.play(
+                Transform(arrow, new_arrow),
+                dot.animate.move_to(plane.n2p(w)),
+                Transform(label, new_label),
+                run_time=1.5
+            )
+            self.wait(0.5)
+
+        circle = Circle(radius=plane.n2p(abs(z))[0] - plane.n2p(0)[0], color=BLUE).move_to(plane.n2p(0))
+        self.play(Create(circle))
+        self.wait()
@@ -0,0 +1,33 @@
+from manim import *
+
+
+class AutoScene(Scene):
+    def construct(self):
+        title = Text("The Derivative as a Slope", font_size=36).to_edge(UP)
+        self.play(Write(title))
+
+        axes = Axes(x_range=[-3, 3], y_range=[-1, 9], x_length=7, y_length=5).shift(DOWN * 0.5)
+        curve = axes.plot(lambda x: x ** 2, color=BLUE)
+        curve_label = axes.get_graph_label(curve, "f(x) = x^2")
+        self.play(Create(axes), Create(curve), Write(curve_label))
+
+        x = ValueTracker(-2)
+        dot = always_redraw(lambda: Dot(axes.i2gp(x.get_value(), curve), color=YELLOW))
+        tangent = always_redraw(
+            lambda: axes.plot(
+                lambda t: 2 * x.get_value() * (t - x.get_value()) + x.get_value() ** 2,
+                x_range=[x.get_value() - 1.2, x.get_value() + 1.2],
+                color=YELLOW
+            )
+        )
+        slope = always_redraw(
+            lambda: MathTex(f"f'({x.get_value():.1f}) = {2 * x.get_value():.1f}").to_corner(UR)
+        )
+        self.play(FadeIn(dot), Create(tangent), Write(slope))
+        self.play(x.animate.set_value(2), run_time=4, rate_func=linear)
+        self.play(x.animate.set_value(0), run_time=2)
+        self.wait()
+
+        rule = MathTex(r"\frac{d}{dx} x^2 = 2x").next_to(title, DOWN)
+        self.play(Write(rule))
+        self.wait()
@@ -0,0 +1,35 @@
+from manim import *
+
+
+class AutoScene(Scene):
+    def construct(self):
+        title = Text("Factoring a Quadratic", font_size=40).to_edge(UP)
+        self.play(Write(title))
+
+        expression = MathTex("x^2", "+", "5x", "+", "6", font_size=60)
+        self.play(Write(expression))
+        self.wait()
+
+        question = Text("Find two numbers that multiply to 6 and add to 5", font_size=28).next_to(expression, DOWN, buff=1)
+        self.play(Write(question))
+
+        pairs = VGroup(
+            MathTex("1 \\times 6 \\to 7"),
+            MathTex("2 \\times 3 \\to 5"),
+        ).arrange(DOWN).next_to(question, DOWN)
+        self.play(Write(pairs[0]))
+        self.play(Write(pairs[1]))
+        self.play(Indicate(pairs[1], color=GREEN))
+
+        split = MathTex("x^2", "+", "2x", "+", "3x", "+", "6", font_size=60)
+        self.play(FadeOut(question), FadeOut(pairs), TransformMatchingTex(expression, split))
+        self.wait()
+
+        grouped = MathTex("x(x + 2)", "+", "3(x + 2)", font_size=60)
+        self.play(TransformMatchingShapes(split, grouped))
+        self.wait()
+
+        factored = MathTex("(x + 2)(x + 3)", font_size=60)
+        self.play(TransformMatchingShapes(grouped, factored))
+        self.play(Circumscribe(factored))
+        self.wait()
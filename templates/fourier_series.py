@@ -0,0 +1,29 @@
+from manim import *
+
+
+class AutoScene(Scene):
+    def construct(self):
+        title = Text("Fourier Series of a Square Wave", font_size=36).to_edge(UP)
+        self.play(Write(title))
+
+        axes = Axes(x_range=[-PI, PI, PI / 2], y_range=[-1.5, 1.5, 0.5], x_length=10, y_length=4)
+        self.play(Create(axes))
+
+        square_wave = axes.plot(lambda x: np.sign(np.sin(x)), color=WHITE, discontinuities=[0], use_smoothing=False)
+        self.play(Create(square_wave))
+
+        formula = MathTex(r"f(x) = \frac{4}{\pi} \sum_{k \text{ odd}} \frac{\sin(kx)}{k}").to_edge(DOWN)
+        self.play(Write(formula))
+
+        partial = axes.plot(lambda x: 4 / PI * np.sin(x), color=BLUE)
+        label = MathTex("n = 1").to_corner(UR)
+        self.play(Create(partial), Write(label))
+
+        for n in (3, 5, 9, 15, 25):
+            new_partial = axes.plot(
+                lambda x, n=n: sum(4 / (PI * k) * np.sin(k * x) for k in range(1, n + 1, 2)),
+                color=BLUE
+            )
+            new_label = MathTex(f"n = {n}").to_corner(UR)
+            self.play(Transform(partial, new_partial), Transform(label, new_label), run_time=1.5)
+        self.wait()
@@ -0,0 +1,33 @@
+from manim import *
+
+
+class AutoScene(Scene):
+    def construct(self):
+        title = Text("Matrix Multiplication", font_size=40).to_edge(UP)
+        self.play(Write(title))
+
+        a = Matrix([[1, 2], [3, 4]])
+        b = Matrix([[5, 6], [7, 8]])
+        equals = MathTex("=")
+        result = Matrix([["?", "?"], ["?", "?"]])
+        product = VGroup(a, b, equals, result).arrange(RIGHT)
+        self.play(Write(a), Write(b))
+        self.play(Write(equals), Write(result))
+
+        values = [[19, 22], [43, 50]]
+        entries = result.get_entries()
+        for row in range(2):
+            for column in range(2):
+                row_box = SurroundingRectangle(a.get_rows()[row], color=YELLOW)
+                column_box = SurroundingRectangle(b.get_columns()[column], color=YELLOW)
+                self.play(Create(row_box), Create(column_box))
+
+                terms = MathTex(
+                    f"{row * 2 + 1} \\cdot {5 + column} + {row * 2 + 2} \\cdot {7 + column} = {values[row][column]}"
+                ).next_to(product, DOWN, buff=1)
+                self.play(Write(terms))
+
+                entry = MathTex(str(values[row][column])).move_to(entries[row * 2 + column])
+                self.play(Transform(entries[row * 2 + column], entry), FadeOut(terms))
+                self.play(FadeOut(row_box), FadeOut(column_box))
+        self.wait()
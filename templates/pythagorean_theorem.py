@@ -0,0 +1,38 @@
+from manim import *
+
+
+class AutoScene(Scene):
+    def construct(self):
+        title = Text("Pythagorean Theorem", font_size=40).to_edge(UP)
+        self.play(Write(title))
+
+        a, b = 1.5, 2.0
+        triangle = Polygon(ORIGIN, RIGHT * b, UP * a, color=WHITE).shift(LEFT + DOWN * 0.5)
+        self.play(Create(triangle))
+
+        vertices = triangle.get_vertices()
+        square_a = Square(side_length=a, color=BLUE, fill_opacity=0.5)
+        square_a.next_to(Line(vertices[0], vertices[2]), LEFT, buff=0)
+        square_b = Square(side_length=b, color=GREEN, fill_opacity=0.5)
+        square_b.next_to(Line(vertices[0], vertices[1]), DOWN, buff=0)
+        hypotenuse = Line(vertices[1], vertices[2])
+        square_c = Square(side_length=hypotenuse.get_length(), color=RED, fill_opacity=0.5)
+        square_c.rotate(hypotenuse.get_angle()).move_to(
+            hypotenuse.get_center() + rotate_vector(hypotenuse.get_unit_vector(), -PI / 2) * -hypotenuse.get_length() / 2
+        )
+
+        self.play(FadeIn(square_a), FadeIn(square_b))
+        self.play(FadeIn(square_c))
+
+        labels = VGroup(
+            MathTex("a^2").move_to(square_a),
+            MathTex("b^2").move_to(square_b),
+            MathTex("c^2").move_to(square_c),
+        )
+        self.play(Write(labels))
+        self.wait()
+
+        equation = MathTex("a^2", "+", "b^2", "=", "c^2", font_size=60).to_edge(DOWN)
+        self.play(TransformFromCopy(labels, equation))
+        self.play(Indicate(equation))
+        self.wait()
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULTS, load_config
+
+
+def write_config(tmp_path, overrides):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(overrides), encoding="utf-8")
+    return str(path)
+
+
+def test_one_model_override_keeps_the_other_defaults(tmp_path):
+    config = load_config(write_config(tmp_path, {"llm_models": {"generate": "my-model"}}))
+    assert config["llm_models"]["generate"] == "my-model"
+    assert config["llm_models"]["refine"] == DEFAULTS["llm_models"]["refine"]
+    assert config["llm_models"]["repair"] == DEFAULTS["llm_models"]["repair"]
+
+
+def test_overrides_do_not_change_the_defaults(tmp_path):
+    refine = DEFAULTS["llm_models"]["refine"]
+    config = load_config(write_config(tmp_path, {"llm_models": {"refine": "other"}, "render_workers": 3}))
+    assert config["render_workers"] == 3
+    assert DEFAULTS["llm_models"]["refine"] == refine
+
+
+def test_missing_file_gives_the_defaults(tmp_path):
+    assert load_config(str(tmp_path / "missing.json")) == DEFAULTS
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streaming import ScriptStream, StreamAborted, check_partial_script
+
+CONTINUED_SCRIPT = (
+    "```python\n"
+    "from manim import *\n"
+    "\n"
+    "class AutoScene(Scene):\n"
+    "    def construct(self):\n"
+    "        a = 1\n"
+    "        total = a + \\\n"
+    "            2\n"
+    "        self.play(Create(Square()))\n"
+    "        self.wait(total)\n"
+    "```\n"
+)
+
+
+def stream(text, size):
+    script = ScriptStream()
+    for start in range(0, len(text), size):
+        script.feed(text[start:start + size])
+    return script
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+def test_backslash_continuation_is_not_aborted(size):
+    assert stream(CONTINUED_SCRIPT, size).text == CONTINUED_SCRIPT
+
+
+def test_continued_line_is_incomplete():
+    assert check_partial_script("x = 1\ntotal = x + \\\n") is None
+
+
+def test_broken_script_is_aborted():
+    with pytest.raises(StreamAborted):
+        stream("from manim import *\n\nclass AutoScene(Scene)):\n    pass\n", 8)
+
+
+HELPER_BASE_SCRIPT = (
+    "from manim import *\n"
+    "\n"
+    "class TitledScene(Scene):\n"
+    "    def add_title(self, text):\n"
+    "        self.add(Text(text).to_edge(UP))\n"
+    "\n"
+    "def make_axes():\n"
+    "    return Axes(x_range=[-3, 3], y_range=[-1, 9])\n"
+    "\n"
+    "class AutoScene(TitledScene):\n"
+    "    def construct(self):\n"
+    "        self.add_title('Parabola')\n"
+    "        self.play(Create(make_axes()))\n"
+)
+
+
+@pytest.mark.parametrize("size", [1, 16])
+def test_helper_scene_base_is_not_aborted(size):
+    assert stream(HELPER_BASE_SCRIPT, size).text == HELPER_BASE_SCRIPT
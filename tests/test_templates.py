@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import DEFAULTS
+from templates import TemplateIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TemplateIndex(os.path.join(ROOT, "templates"), DEFAULTS["template_threshold"], DEFAULTS["template_margin"])
+
+
+@pytest.mark.parametrize("prompt", [
+    "Fourier series of a sawtooth wave",
+    "sine wave",
+    "square wave",
+])
+def test_other_waves_do_not_match_fourier_series(index, prompt):
+    template, score = index.match(prompt)
+    assert template is None, f"{prompt!r} matched {template.name} with {score:.2f}"
+
+
+@pytest.mark.parametrize("prompt, name", [
+    ("Show how to factor x^2 + 5x + 6", "factoring"),
+    ("Show how a Fourier series approximates a square wave", "fourier_series"),
+    ("The derivative of x squared", "derivative"),
+])
+def test_topic_prompts_match(index, prompt, name):
+    template, _ = index.match(prompt)
+    assert template is not None and template.name == name
+
+
+def test_every_template_matches_its_description(index):
+    for template in index.templates:
+        assert index.match(template.description)[0] is template
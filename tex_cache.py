@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+tex_cache.py - A LaTeX/SVG cache shared by every render
+
+manim compiles each Tex and MathTex string with latex and dvisvgm, and only
+skips that work when the result already sits in the render's own Tex folder
+(<media_dir>/Tex). Every job, dry run and render chunk has its own media
+folder, so the same formulas are compiled over and over.
+
+Before a render, the compiled files in the shared cache are hard-linked into
+its Tex folder, where manim finds them. Only formulas the script can build are
+linked: each entry keeps the LaTeX it was compiled from, and is linked when
+one of the script's string literals appears in it, so a media folder holds a
+handful of links rather than the whole cache. After the render, the files it
+compiled are published to the cache: copied under a temporary name and
+renamed into place while holding a lock file, so concurrent renders, in this
+process or another one such as batch.py, never see a half-written file. How
+long LaTeX took is read from the file times (manim writes the .tex file
+first and the .svg last) and kept with the entry, so every later hit knows
+how many seconds it saved.
+
+Run `python tex_cache.py --prewarm` to compile the formulas in the template
+scripts ahead of time.
+"""
+
+import argparse
+import ast
+import contextlib
+import glob
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+TEMP_PREFIX = ".tmp-"
+# manim keeps the SVG; older versions also look for the DVI (or XDV) before recompiling
+CACHED_EXTENSIONS = (".svg", ".dvi", ".xdv")
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path, across threads and processes"""
+    with open(path, "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def complete_svg(path):
+    """Return whether an SVG was written to the end (a killed dvisvgm leaves it cut off)"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - 64))
+            return f.read().rstrip().endswith(b"</svg>")
+    except OSError:
+        return False
+
+
+def tex_dir(media_dir):
+    return os.path.join(media_dir, "Tex")
+
+
+def tex_source(path):
+    """Return the LaTeX between \\begin{document} and \\end{document} of a .tex file manim wrote"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return None
+    start = text.rfind("\\begin{document}")
+    end = text.rfind("\\end{document}")
+    if start == -1 or end < start:
+        return None
+    return text[start + len("\\begin{document}"):end].strip()
+
+
+def script_strings(code):
+    """Return the string literals of a script, which its formulas are built from; None if it does not parse"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    return {
+        node.value.strip() for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip()
+    }
+
+
+class TexCache:
+    """Compiled formulas keyed by manim's own hash of the LaTeX source"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        temp_path = os.path.join(self.cache_dir, f"{TEMP_PREFIX}{uuid.uuid4().hex}.json")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, path)
+
+    def seed(self, media_dirs, code=None):
+        """Link the cached formulas code may build into each media folder's Tex folder; return what was linked.
+        
+        Without code, or if it does not parse, every cached formula is linked.
+        """
+        index = self._read_index()
+        strings = script_strings(code) if code is not None else None
+        if strings is not None:
+            index = {
+                name: entry for name, entry in index.items()
+                if entry.get("source") and any(string in entry["source"] for string in strings)
+            }
+        seeded = {}
+        for media_dir in media_dirs:
+            target = tex_dir(media_dir)
+            os.makedirs(target, exist_ok=True)
+            seeded[media_dir] = set()
+            for name, entry in index.items():
+                try:
+                    for extension in entry["files"]:
+                        source = os.path.join(self.cache_dir, name + extension)
+                        destination = os.path.join(target, name + extension)
+                        if os.path.exists(destination):
+                            continue  # Left by an earlier render of the same job
+                        try:
+                            os.link(source, destination)
+                        except FileNotFoundError:
+                            raise
+                        except OSError:
+                            shutil.copyfile(source, destination)  # Another file system
+                except FileNotFoundError:
+                    continue  # Evicted since the index was read
+                seeded[media_dir].add(name)
+        return seeded
+
+    def collect(self, seeded):
+        """Count the seeded formulas a render used and publish the ones it compiled.
+
+        Returns {"tex_hits", "tex_misses", "tex_seconds_saved"} for the render.
+        """
+        index = self._read_index()
+        hits = []
+        compiled = {}
+        for media_dir, names in seeded.items():
+            folder = tex_dir(media_dir)
+            for svg_path in glob.glob(os.path.join(folder, "*.svg")):
+                name = os.path.splitext(os.path.basename(svg_path))[0]
+                tex_path = os.path.join(folder, f"{name}.tex")
+                if name in names:
+                    # manim writes the .tex file before looking for the SVG, so it was used
+                    if os.path.exists(tex_path):
+                        hits.append(name)
+                elif name not in compiled and os.path.exists(tex_path) and complete_svg(svg_path):
+                    seconds = max(0.0, os.path.getmtime(svg_path) - os.path.getmtime(tex_path))
+                    compiled[name] = (folder, seconds)
+
+        saved = sum(index[name]["seconds"] for name in hits if name in index)
+        if hits or compiled:
+            self._publish(compiled, hits)
+        with self._lock:
+            self.hits += len(hits)
+            self.misses += len(compiled)
+            self.seconds_saved += saved
+        return {"tex_hits": len(hits), "tex_misses": len(compiled), "tex_seconds_saved": saved}
+
+    def _publish(self, compiled, used):
+        with file_lock(os.path.join(self.cache_dir, LOCK_FILE)):
+            # Re-read under the lock, another process may have published meanwhile
+            index = self._read_index()
+            now = time.time()
+            for name in used:
+                if name in index:
+                    index[name]["used"] = now
+
+            for name, (folder, seconds) in compiled.items():
+                latex = tex_source(os.path.join(folder, f"{name}.tex"))
+                if name in index:
+                    # Entries published before sources were kept gain theirs
+                    index[name].setdefault("source", latex)
+                    continue
+                files = {}
+                for extension in CACHED_EXTENSIONS:
+                    source = os.path.join(folder, name + extension)
+                    if not os.path.exists(source):
+                        continue
+                    temp_path = os.path.join(self.cache_dir, f"{TEMP_PREFIX}{uuid.uuid4().hex}{extension}")
+                    shutil.copyfile(source, temp_path)
+                    os.replace(temp_path, os.path.join(self.cache_dir, name + extension))
+                    files[extension] = os.path.getsize(source)
+                index[name] = {
+                    "files": sorted(files), "bytes": sum(files.values()), "seconds": seconds, "used": now,
+                    "source": latex,
+                }
+
+            self._evict(index)
+            self._write_index(index)
+
+    def _evict(self, index):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = sum(entry["bytes"] for entry in index.values())
+        for name in sorted(index, key=lambda name: index[name]["used"]):
+            if total <= self.max_bytes:
+                break
+            entry = index.pop(name)
+            total -= entry["bytes"]
+            for extension in entry["files"]:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.cache_dir, name + extension))
+
+    def stats(self):
+        index = self._read_index()
+        return {
+            "entries": len(index),
+            "bytes": sum(entry["bytes"] for entry in index.values()),
+            "max_bytes": self.max_bytes,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            rate = self.hits / lookups if lookups else 0.0
+            return (
+                f"{stats['entries']} formulas cached, {self.hits}/{lookups} reused ({rate:.0%}), "
+                f"~{self.seconds_saved:.0f}s of LaTeX saved"
+            )
+
+
+def make_tex_cache(config):
+    if not config["tex_cache"]:
+        return None
+    return TexCache(config["tex_cache_dir"], config["tex_cache_max_bytes"])
+
+
+def prewarm(cache, scripts, scene_name="AutoScene", workers=None):
+    """Compile every formula the scripts' scenes build, by rendering just their last frame"""
+    def compile_script(script):
+        with open(script, "r", encoding="utf-8") as f:
+            code = f.read()
+        with tempfile.TemporaryDirectory() as media_dir:
+            seeded = cache.seed([media_dir], code)
+            started = time.perf_counter()
+            result = subprocess.run(
+                ["manim", "-ql", "-s", "--disable_caching", script, scene_name, "--media_dir", media_dir],
+                capture_output=True, text=True
+            )
+            counts = cache.collect(seeded)
+            return script, result.returncode, time.perf_counter() - started, counts
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        for script, returncode, seconds, counts in executor.map(compile_script, scripts):
+            status = "ok" if returncode == 0 else f"manim exited with code {returncode}"
+            print(
+                f"{os.path.basename(script):<28}{counts['tex_misses']:>4} compiled "
+                f"{counts['tex_hits']:>4} cached  {seconds:6.1f}s  {status}"
+            )
+    print(cache.summary())
+
+
+def main():
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Shared LaTeX/SVG cache for manim renders")
+    parser.add_argument("--prewarm", action="store_true", help="compile the formulas in the given scripts")
+    parser.add_argument("scripts", nargs="*", help="scene scripts to pre-warm (default: the template library)")
+    args = parser.parse_args()
+
+    config = load_config()
+    cache = TexCache(config["tex_cache_dir"], config["tex_cache_max_bytes"])
+    if args.prewarm:
+        scripts = args.scripts or sorted(glob.glob(os.path.join(config["templates_dir"], "*.py")))
+        prewarm(cache, scripts)
+    else:
+        print(cache.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+thumbnails.py - Video thumbnails decoded straight into memory
+
+ffmpeg seeks to a timestamp, scales the frame and writes raw RGB pixels to
+its stdout, which become a PIL image without a temporary file. Thumbnails are
+cached per video, keyed by path, modification time, file size and target
+size, so showing a job again is a dictionary lookup. A strip of evenly spaced
+frames lets the preview scrub through the video on hover.
+
+Run `python thumbnails.py video.mp4` to time the old temp-file extraction
+against the in-memory decode and the cache.
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw
+
+THUMBNAIL_SIZE = (640, 360)
+STRIP_FRAMES = 12
+STORYBOARD_CELL = (320, 180)
+
+
+def probe_duration(video_path):
+    """Return the video's duration in seconds, or None if ffprobe cannot tell"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path],
+            capture_output=True,
+            text=True
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _decode(video_path, size, video_filter, frames, seek=None):
+    """Run ffmpeg with raw RGB output on stdout; return up to `frames` images"""
+    width, height = size
+    command = ["ffmpeg", "-v", "error"]
+    if seek:
+        command += ["-ss", str(seek)]
+    command += [
+        "-i", video_path,
+        "-vf", f"{video_filter}scale={width}:{height}:flags=lanczos",
+        "-frames:v", str(frames),
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+    ]
+    try:
+        data = subprocess.run(command, capture_output=True).stdout
+    except OSError:
+        return []  # ffmpeg is not installed
+
+    frame_bytes = width * height * 3
+    return [
+        Image.frombytes("RGB", size, data[offset:offset + frame_bytes])
+        for offset in range(0, len(data) - frame_bytes + 1, frame_bytes)
+    ]
+
+
+def decode_frame(video_path, size=THUMBNAIL_SIZE, seconds=1.0):
+    """Return the frame at `seconds` (or the first frame of shorter videos) as an image"""
+    images = _decode(video_path, size, "", 1, seconds) or _decode(video_path, size, "", 1)
+    return images[0] if images else None
+
+
+def load_thumbnail(thumbnail_path, size=THUMBNAIL_SIZE):
+    """Return a stored thumbnail file scaled to size, or None if there is none"""
+    if not thumbnail_path:
+        return None
+    try:
+        with Image.open(thumbnail_path) as image:
+            image = image.convert("RGB")
+    except OSError:
+        return None
+    return image if image.size == tuple(size) else image.resize(size, Image.LANCZOS)
+
+
+def save_thumbnail(video_path, thumbnail_path, size=THUMBNAIL_SIZE):
+    """Decode the thumbnail once and store it as a PNG; return True on success"""
+    image = decode_frame(video_path, size)
+    if image is None:
+        return False
+    # Replace rather than rewrite the file, which may be a hard link into the render cache
+    temp_path = f"{thumbnail_path}.tmp"
+    image.save(temp_path, format="PNG")
+    os.replace(temp_path, thumbnail_path)
+    return True
+
+
+def decode_strip(video_path, size=THUMBNAIL_SIZE, frames=STRIP_FRAMES):
+    """Return `frames` images spread evenly over the video"""
+    duration = probe_duration(video_path)
+    if not duration:
+        return []
+    return _decode(video_path, size, f"fps={frames / duration},", frames)
+
+
+def storyboard_grid(frames, cell=STORYBOARD_CELL, columns=None):
+    """Lay out (label, image path) keyframes as a labelled grid image"""
+    columns = columns or min(4, len(frames))
+    rows = (len(frames) + columns - 1) // columns
+    grid = Image.new("RGB", (columns * cell[0], rows * cell[1]), "black")
+    draw = ImageDraw.Draw(grid)
+    for index, (label, path) in enumerate(frames):
+        left, top = (index % columns) * cell[0], (index // columns) * cell[1]
+        with Image.open(path) as image:
+            grid.paste(image.convert("RGB").resize(cell, Image.LANCZOS), (left, top))
+        draw.rectangle((left, top, left + cell[0] - 1, top + cell[1] - 1), outline="#444444")
+        draw.text((left + 6, top + 4), str(label), fill="white")
+    return grid
+
+
+class ThumbnailCache:
+    """In-memory LRU of decoded thumbnails and strips, bounded by pixel bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.decode_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _key(self, video_path, size, kind):
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        return (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size, tuple(size), kind)
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            return None
+
+    def _store(self, key, images, seconds):
+        with self._lock:
+            self.misses += 1
+            self.decode_seconds += seconds
+            if key in self.entries:
+                return
+            self.entries[key] = images
+            self.bytes += sum(image.width * image.height * 3 for image in images)
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= sum(image.width * image.height * 3 for image in evicted)
+
+    def get(self, video_path, size=THUMBNAIL_SIZE, thumbnail_path=None):
+        """Return the video's thumbnail, loading it on a miss; None if it cannot be decoded.
+        
+        A miss reads the thumbnail file the pipeline stored, if any, and only
+        runs ffmpeg without one.
+        """
+        key = self._key(video_path, size, "frame")
+        if key is None:
+            return None
+        images = self._lookup(key)
+        if images is None:
+            started = time.perf_counter()
+            image = load_thumbnail(thumbnail_path, size) or decode_frame(video_path, size)
+            if image is None:
+                return None
+            images = [image]
+            self._store(key, images, time.perf_counter() - started)
+        return images[0]
+
+    def cached(self, video_path, size=THUMBNAIL_SIZE):
+        """Return the thumbnail if it is already loaded, without blocking on ffmpeg"""
+        key = self._key(video_path, size, "frame")
+        with self._lock:
+            images = self.entries.get(key) if key else None
+        return images[0] if images else None
+
+    def strip(self, video_path, size=THUMBNAIL_SIZE, frames=STRIP_FRAMES):
+        """Return the video's scrub strip, decoding it on a miss"""
+        key = self._key(video_path, size, frames)
+        if key is None:
+            return []
+        images = self._lookup(key)
+        if images is None:
+            started = time.perf_counter()
+            images = decode_strip(video_path, size, frames)
+            if images:
+                self._store(key, images, time.perf_counter() - started)
+        return images
+
+    def cached_strip(self, video_path, size=THUMBNAIL_SIZE, frames=STRIP_FRAMES):
+        """Return the strip if it is already decoded, without blocking on ffmpeg"""
+        key = self._key(video_path, size, frames)
+        with self._lock:
+            return self.entries.get(key) if key else None
+
+    def summary(self):
+        with self._lock:
+            average = self.decode_seconds / self.misses * 1000 if self.misses else 0.0
+            return (
+                f"{self.hits} hits, {self.misses} decoded (avg {average:.0f} ms), "
+                f"{self.bytes / (1024 * 1024):.1f} MB in memory"
+            )
+
+
+def legacy_thumbnail(video_path, size=THUMBNAIL_SIZE):
+    """The previous approach: ffmpeg to a PNG file, reopen it with PIL and resize"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = os.path.join(temp_dir, "temp_thumbnail.png")
+        subprocess.run(
+            ["ffmpeg", "-i", video_path, "-ss", "00:00:01", "-vframes", "1", temp_path, "-y"],
+            capture_output=True
+        )
+        with Image.open(temp_path) as image:
+            return image.resize(size, Image.LANCZOS)
+
+
+def benchmark(video_path, runs=5):
+    """Print median time-to-thumbnail for the temp-file, in-memory and cached paths"""
+    cache = ThumbnailCache()
+    cache.get(video_path)
+    timings = {"temp file + resize": [], "in-memory decode": [], "cache hit": []}
+    for _ in range(runs):
+        for name, func in (
+            ("temp file + resize", legacy_thumbnail),
+            ("in-memory decode", decode_frame),
+            ("cache hit", cache.get),
+        ):
+            started = time.perf_counter()
+            func(video_path)
+            timings[name].append(time.perf_counter() - started)
+
+    for name, values in timings.items():
+        median = sorted(values)[len(values) // 2]
+        print(f"{name:<20}{median * 1000:>10.1f} ms")
+
+    started = time.perf_counter()
+    frames = decode_strip(video_path)
+    print(f"{f'strip of {len(frames)}':<20}{(time.perf_counter() - started) * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time thumbnail extraction for a video")
+    parser.add_argument("video", help="video file to thumbnail")
+    parser.add_argument("--runs", type=int, default=5, help="repetitions per method")
+    args = parser.parse_args()
+    benchmark(args.video, args.runs)
+
+
+if __name__ == "__main__":
+    main()
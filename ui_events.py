@@ -0,0 +1,82 @@
+"""
+ui_events.py - Worker-to-UI updates, coalesced and applied on the Tk thread
+
+Worker threads never touch Tk widgets. They put updates into a
+CoalescingQueue, which keeps only the latest update per key, so a job that
+reports progress twenty times between two UI ticks is redrawn once. The Tk
+thread drains the queue from root.after and stops when its redraw budget is
+spent, leaving the rest for the next tick so input handling is never starved.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class CoalescingQueue:
+    """Thread-safe queue that keeps one pending item per key, oldest key first"""
+
+    def __init__(self, key=id):
+        self.key = key
+        self.received = 0
+        self.coalesced = 0
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        key = self.key(item)
+        with self._lock:
+            self.received += 1
+            if key in self._pending:
+                # Keep the key's place in line and the time its first update arrived
+                self.coalesced += 1
+                self._pending[key] = (item, self._pending[key][1])
+            else:
+                self._pending[key] = (item, time.perf_counter())
+
+    def pop(self):
+        """Return (item, queued_at) for the longest-waiting key, or None if nothing is pending"""
+        with self._lock:
+            if not self._pending:
+                return None
+            return self._pending.popitem(last=False)[1]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+
+class LatencyWindow:
+    """The most recent latency samples, in seconds"""
+
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class UiStats:
+    """How long updates wait before they are drawn, and how late UI ticks fire"""
+
+    def __init__(self):
+        self.event_latency = LatencyWindow()
+        self.tick_lag = LatencyWindow()
+        self.tick_seconds = LatencyWindow()
+
+    def summary(self, events):
+        return (
+            f"updates drawn after {self.event_latency.percentile(0.5) * 1000:.0f} ms "
+            f"(p95 {self.event_latency.percentile(0.95) * 1000:.0f} ms), "
+            f"ticks late by p95 {self.tick_lag.percentile(0.95) * 1000:.0f} ms, "
+            f"{events.coalesced} of {events.received} updates coalesced"
+        )
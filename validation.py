@@ -0,0 +1,210 @@
+"""
+validation.py - Fast checks that run between clean_text and rendering
+
+Checks go from cheapest to most expensive: parse the script, make sure
+AutoScene subclasses a manim Scene, make sure its imports resolve, then run
+the scene with animations skipped (manim -s renders only the final frame) to
+catch runtime errors in seconds instead of after a full render.
+"""
+
+import ast
+import importlib.util
+import subprocess
+import threading
+
+from limits import ResourceLimits, explain_exit, kill_tree
+
+MANIM_SCENE_CLASSES = {
+    "Scene",
+    "MovingCameraScene",
+    "ThreeDScene",
+    "SpecialThreeDScene",
+    "ZoomedScene",
+    "VectorScene",
+    "LinearTransformationScene",
+}
+
+ERROR_CONTEXT_LINES = 40
+
+
+def base_name(node):
+    """Return the class name a base expression refers to (manim.Scene -> Scene)"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def check_scene_class(tree, scene_name):
+    """Return an error unless scene_name is defined and derives from a manim Scene"""
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    if scene_name not in classes:
+        return f"Script does not define a class called '{scene_name}'"
+
+    star_modules = set()
+    imported_names = set()
+    module_aliases = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module:
+            for alias in node.names:
+                if alias.name == "*":
+                    star_modules.add(node.module.split(".")[0])
+                else:
+                    imported_names.add(alias.asname or alias.name)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                module_aliases.add(alias.asname or alias.name.split(".")[0])
+
+    def derives_from_scene(name, seen):
+        if name in classes and name not in seen:
+            seen.add(name)
+            return any(derives_from_scene(base_name(base), seen) for base in classes[name].bases)
+        return name in MANIM_SCENE_CLASSES
+
+    if not derives_from_scene(scene_name, set()):
+        return f"'{scene_name}' does not subclass a manim Scene"
+
+    # The manim base class itself has to be importable under the name used
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for base in node.bases:
+            name = base_name(base)
+            if name not in MANIM_SCENE_CLASSES or name in classes:
+                continue
+            if isinstance(base, ast.Attribute):
+                owner = base.value
+                if isinstance(owner, ast.Name) and owner.id not in module_aliases:
+                    return f"'{owner.id}' is used but never imported"
+            elif "manim" not in star_modules and name not in imported_names:
+                return f"'{name}' is used but never imported (missing 'from manim import *')"
+    return None
+
+
+def check_imports(tree):
+    """Return an error for the first imported module that is not installed"""
+    if importlib.util.find_spec("manim") is None:
+        # manim runs from another environment, so this one cannot judge imports
+        return None
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules = [node.module]
+        else:
+            continue
+
+        for module in modules:
+            top_level = module.split(".")[0]
+            if importlib.util.find_spec(top_level) is None:
+                return f"Module '{top_level}' is not installed"
+    return None
+
+
+def check_script(code, scene_name="AutoScene"):
+    """Return a description of why code cannot be rendered, or None if it looks usable"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"Syntax error on line {e.lineno}: {e.msg}"
+
+    return check_scene_class(tree, scene_name) or check_imports(tree)
+
+
+def summarize_error(output):
+    """Return the last traceback in manim's output, trimmed to a useful length"""
+    lines = output.strip().splitlines()
+    for index in range(len(lines) - 1, -1, -1):
+        if "Traceback" in lines[index]:
+            lines = lines[index:]
+            break
+    return "\n".join(lines[-ERROR_CONTEXT_LINES:])
+
+
+def dry_run(script_path, scene_name, media_dir, timeout, render_pool=None, limits=None, task=None):
+    """Execute the scene with animations skipped; return an error or None.
+    
+    The dry run is subject to the render resource limits, and task can cancel it.
+    """
+    if render_pool:
+        success, output, _ = render_pool.render(
+            script_path, scene_name, media_dir, skip_animations=True, timeout=timeout, task=task
+        )
+        return None if success else summarize_error(output) or "Dry run failed"
+
+    limits = limits or ResourceLimits()
+    command = [
+        "manim", "-ql", "-s", "--disable_caching",
+        script_path, scene_name,
+        "--media_dir", media_dir,
+    ]
+    try:
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **limits.popen_kwargs()
+        )
+    except OSError as e:
+        return f"Could not start manim: {str(e)}"
+    limits.apply_to(process)
+    if task:
+        task.attach(process)
+
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_tree(process)
+        process.communicate()
+        return f"Dry run did not finish within {timeout}s (the scene may never terminate)"
+    finally:
+        if task:
+            task.detach(process)
+
+    if task and task.cancelled:
+        return "Dry run cancelled"
+    if process.returncode != 0:
+        output = stderr or stdout
+        reason = explain_exit(process.returncode, output, limits)
+        return reason or summarize_error(output) or f"manim exited with code {process.returncode}"
+    return None
+
+
+class ValidationStats:
+    """Counts failures caught before rendering and the render time that saved"""
+
+    def __init__(self):
+        self.caught = 0
+        self.repairs = 0
+        self.repaired = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+
+    def record_render(self, seconds):
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += seconds
+
+    def record_caught(self, check_seconds):
+        """Record a failure caught by validation; return the estimated render seconds saved"""
+        with self._lock:
+            self.caught += 1
+            average_render = self.render_seconds / self.renders if self.renders else 0.0
+            saved = max(0.0, average_render - check_seconds)
+            self.seconds_saved += saved
+            return saved
+
+    def record_repair(self, succeeded):
+        with self._lock:
+            self.repairs += 1
+            if succeeded:
+                self.repaired += 1
+
+    def summary(self):
+        with self._lock:
+            return (
+                f"{self.caught} bad scripts caught before rendering, "
+                f"{self.repaired}/{self.repairs} repairs succeeded, "
+                f"~{self.seconds_saved:.0f}s of rendering saved"
+            )